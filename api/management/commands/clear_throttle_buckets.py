@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api.throttling import clear_idle_buckets
+
+class Command(BaseCommand):
+    help = "Delete the API throttle buckets of clients that haven't made a request for long enough that theirs is full again."
+
+    def handle(self, *args, **options):
+        deleted = clear_idle_buckets()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idle throttle buckets."))
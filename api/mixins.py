@@ -0,0 +1,150 @@
+import calendar
+import hashlib
+from django.conf import settings
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from flashcard.exporters import EXPORTERS, export_rows
+from flashcard.models import FlashCard
+from flashcard.permissions import clean_pk
+from flashcard.study import due_flashcards
+from .renderers import NDJSONRenderer, CSVRenderer
+from .serializers import DueFlashCardSerializer
+from .throttling import BulkThrottle
+
+class QueryPlanMixin:
+    # Joins and prefetches each action needs, e.g.
+    # query_plans = {"list": {"select_related": [...], "prefetch_related": [...]}}
+    # Actions without an entry use the "default" plan (if there is one).
+    query_plans = {}
+
+    # Rows the user is allowed to see, before any joins or prefetches
+    def get_visible_queryset(self):
+        return super().get_queryset()
+
+    def get_queryset(self):
+        return self.apply_query_plan(self.get_visible_queryset())
+
+    def get_query_plan(self):
+        return self.query_plans.get(self.action, self.query_plans.get("default", {}))
+
+    def apply_query_plan(self, queryset):
+        plan = self.get_query_plan()
+        select_related = plan.get("select_related", [])
+        prefetch_related = plan.get("prefetch_related", [])
+
+        # Only read the columns and relations a sparse fieldset (?fields= / ?omit=) needs
+        serializer = self.get_sparse_serializer()
+        if serializer is not None:
+            only = serializer.get_only_fields()
+            sources = {field.source_attrs[0] for field in serializer.fields.values() if field.source_attrs}
+            # Django can't join through a deferred relation, so drop joins none of the remaining fields read through
+            select_related = [path for path in select_related if any(field.startswith(path + "__") for field in only)]
+            prefetch_related = [lookup for lookup in prefetch_related if getattr(lookup, "prefetch_to", lookup).split("__")[0] in sources]
+            queryset = queryset.only(*only)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    # The serializer for this request if it is returning a sparse fieldset, otherwise None
+    def get_sparse_serializer(self):
+        if self.request.method != "GET":
+            return None
+        serializer = self.get_serializer()
+        if not getattr(serializer, "sparse", False):
+            return None
+        return serializer
+
+
+class ConditionalGetMixin:
+    # Adds ETag / Last-Modified headers to list and retrieve, and answers 304 Not Modified when the client is up to date.
+    # The check only reads these columns, it doesn't serialize the response.
+    last_modified_field = None
+    # Counters that change without moving last_modified_field
+    version_fields = []
+
+    # A list's versions are those of the rows on the requested page, read as the same index range as the page itself
+    # (so the check costs the same on any page, and doesn't grow with the list), and whether there are pages around it
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_visible_queryset())
+        rows = queryset.annotate(last_modified=F(self.last_modified_field)).only("pk", *self.version_fields)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            page = list(rows)
+        versions = [getattr(self.paginator, "has_next", None), getattr(self.paginator, "has_previous", None)]
+        for row in page:
+            versions += [row.pk, row.last_modified, *(getattr(row, field) for field in self.version_fields)]
+        last_modified = max((row.last_modified for row in page if row.last_modified), default=None)
+        return self.conditional_response(last_modified, versions, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = clean_pk(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if pk is None:
+            raise Http404
+        versions = self.get_visible_queryset().filter(pk=pk).values_list(self.last_modified_field, *self.version_fields).first()
+        if versions is None:
+            # Let retrieve raise the 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(versions[0], versions, super().retrieve, request, *args, **kwargs)
+
+    # The response depends on the user (visibility), the query string (page, fields) and the format as well as the data
+    def get_etag(self, versions):
+        key = [self.request.user.pk, self.request.get_full_path(), self.request.accepted_renderer.format, *versions]
+        return '"%s"' % hashlib.md5("|".join(str(part) for part in key).encode()).hexdigest()
+
+    def conditional_response(self, updated_at, versions, handler, request, *args, **kwargs):
+        etag = self.get_etag(versions)
+        last_modified = calendar.timegm(updated_at.utctimetuple()) if updated_at else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class ExportMixin:
+    # Adds /export/?format=ndjson|csv, which streams every flashcard in the object.
+    # Rows are read and written in chunks, so memory use doesn't depend on the number of flashcards.
+    # How flashcards are filtered down to the object, e.g. "flashcard_set"
+    export_lookup = None
+    # Start of the file name, e.g. "set" for set-1.csv
+    export_name = None
+
+    @action(detail=True, methods=["get"], renderer_classes=[NDJSONRenderer, CSVRenderer], throttle_classes=[BulkThrottle])
+    def export(self, request, *args, **kwargs):
+        obj = get_object_or_404(self.get_visible_queryset().only("pk"), pk=self.kwargs["pk"])
+        renderer = request.accepted_renderer
+        rows = export_rows(FlashCard.objects.filter(**{self.export_lookup: obj.pk}))
+        response = StreamingHttpResponse(EXPORTERS[renderer.format](rows), content_type=f"{renderer.media_type}; charset={renderer.charset}")
+        response["Content-Disposition"] = f'attachment; filename="{self.export_name}-{obj.pk}.{renderer.format}"'
+        return response
+
+
+class StudyMixin:
+    # Adds /due/?limit=, the next flashcards in the object for the user to study: the ones due for review, soonest
+    # first, then ones they haven't studied yet. Returns STUDY_DUE_LIMIT flashcards, or ?limit= up to STUDY_MAX_DUE_LIMIT.
+    # How flashcards are filtered down to the object, e.g. "flashcard_set"
+    study_lookup = None
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
+    def due(self, request, *args, **kwargs):
+        obj = get_object_or_404(self.get_visible_queryset().only("pk"), pk=self.kwargs["pk"])
+        try:
+            limit = int(request.query_params.get("limit", settings.STUDY_DUE_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+        limit = max(1, min(limit, settings.STUDY_MAX_DUE_LIMIT))
+        flashcards = due_flashcards(request.user, {self.study_lookup: obj.pk}, limit)
+        return Response({"results": DueFlashCardSerializer(flashcards, many=True).data})
@@ -1,3 +1,12 @@
 from django.db import models
 
-# Create your models here.
+# A token bucket for one throttle scope and client (see api/throttling.py)
+class ThrottleBucket(models.Model):
+    # e.g. "read:user:4" or "read:anon:203.0.113.7"
+    key = models.CharField(max_length=200, primary_key=True)
+    tokens = models.FloatField()
+    # When tokens was worked out, as a Unix timestamp
+    updated_at = models.FloatField()
+    
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
@@ -0,0 +1,13 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+class KeysetPagination(CursorPagination):
+    # Order on the primary key so every page is an indexed range scan (WHERE id > cursor LIMIT n).
+    # Page 1000 costs the same as page 1, unlike OFFSET pagination.
+    ordering = "id"
+    page_size_query_param = "page_size"
+
+    # Read on each request so the page size and cap can be changed in settings (and in tests)
+    def __init__(self):
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
@@ -0,0 +1,16 @@
+import json
+from rest_framework.renderers import BaseRenderer
+
+# Export formats. Exports stream their own content, so these only render error responses (as JSON).
+# Having them as renderers lets ?format=ndjson / ?format=csv (or an Accept header) pick the export format.
+class NDJSONRenderer(BaseRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+class CSVRenderer(NDJSONRenderer):
+    media_type = "text/csv"
+    format = "csv"
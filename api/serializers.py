@@ -1,10 +1,74 @@
-from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review, StudyProgress, RATINGS
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
+from flashcard.permissions import resolver_for
+from flashcard.study import GRADES
 import datetime
 
-class FlashCardSerializer(serializers.ModelSerializer):
-    flashcard_set = serializers.PrimaryKeyRelatedField(queryset=FlashcardSet.objects.all())
+# Read a comma separated query parameter, e.g. ?fields=id,title -> ["id", "title"]
+def get_query_list(request, name):
+    if request is None:
+        return []
+    return [value.strip() for value in request.query_params.get(name, "").split(",") if value.strip()]
+
+# Get the fields listed in ?expand= that the serializer allows to be expanded
+def get_expanded_fields(request, allowed):
+    requested = get_query_list(request, "expand")
+    return [field for field in allowed if field in requested]
+
+class SparseFieldsetMixin:
+    # Columns read by fields that get_only_fields can't work out from their source, e.g. method fields
+    field_columns = {}
+    
+    # Drop fields from the output of GET requests with ?fields=id,title (keep only these) or ?omit=answer (drop these)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        self.sparse = request is not None and request.method == "GET" and ("fields" in request.query_params or "omit" in request.query_params)
+        if not self.sparse:
+            return
+        keep = get_query_list(request, "fields")
+        omit = get_query_list(request, "omit")
+        for field in list(self.fields):
+            if (keep and field not in keep) or field in omit:
+                self.fields.pop(field)
+    
+    # Columns the remaining fields read, for QuerySet.only(), or None to load every column
+    def get_only_fields(self):
+        if not self.sparse:
+            return None
+        opts = self.Meta.model._meta
+        only = {opts.pk.name}
+        for name, field in self.fields.items():
+            only.update(self.field_columns.get(name, []))
+            if field.write_only or not field.source_attrs:
+                continue
+            # Skip anything that isn't a column on this model, e.g. reverse relations and annotations
+            try:
+                if not opts.get_field(field.source_attrs[0]).concrete:
+                    continue
+            except FieldDoesNotExist:
+                continue
+            only.add("__".join(field.source_attrs))
+        return sorted(only)
+
+# A primary key field that looks the object up through the request's PermissionResolver,
+# so a view that already loaded it to check permissions doesn't load it again
+class ResolvedRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        request = self.context.get("request")
+        if request is None or isinstance(data, bool):
+            return super().to_internal_value(data)
+        obj = resolver_for(request).get(self.get_queryset().model, data)
+        if obj is None:
+            self.fail("does_not_exist", pk_value=data)
+        return obj
+
+class FlashCardSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # The set is looked up by the resolver's loader, which joins its collection and owner in,
+    # so "user" doesn't need extra queries after create / update
+    flashcard_set = ResolvedRelatedField(queryset=FlashcardSet.objects.all())
     user = serializers.ReadOnlyField(source="flashcard_set.flashcard_collection.user.username")
     
     class Meta:
@@ -12,32 +76,57 @@ class FlashCardSerializer(serializers.ModelSerializer):
         fields = ["id", "question", "answer", "difficulty", "flashcard_set", "user"]
         read_only_fields = ["id", "user"]
         
-class FlashcardSetSerializer(serializers.ModelSerializer):
-    flashcard_collection = serializers.PrimaryKeyRelatedField(queryset=FlashcardCollection.objects.all())
+# Validates rows for POST /api/flashcards/bulk/. The sets are looked up together by the view instead of one query per row.
+class FlashCardBulkSerializer(serializers.ModelSerializer):
+    flashcard_set = serializers.IntegerField()
+    
+    class Meta:
+        model = FlashCard
+        fields = ["question", "answer", "difficulty", "flashcard_set"]
+
+class FlashcardSetSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # The resolver's loader joins the collection's owner in, for "owner"
+    flashcard_collection = ResolvedRelatedField(queryset=FlashcardCollection.objects.all())
     owner = serializers.ReadOnlyField(source="flashcard_collection.user.username")
+    review_count = serializers.ReadOnlyField(source="rating_count")
+    rating_histogram = serializers.SerializerMethodField()
+    field_columns = {"rating_histogram": [f"rating_{rating}_count" for rating in RATINGS]}
+    
+    # Child id lists are only included when asked for with ?expand=flashcard,comments
+    expandable_fields = ["flashcard", "comments"]
     
     class Meta:
         model = FlashcardSet
-        fields = ["id", "title", "description", "created_at", "updated_at", "owner", "flashcard_collection", "comments", "flashcard"]
-        read_only_fields = ["created_at", "update_at", "owner", "flashcard", "comments"]
-        
+        fields = ["id", "title", "description", "created_at", "updated_at", "owner", "flashcard_collection", "flashcard_count", "comment_count",
+                  "review_count", "rating_average", "rating_count", "rating_histogram"]
+        read_only_fields = ["created_at", "update_at", "owner", "flashcard_count", "comment_count", "rating_average", "rating_count"]
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in get_expanded_fields(self.context.get("request"), self.expandable_fields):
+            self.fields[field] = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    
+    # Number of reviews giving each rating, keyed by the rating
+    def get_rating_histogram(self, obj):
+        return {str(rating): count for rating, count in obj.rating_histogram.items()}
+    
     # Update updated_at when modified
     def update(self, instance, validated_data):
         validated_data["updated_at"] = datetime.datetime.now()
         return super().update(instance, validated_data)
 
-class FlashcardCollectionSerializer(serializers.ModelSerializer):        
+class FlashcardCollectionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):        
     class Meta:
         model = FlashcardCollection
-        fields = ["id", "title", "description", "public", "user", "flashcard_set"]
-        read_only_fields = ["user", "flashcard_set"]
+        fields = ["id", "title", "description", "public", "user", "flashcard_set", "set_count", "card_count"]
+        read_only_fields = ["user", "flashcard_set", "set_count", "card_count"]
         
     # Add user id to created set
     def create(self, validated_data):
         validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
 
-class UserSerializer(serializers.ModelSerializer):        
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):        
     password = serializers.CharField(write_only=True, required=False)
     class Meta:
         model = User
@@ -57,8 +146,8 @@ class UserSerializer(serializers.ModelSerializer):
         if self.context.get("request") and self.context["request"].method == "POST":
             self.fields["password"].required = True
     
-class CommentSerializer(serializers.ModelSerializer):
-    flashcard_set = serializers.PrimaryKeyRelatedField(queryset=FlashcardSet.objects.all())
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    flashcard_set = ResolvedRelatedField(queryset=FlashcardSet.objects.all())
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     comment = serializers.CharField(allow_blank=False, required=True)
     
@@ -74,11 +163,11 @@ class CommentSerializer(serializers.ModelSerializer):
     # Ensure you can only add a flashcard set when creating the comment, and can't change it after this
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        if self.instance:
+        if self.instance and "flashcard_set" in self.fields:
             self.fields["flashcard_set"].read_only = True
 
-class ReviewSerializer(serializers.ModelSerializer):
-    flashcard_set = serializers.PrimaryKeyRelatedField(queryset=FlashcardSet.objects.all())
+class ReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    flashcard_set = ResolvedRelatedField(queryset=FlashcardSet.objects.all())
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     rating = serializers.IntegerField(required=True)
     
@@ -93,5 +182,24 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        if self.instance:
-            self.fields["flashcard_set"].read_only = True
\ No newline at end of file
+        if self.instance and "flashcard_set" in self.fields:
+            self.fields["flashcard_set"].read_only = True
+
+# A user's spaced repetition progress on a flashcard
+class StudyProgressSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StudyProgress
+        fields = ["flashcard", "interval", "ease", "repetitions", "lapses", "due_at", "reviewed_at"]
+        read_only_fields = fields
+
+# POST /api/flashcards/<id>/grade/: how well the user remembered the flashcard, from 0 (not at all) to 5 (perfectly)
+class GradeSerializer(serializers.Serializer):
+    grade = serializers.IntegerField(min_value=GRADES[0], max_value=GRADES[-1])
+
+# A flashcard in the user's study queue, with their progress on it (null if they haven't studied it yet)
+class DueFlashCardSerializer(serializers.ModelSerializer):
+    progress = StudyProgressSerializer(read_only=True, allow_null=True)
+    
+    class Meta:
+        model = FlashCard
+        fields = ["id", "question", "answer", "difficulty", "flashcard_set", "progress"]
@@ -102,6 +102,14 @@ class EndpointTests(APITestCase):
         response = self.client.get(f'/api/collections/{self.flashcard_collection_private.id}/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
     # endregion
+    # region Counts
+    def test_get_collection_has_counts(self):
+        flashcard_set = FlashcardSet.objects.create(title="Set", flashcard_collection=self.flashcard_collection_public)
+        FlashCard.objects.create(question="Question", answer="Answer", difficulty="easy", flashcard_set=flashcard_set)
+        response = self.client.get(f'/api/collections/{self.flashcard_collection_public.id}/')
+        self.assertEqual(response.data["set_count"], 1)
+        self.assertEqual(response.data["card_count"], 1)
+    # endregion
     # endregion
     # region Post
     def test_create_collection_as_logged_out_user(self):
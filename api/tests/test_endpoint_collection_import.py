@@ -0,0 +1,77 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard
+from flashcard.tests.test_anki import make_apkg
+
+class CollectionImportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+        cls.standard_user = User.objects.create_user(
+            username="standard_user",
+            password="standard_password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Collection",
+            user=cls.owner,
+            public=True)
+
+    def setUp(self):
+        self.client.login(username="owner", password="owner_password")
+
+    def upload(self, content, **data):
+        return self.client.post(f'/api/collections/{self.collection.id}/import/', {"file": SimpleUploadedFile("deck.apkg", content), **data}, format="multipart")
+
+    def test_import_apkg(self):
+        response = self.upload(make_apkg({1: "Deck"}, [(["Q", "A"], "", 1), (["Q2", "A2"], "", 1)]).read(), difficulty="easy")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        flashcard_set = FlashcardSet.objects.get(flashcard_collection=self.collection)
+        self.assertEqual(response.data["sets"], [{"id": flashcard_set.id, "title": "Deck"}])
+        self.assertEqual(flashcard_set.flashcard.filter(difficulty="easy").count(), 2)
+
+    @override_settings(QUOTAS={"create_set": 2})
+    def test_import_uses_quota(self):
+        response = self.upload(make_apkg({1: "One", 2: "Two"}, [(["Q", "A"], "", 1), (["Q2", "A2"], "", 2)]).read())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.upload(make_apkg({1: "Three"}, [(["Q", "A"], "", 1)]).read())
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(FlashcardSet.objects.filter(flashcard_collection=self.collection).count(), 2)
+
+    @override_settings(QUOTAS={"create_set": 1})
+    def test_import_over_quota_imports_nothing(self):
+        response = self.upload(make_apkg({1: "One", 2: "Two"}, [(["Q", "A"], "", 1), (["Q2", "A2"], "", 2)]).read())
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertFalse(FlashcardSet.objects.exists())
+        self.assertFalse(FlashCard.objects.exists())
+
+    def test_import_invalid_file(self):
+        response = self.upload(b"not a zip")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+
+    @override_settings(ANKI_MAX_COLLECTION_SIZE=1000)
+    def test_import_collection_too_large(self):
+        response = self.upload(make_apkg({1: "Deck"}, [(["Q", "A"], "", 1)]).read())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+        self.assertFalse(FlashcardSet.objects.exists())
+
+    def test_import_without_file(self):
+        response = self.client.post(f'/api/collections/{self.collection.id}/import/', {}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_as_standard_user(self):
+        self.client.login(username="standard_user", password="standard_password")
+        response = self.upload(make_apkg({1: "Deck"}, [(["Q", "A"], "", 1)]).read())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(FlashCard.objects.exists())
+
+    def test_import_as_logged_out_user(self):
+        self.client.logout()
+        response = self.upload(make_apkg({1: "Deck"}, [(["Q", "A"], "", 1)]).read())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
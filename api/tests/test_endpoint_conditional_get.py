@@ -0,0 +1,115 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard, Comment
+
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Public Collection",
+            user=cls.user,
+            public=True)
+        cls.set = FlashcardSet.objects.create(
+            title="Public Set",
+            flashcard_collection=cls.collection)
+        cls.flashcard = FlashCard.objects.create(
+            question="Question",
+            answer="Answer",
+            difficulty="easy",
+            flashcard_set=cls.set)
+
+    def assertNotModified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        return etag
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_retrieve_not_modified(self):
+        for url in [f'/api/sets/{self.set.id}/', f'/api/collections/{self.collection.id}/', f'/api/flashcards/{self.flashcard.id}/']:
+            with self.subTest(url=url):
+                self.assertNotModified(url)
+
+    def test_list_not_modified(self):
+        for url in ['/api/sets/', '/api/collections/', '/api/flashcards/']:
+            with self.subTest(url=url):
+                self.assertNotModified(url)
+
+    def test_if_modified_since(self):
+        response = self.client.get(f'/api/sets/{self.set.id}/')
+        response = self.client.get(f'/api/sets/{self.set.id}/', HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_set_modified_by_new_flashcard(self):
+        etag = self.assertNotModified(f'/api/sets/{self.set.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            FlashCard.objects.create(question="New", answer="Answer", difficulty="easy", flashcard_set=self.set)
+        self.assertModified(f'/api/sets/{self.set.id}/', etag)
+
+    def test_set_modified_by_new_comment(self):
+        etag = self.assertNotModified(f'/api/sets/{self.set.id}/')
+        Comment.objects.create(comment="Comment", flashcard_set=self.set, user=self.user)
+        self.assertModified(f'/api/sets/{self.set.id}/', etag)
+
+    def test_collection_modified_by_set_change(self):
+        etag = self.assertNotModified(f'/api/collections/{self.collection.id}/')
+        self.set.title = "Renamed"
+        self.set.save()
+        self.assertModified(f'/api/collections/{self.collection.id}/', etag)
+
+    def test_collection_modified_by_set_delete(self):
+        etag = self.assertNotModified(f'/api/collections/{self.collection.id}/')
+        self.set.delete()
+        self.assertModified(f'/api/collections/{self.collection.id}/', etag)
+
+    def test_list_modified_by_flashcard_delete(self):
+        etag = self.assertNotModified('/api/flashcards/')
+        self.flashcard.delete()
+        self.assertModified('/api/flashcards/', etag)
+
+    def test_list_modified_by_new_page(self):
+        etag = self.assertNotModified('/api/flashcards/?page_size=1')
+        FlashCard.objects.create(question="New", answer="Answer", difficulty="easy", flashcard_set=self.set)
+        self.assertModified('/api/flashcards/?page_size=1', etag)
+
+    def test_list_not_modified_by_later_page(self):
+        FlashCard.objects.create(question="Second", answer="Answer", difficulty="easy", flashcard_set=self.set)
+        etag = self.assertNotModified('/api/flashcards/?page_size=1')
+        other_set = FlashcardSet.objects.create(title="Other Set", flashcard_collection=self.collection)
+        FlashCard.objects.create(question="Third", answer="Answer", difficulty="easy", flashcard_set=other_set)
+        response = self.client.get('/api/flashcards/?page_size=1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get(f'/api/sets/{self.set.id}/')["ETag"]
+        response = self.client.get(f'/api/sets/{self.set.id}/?fields=id', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_user(self):
+        etag = self.client.get('/api/sets/')["ETag"]
+        self.client.login(username="owner", password="owner_password")
+        response = self.client.get('/api/sets/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_missing_set_is_not_found(self):
+        response = self.client.get('/api/sets/999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_pk_is_not_found(self):
+        for url in ['/api/sets/abc/', '/api/flashcards/abc/', '/api/collections/abc/']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
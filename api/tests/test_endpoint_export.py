@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from flashcard import exporters
+from flashcard.importers import read_rows
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard
+
+class ExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+        cls.standard_user = User.objects.create_user(
+            username="standard_user",
+            password="standard_password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Public Collection",
+            user=cls.owner,
+            public=True)
+        cls.private_collection = FlashcardCollection.objects.create(
+            title="Private Collection",
+            user=cls.owner,
+            public=False)
+        cls.set = FlashcardSet.objects.create(
+            title="Set",
+            flashcard_collection=cls.collection)
+        cls.other_set = FlashcardSet.objects.create(
+            title="Other set",
+            flashcard_collection=cls.collection)
+        cls.private_set = FlashcardSet.objects.create(
+            title="Private set",
+            flashcard_collection=cls.private_collection)
+        FlashCard.objects.bulk_create(
+            [FlashCard(question=f"Question {i}", answer="Answer, with \"quotes\"\nand lines", difficulty="easy", flashcard_set=cls.set) for i in range(5)] +
+            [FlashCard(question="Other", answer="Answer", difficulty="hard", flashcard_set=cls.other_set),
+             FlashCard(question="Private", answer="Answer", difficulty="hard", flashcard_set=cls.private_set)])
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_export_set_ndjson(self):
+        response, content = self.export(f'/api/sets/{self.set.id}/export/?format=ndjson')
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        self.assertIn(f'filename="set-{self.set.id}.ndjson"', response["Content-Disposition"])
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["question"] for row in rows], [f"Question {i}" for i in range(5)])
+        self.assertEqual(rows[0]["flashcard_set"], self.set.id)
+        self.assertEqual(rows[0]["flashcard_set_title"], "Set")
+        self.assertEqual(rows[0]["answer"], "Answer, with \"quotes\"\nand lines")
+
+    def test_export_defaults_to_ndjson(self):
+        response, _ = self.export(f'/api/sets/{self.set.id}/export/')
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+
+    def test_export_collection_csv(self):
+        response, content = self.export(f'/api/collections/{self.collection.id}/export/?format=csv')
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({row["flashcard_set_title"] for row in rows}, {"Set", "Other set"})
+        self.assertEqual(rows[0]["answer"], "Answer, with \"quotes\"\nand lines")
+
+    def test_export_can_be_imported(self):
+        _, content = self.export(f'/api/sets/{self.set.id}/export/?format=csv')
+        rows = list(read_rows(io.BytesIO(content.encode()), "csv"))
+        self.assertEqual(rows[0]["question"], "Question 0")
+
+    def test_export_in_chunks(self):
+        original = exporters.CHUNK_SIZE
+        exporters.CHUNK_SIZE = 2
+        try:
+            response = self.client.get(f'/api/collections/{self.collection.id}/export/?format=ndjson')
+            chunks = list(response.streaming_content)
+        finally:
+            exporters.CHUNK_SIZE = original
+        self.assertEqual(len(chunks), 3)
+
+    def test_export_empty_csv(self):
+        empty_set = FlashcardSet.objects.create(title="Empty", flashcard_collection=self.collection)
+        _, content = self.export(f'/api/sets/{empty_set.id}/export/?format=csv')
+        self.assertEqual(content.strip(), ",".join(exporters.EXPORT_FIELDS))
+
+    def test_export_private_set(self):
+        response = self.client.get(f'/api/sets/{self.private_set.id}/export/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.login(username="standard_user", password="standard_password")
+        response = self.client.get(f'/api/collections/{self.private_collection.id}/export/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.login(username="owner", password="owner_password")
+        _, content = self.export(f'/api/collections/{self.private_collection.id}/export/')
+        self.assertIn("Private", content)
+
+    def test_export_invalid_pk(self):
+        for url in ['/api/sets/abc/export/', '/api/collections/abc/export/']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_unknown_format(self):
+        response = self.client.get(f'/api/sets/{self.set.id}/export/?format=xml')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_query_count(self):
+        # The flashcards and their set titles come from one joined query, read while streaming
+        response = self.client.get(f'/api/collections/{self.collection.id}/export/?format=csv')
+        with self.assertNumQueries(1):
+            b"".join(response.streaming_content)
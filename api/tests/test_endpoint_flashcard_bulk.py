@@ -0,0 +1,92 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.test import override_settings
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard
+
+class BulkFlashcardTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+        cls.standard_user = User.objects.create_user(
+            username="standard_user",
+            password="standard_password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Collection",
+            user=cls.owner,
+            public=True)
+        cls.set = FlashcardSet.objects.create(
+            title="Set",
+            flashcard_collection=cls.collection)
+        cls.other_set = FlashcardSet.objects.create(
+            title="Other set",
+            flashcard_collection=cls.collection)
+
+    def setUp(self):
+        self.client.login(username="owner", password="owner_password")
+
+    def card(self, flashcard_set, question="Question"):
+        return {"question": question, "answer": "Answer", "difficulty": "easy", "flashcard_set": flashcard_set.id}
+
+    def test_bulk_create(self):
+        updated_at = self.set.updated_at
+        response = self.client.post('/api/flashcards/bulk/', [self.card(self.set, f"Question {i}") for i in range(1200)], format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 1200)
+        self.assertEqual(response.data[0]["user"], "owner")
+        self.assertEqual(FlashCard.objects.filter(flashcard_set=self.set).count(), 1200)
+        self.assertGreater(FlashcardSet.objects.get(pk=self.set.id).updated_at, updated_at)
+
+    def test_bulk_create_many_sets(self):
+        response = self.client.post('/api/flashcards/bulk/', [self.card(self.set), self.card(self.other_set)], format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(FlashCard.objects.filter(flashcard_set=self.other_set).count(), 1)
+
+    # Without throttling, see test_throttling for its queries
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}})
+    def test_bulk_create_query_count(self):
+        # Set lookup, savepoint, insert, touch sets, touch collections, release
+        self.client.force_authenticate(self.owner)
+        with self.assertNumQueries(6):
+            self.client.post('/api/flashcards/bulk/', [self.card(self.set) for _ in range(100)], format="json")
+
+    def test_bulk_create_row_errors(self):
+        rows = [self.card(self.set), {"question": "Question", "flashcard_set": self.set.id}, self.card(self.set)]
+        rows[2]["difficulty"] = "impossible"
+        response = self.client.post('/api/flashcards/bulk/', rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("answer", response.data[1])
+        self.assertIn("difficulty", response.data[2])
+        self.assertEqual(FlashCard.objects.count(), 0)
+
+    def test_bulk_create_missing_set(self):
+        response = self.client.post('/api/flashcards/bulk/', [self.card(self.set), {**self.card(self.set), "flashcard_set": 999}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("flashcard_set", response.data[1])
+        self.assertEqual(FlashCard.objects.count(), 0)
+
+    def test_bulk_create_as_standard_user(self):
+        self.client.login(username="standard_user", password="standard_password")
+        response = self.client.post('/api/flashcards/bulk/', [self.card(self.set)], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("flashcard_set", response.data[0])
+        self.assertEqual(FlashCard.objects.count(), 0)
+
+    def test_bulk_create_as_logged_out_user(self):
+        self.client.logout()
+        response = self.client.post('/api/flashcards/bulk/', [self.card(self.set)], format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_create_not_a_list(self):
+        response = self.client.post('/api/flashcards/bulk/', self.card(self.set), format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(API_BULK_MAX_SIZE=2)
+    def test_bulk_create_too_many(self):
+        response = self.client.post('/api/flashcards/bulk/', [self.card(self.set) for _ in range(3)], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(FlashCard.objects.count(), 0)
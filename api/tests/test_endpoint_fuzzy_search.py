@@ -0,0 +1,82 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.test import override_settings
+from flashcard.models import FlashcardSet, FlashcardCollection
+
+class FuzzySearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="owner_password")
+        cls.other_user = User.objects.create_user(username="other", password="other_password")
+        cls.public_collection = FlashcardCollection.objects.create(title="Plant biology", user=cls.owner, public=True)
+        cls.private_collection = FlashcardCollection.objects.create(title="Private", user=cls.owner, public=False)
+        cls.photosynthesis = FlashcardSet.objects.create(title="Photosynthesis", flashcard_collection=cls.public_collection)
+        cls.respiration = FlashcardSet.objects.create(title="Cellular respiration", flashcard_collection=cls.public_collection)
+        cls.private_set = FlashcardSet.objects.create(title="Photosynthesis notes", flashcard_collection=cls.private_collection)
+
+    def search(self, q, **params):
+        response = self.client.get('/api/search/fuzzy', {"q": q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(result["type"], result["id"]) for result in response.data["results"]]
+
+    #region Matching
+    def test_misspelt_title(self):
+        self.assertEqual(self.search("photosynthisis"), [("set", self.photosynthesis.id)])
+        self.assertEqual(self.search("respiraton"), [("set", self.respiration.id)])
+
+    def test_collections(self):
+        self.assertEqual(self.search("plant biolgy"), [("collection", self.public_collection.id)])
+
+    def test_unlike_titles_are_left_out(self):
+        self.assertEqual(self.search("geography"), [])
+        self.assertEqual(self.search("ab"), [])
+
+    def test_most_alike_first(self):
+        FlashcardSet.objects.create(title="Photos", flashcard_collection=self.public_collection)
+        self.assertEqual(self.search("photosynthesis")[0], ("set", self.photosynthesis.id))
+
+    def test_result(self):
+        response = self.client.get('/api/search/fuzzy', {"q": "Photosynthesis"})
+        result = response.data["results"][0]
+        self.assertEqual(result["title"], "Photosynthesis")
+        self.assertEqual(result["flashcard_collection"], self.public_collection.id)
+        self.assertEqual(result["similarity"], 1)
+
+    @override_settings(API_FUZZY_SEARCH_MAX_LIMIT=2)
+    def test_limit(self):
+        for i in range(4):
+            FlashcardSet.objects.create(title=f"Photosynthesis {i}", flashcard_collection=self.public_collection)
+        self.assertEqual(len(self.search("photosynthesis", limit=1)), 1)
+        self.assertEqual(len(self.search("photosynthesis", limit=10)), 2)
+        response = self.client.get('/api/search/fuzzy', {"q": "photosynthesis", "limit": "many"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_query(self):
+        response = self.client.get('/api/search/fuzzy')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    #endregion
+
+    #region Visibility
+    def test_other_user_only_finds_public(self):
+        self.client.force_authenticate(self.other_user)
+        self.assertNotIn(("set", self.private_set.id), self.search("photosynthesis notes"))
+        self.assertNotIn(("collection", self.private_collection.id), self.search("private"))
+
+    def test_owner_finds_private(self):
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.search("photosynthesis notes")[0], ("set", self.private_set.id))
+        self.assertIn(("collection", self.private_collection.id), self.search("privat"))
+    #endregion
+
+    #region Index
+    def test_title_changes_are_indexed(self):
+        self.respiration.title = "Fermentation"
+        self.respiration.save()
+        self.assertEqual(self.search("respiraton"), [])
+        self.assertEqual(self.search("fermentaton"), [("set", self.respiration.id)])
+
+    def test_deletes_are_indexed(self):
+        self.photosynthesis.delete()
+        self.assertEqual(self.search("photosynthisis"), [])
+    #endregion
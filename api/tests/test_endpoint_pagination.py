@@ -0,0 +1,68 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.test import override_settings
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard
+
+@override_settings(API_PAGE_SIZE=2, API_MAX_PAGE_SIZE=3)
+class PaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Public Collection",
+            user=cls.user,
+            public=True)
+        cls.set = FlashcardSet.objects.create(
+            title="Public Set",
+            flashcard_collection=cls.collection)
+        cls.flashcards = [FlashCard.objects.create(
+            question=f"Question {i}",
+            answer="Answer",
+            difficulty="easy",
+            flashcard_set=cls.set) for i in range(5)]
+
+    def test_list_is_paginated(self):
+        response = self.client.get('/api/flashcards/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([f["id"] for f in response.data["results"]], [f.id for f in self.flashcards[:2]])
+        self.assertIsNotNone(response.data["next"])
+        self.assertIsNone(response.data["previous"])
+
+    def test_follow_cursors_through_every_page(self):
+        ids = []
+        url = '/api/flashcards/'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [f["id"] for f in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(ids, [f.id for f in self.flashcards])
+
+    def test_previous_cursor(self):
+        response = self.client.get('/api/flashcards/')
+        response = self.client.get(response.data["next"])
+        response = self.client.get(response.data["previous"])
+        self.assertEqual([f["id"] for f in response.data["results"]], [f.id for f in self.flashcards[:2]])
+
+    def test_page_size_param(self):
+        response = self.client.get('/api/flashcards/?page_size=1')
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/flashcards/?page_size=1000')
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/flashcards/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_every_list_endpoint_is_paginated(self):
+        User.objects.create_superuser(username="super_user", password="super_password")
+        self.client.login(username="super_user", password="super_password")
+        for endpoint in ["flashcards", "sets", "collections", "comments", "users", "reviews"]:
+            response = self.client.get(f'/api/{endpoint}/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("results", response.data)
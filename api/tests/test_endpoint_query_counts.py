@@ -0,0 +1,145 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.db import connection
+from django.conf import settings
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard, Comment, Review
+
+# The most queries each endpoint is allowed to make, however many rows there are.
+# Flashcard, set and collection GETs include one query for the ETag / Last-Modified check.
+# Writes that change a set's or collection's counters or rating totals do it inside a savepoint.
+# Creating a set also uses up one of the user's daily quota, in the same transaction (the first of the day inserts the quota row).
+# The set or collection a write refers to is loaded once, for both the permission check and the serializer.
+MAX_QUERIES = {
+    "flashcards": {"list": 2, "retrieve": 2, "create": 8, "update": 7},
+    "sets": {"list": 2, "retrieve": 2, "create": 12, "update": 7},
+    "collections": {"list": 3, "retrieve": 3, "create": 3, "update": 7},
+    "comments": {"list": 1, "retrieve": 1, "create": 7, "update": 7},
+    "reviews": {"list": 1, "retrieve": 1, "create": 7, "update": 8},
+    "users": {"list": 2, "retrieve": 2},
+}
+
+# Throttling is turned off (no rates) so it doesn't count here, test_throttling checks its own queries
+@override_settings(API_PAGE_SIZE=1000, API_MAX_PAGE_SIZE=1000, REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}})
+class QueryCountTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            username="super_user",
+            password="super_password")
+        cls.owner = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+
+    # Each row is a public collection holding one set, which has one flashcard, comment and review
+    def add_rows(self, count):
+        start = User.objects.count()
+        users = User.objects.bulk_create([User(username=f"user_{start + i}", password="!") for i in range(count)])
+        collections = FlashcardCollection.objects.bulk_create([
+            FlashcardCollection(title=f"Collection {i}", user=self.owner, public=True) for i in range(count)])
+        sets = FlashcardSet.objects.bulk_create([
+            FlashcardSet(title=f"Set {i}", flashcard_collection=collection) for i, collection in enumerate(collections)])
+        FlashCard.objects.bulk_create([
+            FlashCard(question="Question", answer="Answer", difficulty="easy", flashcard_set=s) for s in sets])
+        Comment.objects.bulk_create([
+            Comment(comment="Comment", flashcard_set=s, user=user) for s, user in zip(sets, users)])
+        Review.objects.bulk_create([
+            Review(rating=5, flashcard_set=s, user=user) for s, user in zip(sets, users)])
+
+    def count_queries(self, method, url, data=None):
+        # Run on-commit callbacks (e.g. set touches) inside the count as well
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 300, response.content)
+        return len(queries), response
+
+    def test_list_query_count_is_constant(self):
+        counts = {endpoint: [] for endpoint in MAX_QUERIES}
+        total = 0
+        for rows in [1, 10, 1000]:
+            self.add_rows(rows - total)
+            total = rows
+            for endpoint in MAX_QUERIES:
+                self.client.force_authenticate(self.superuser if endpoint == "users" else self.owner)
+                count, response = self.count_queries("get", f"/api/{endpoint}/")
+                self.assertGreaterEqual(len(response.data["results"]), rows)
+                counts[endpoint].append(count)
+        for endpoint, endpoint_counts in counts.items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(len(set(endpoint_counts)), 1, endpoint_counts)
+                self.assertLessEqual(endpoint_counts[0], MAX_QUERIES[endpoint]["list"])
+
+    # ?expand= adds one prefetch query per expanded relation
+    def test_expanded_set_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.owner)
+        counts = []
+        total = 0
+        for rows in [1, 10, 1000]:
+            self.add_rows(rows - total)
+            total = rows
+            count, response = self.count_queries("get", "/api/sets/?expand=flashcard,comments")
+            self.assertEqual(len(response.data["results"][0]["flashcard"]), 1)
+            counts.append(count)
+        self.assertEqual(counts, [MAX_QUERIES["sets"]["list"] + 2] * 3)
+
+    def test_retrieve_query_count_is_constant(self):
+        self.add_rows(1)
+        flashcard_set = FlashcardSet.objects.get()
+        collection = flashcard_set.flashcard_collection
+        objects = {
+            "flashcards": FlashCard.objects.get(),
+            "sets": flashcard_set,
+            "collections": collection,
+            "comments": Comment.objects.get(),
+            "reviews": Review.objects.get(),
+            "users": self.owner,
+        }
+        for rows in [1, 10, 1000]:
+            # Grow the children of the retrieved objects
+            FlashCard.objects.bulk_create([
+                FlashCard(question="Question", answer="Answer", difficulty="easy", flashcard_set=flashcard_set) for _ in range(rows)])
+            Comment.objects.bulk_create([
+                Comment(comment="Comment", flashcard_set=flashcard_set, user=self.owner) for _ in range(rows)])
+            FlashcardSet.objects.bulk_create([
+                FlashcardSet(title="Set", flashcard_collection=collection) for _ in range(rows)])
+            for endpoint, obj in objects.items():
+                with self.subTest(endpoint=endpoint, rows=rows):
+                    self.client.force_authenticate(self.superuser if endpoint == "users" else self.owner)
+                    count, _ = self.count_queries("get", f"/api/{endpoint}/{obj.id}/")
+                    self.assertLessEqual(count, MAX_QUERIES[endpoint]["retrieve"])
+
+    def test_write_query_counts(self):
+        self.add_rows(10)
+        self.client.force_authenticate(self.owner)
+        flashcard_set = FlashcardSet.objects.first()
+        collection = flashcard_set.flashcard_collection
+        flashcard = FlashCard.objects.first()
+        requests = {
+            "flashcards": (
+                {"question": "Q", "answer": "A", "difficulty": "easy", "flashcard_set": flashcard_set.id},
+                flashcard.id),
+            "sets": (
+                {"title": "Set", "flashcard_collection": collection.id},
+                flashcard_set.id),
+            "collections": (
+                {"title": "Collection", "public": True},
+                collection.id),
+        }
+        for endpoint, (data, pk) in requests.items():
+            with self.subTest(endpoint=endpoint):
+                count, _ = self.count_queries("post", f"/api/{endpoint}/", data)
+                self.assertLessEqual(count, MAX_QUERIES[endpoint]["create"])
+                count, _ = self.count_queries("put", f"/api/{endpoint}/{pk}/", data)
+                self.assertLessEqual(count, MAX_QUERIES[endpoint]["update"])
+
+        # Comments and reviews can only be updated by their author
+        count, response = self.count_queries("post", "/api/comments/", {"comment": "Comment", "flashcard_set": flashcard_set.id})
+        self.assertLessEqual(count, MAX_QUERIES["comments"]["create"])
+        count, _ = self.count_queries("put", f"/api/comments/{response.data['id']}/", {"comment": "Updated"})
+        self.assertLessEqual(count, MAX_QUERIES["comments"]["update"])
+        count, response = self.count_queries("post", "/api/reviews/", {"rating": 4, "flashcard_set": flashcard_set.id})
+        self.assertLessEqual(count, MAX_QUERIES["reviews"]["create"])
+        count, _ = self.count_queries("put", f"/api/reviews/{response.data['id']}/", {"rating": 3})
+        self.assertLessEqual(count, MAX_QUERIES["reviews"]["update"])
@@ -0,0 +1,127 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard
+
+class SearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="owner_password")
+        cls.other_user = User.objects.create_user(username="other", password="other_password")
+        cls.public_collection = FlashcardCollection.objects.create(title="Biology", user=cls.owner, public=True)
+        cls.private_collection = FlashcardCollection.objects.create(title="Private", user=cls.owner, public=False)
+        cls.public_set = FlashcardSet.objects.create(
+            title="Photosynthesis",
+            description="How plants make sugar from light",
+            flashcard_collection=cls.public_collection)
+        cls.private_set = FlashcardSet.objects.create(title="Secret notes", flashcard_collection=cls.private_collection)
+        cls.flashcard = FlashCard.objects.create(
+            question="What does chlorophyll absorb?",
+            answer="Light, mostly red and blue",
+            difficulty="easy",
+            flashcard_set=cls.public_set)
+        cls.private_flashcard = FlashCard.objects.create(
+            question="What absorbs light in private?",
+            answer="Nothing",
+            difficulty="easy",
+            flashcard_set=cls.private_set)
+
+    def search(self, q, **params):
+        response = self.client.get('/api/search', {"q": q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def found(self, q):
+        return [(result["type"], result["id"]) for result in self.search(q).data["results"]]
+
+    #region Matching
+    def test_matches_questions_answers_and_sets(self):
+        self.assertEqual(self.found("chlorophyll"), [("flashcard", self.flashcard.id)])
+        self.assertEqual(self.found("blue"), [("flashcard", self.flashcard.id)])
+        self.assertEqual(self.found("photosynthesis"), [("set", self.public_set.id)])
+        self.assertEqual(self.found("sugar"), [("set", self.public_set.id)])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.found("light plants"), [("set", self.public_set.id)])
+        self.assertEqual(self.found("light zebra"), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.found('chlorophyll OR "photosynthesis" NOT *'), [])
+        self.assertEqual(self.found("* ( )"), [])
+
+    def test_result(self):
+        result = self.search("chlorophyll").data["results"][0]
+        self.assertEqual(result["flashcard_set"], self.public_set.id)
+        self.assertEqual(result["flashcard_collection"], self.public_collection.id)
+        self.assertIn("<mark>chlorophyll</mark>", result["snippet"])
+
+    def test_snippet_is_escaped(self):
+        FlashCard.objects.create(question="<script>mitochondria</script>", answer="Answer", difficulty="easy", flashcard_set=self.public_set)
+        snippet = self.search("mitochondria").data["results"][0]["snippet"]
+        self.assertEqual(snippet, "&lt;script&gt;<mark>mitochondria</mark>&lt;/script&gt;")
+
+    def test_better_matches_first(self):
+        better = FlashCard.objects.create(question="Light light light", answer="Light", difficulty="easy", flashcard_set=self.public_set)
+        self.assertEqual(self.found("light")[0], ("flashcard", better.id))
+
+    def test_missing_query(self):
+        response = self.client.get('/api/search')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    #endregion
+
+    #region Visibility
+    def test_anonymous_only_finds_public(self):
+        self.assertEqual(self.found("absorbs"), [])
+        self.assertEqual(self.found("secret"), [])
+
+    def test_other_user_only_finds_public(self):
+        self.client.force_authenticate(self.other_user)
+        self.assertEqual(self.found("secret"), [])
+
+    def test_owner_finds_private(self):
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.found("absorbs"), [("flashcard", self.private_flashcard.id)])
+        self.assertEqual(self.found("secret"), [("set", self.private_set.id)])
+    #endregion
+
+    #region Index
+    def test_changes_are_indexed(self):
+        self.flashcard.question = "What does rubisco fix?"
+        self.flashcard.save()
+        self.assertEqual(self.found("chlorophyll"), [])
+        self.assertEqual(self.found("rubisco"), [("flashcard", self.flashcard.id)])
+        FlashcardSet.objects.filter(pk=self.public_set.id).update(title="Respiration")
+        self.assertEqual(self.found("respiration"), [("set", self.public_set.id)])
+
+    def test_deletes_are_indexed(self):
+        self.public_collection.delete()
+        self.assertEqual(self.found("light"), [])
+
+    def test_bulk_creates_are_indexed(self):
+        FlashCard.objects.bulk_create([FlashCard(question="Stomata", answer="Pores", difficulty="easy", flashcard_set=self.public_set)])
+        self.assertEqual(len(self.found("stomata")), 1)
+    #endregion
+
+    #region Pagination
+    def test_follow_cursors_through_every_page(self):
+        flashcards = [FlashCard.objects.create(question=f"Leaf {i}", answer="Leaf", difficulty="easy", flashcard_set=self.public_set)
+                      for i in range(4)]
+        FlashcardSet.objects.create(title="Leaf", flashcard_collection=self.public_collection)
+        everything = self.found("leaf")
+        self.assertEqual(len(everything), 5)
+        found = []
+        response = self.search("leaf", page_size=2)
+        while True:
+            found += [(result["type"], result["id"]) for result in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(found, everything)
+        self.assertEqual({pk for kind, pk in found if kind == "flashcard"}, {flashcard.id for flashcard in flashcards})
+
+    def test_invalid_cursor(self):
+        for cursor in ["abc", "WzEsIDJd", "WyJhIiwgInNldCIsIDFd"]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/search', {"q": "light", "cursor": cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    #endregion
@@ -0,0 +1,76 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard
+
+class SetImportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+        cls.standard_user = User.objects.create_user(
+            username="standard_user",
+            password="standard_password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Collection",
+            user=cls.owner,
+            public=True)
+        cls.set = FlashcardSet.objects.create(
+            title="Set",
+            flashcard_collection=cls.collection)
+
+    def setUp(self):
+        self.client.login(username="owner", password="owner_password")
+
+    def upload(self, name, content, **data):
+        return self.client.post(f'/api/sets/{self.set.id}/import/', {"file": SimpleUploadedFile(name, content.encode()), **data}, format="multipart")
+
+    def test_import_csv(self):
+        content = "question,answer,difficulty\n" + "".join(f"Question {i},Answer,easy\n" for i in range(1200))
+        response = self.upload("cards.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"rows": 1200, "created": 1200, "skipped": 0, "errors": []})
+        self.assertEqual(FlashCard.objects.filter(flashcard_set=self.set).count(), 1200)
+
+    def test_import_json_with_columns(self):
+        response = self.upload("cards.txt", '[{"Front": "Q", "Back": "A"}]', format="json", question_column="Front", answer_column="Back", difficulty="hard")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(FlashCard.objects.filter(flashcard_set=self.set, question="Q", answer="A", difficulty="hard").exists())
+
+    def test_import_reports_row_errors(self):
+        response = self.upload("cards.tsv", "question\tanswer\tdifficulty\nQ\tA\teasy\nQ\t\teasy\n")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["created"], response.data["skipped"]), (1, 1))
+        self.assertEqual(response.data["errors"][0]["row"], 2)
+        self.assertIn("answer", response.data["errors"][0]["errors"])
+
+    def test_import_invalid_file(self):
+        response = self.upload("cards.json", '[{"question": "Q", "answer": "A", "difficulty": "easy"}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+        self.assertEqual(FlashCard.objects.count(), 0)
+
+    def test_import_unsupported_format(self):
+        response = self.upload("cards.xlsx", "")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_without_file(self):
+        response = self.client.post(f'/api/sets/{self.set.id}/import/', {}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_as_standard_user(self):
+        self.client.login(username="standard_user", password="standard_password")
+        response = self.upload("cards.csv", "question,answer,difficulty\nQ,A,easy\n")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(FlashCard.objects.count(), 0)
+
+    def test_import_as_logged_out_user(self):
+        self.client.logout()
+        response = self.upload("cards.csv", "question,answer,difficulty\nQ,A,easy\n")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_into_missing_set(self):
+        response = self.client.post('/api/sets/999/import/', {"file": SimpleUploadedFile("cards.csv", b"question\n")}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
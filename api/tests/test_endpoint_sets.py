@@ -1,7 +1,8 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
-from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard
+from django.test import override_settings
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard, Review
 
 class EndpointTests(APITestCase):
     @classmethod
@@ -115,6 +116,41 @@ class EndpointTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertContains(response, self.flashcard_set_private)
     # endregion
+    # region Child counts and ?expand=
+    def test_get_set_has_child_counts(self):
+        FlashCard.objects.create(question="Question", answer="Answer", difficulty="easy", flashcard_set=self.flashcard_set_public)
+        response = self.client.get(f'/api/sets/{self.flashcard_set_public.id}/')
+        self.assertEqual(response.data["flashcard_count"], 1)
+        self.assertEqual(response.data["comment_count"], 0)
+        self.assertNotIn("flashcard", response.data)
+        self.assertNotIn("comments", response.data)
+    
+    def test_get_set_expand_children(self):
+        flashcard = FlashCard.objects.create(question="Question", answer="Answer", difficulty="easy", flashcard_set=self.flashcard_set_public)
+        response = self.client.get(f'/api/sets/{self.flashcard_set_public.id}/?expand=flashcard,comments')
+        self.assertEqual(response.data["flashcard"], [flashcard.id])
+        self.assertEqual(response.data["comments"], [])
+    
+    def test_get_sets_expand_one_relation(self):
+        response = self.client.get('/api/sets/?expand=comments')
+        self.assertIn("comments", response.data["results"][0])
+        self.assertNotIn("flashcard", response.data["results"][0])
+    # endregion
+    # region Ratings
+    def test_get_set_has_ratings(self):
+        Review.objects.create(rating=4, flashcard_set=self.flashcard_set_public, user=self.standard_user)
+        Review.objects.create(rating=5, flashcard_set=self.flashcard_set_public, user=self.superuser)
+        response = self.client.get(f'/api/sets/{self.flashcard_set_public.id}/')
+        self.assertEqual(response.data["rating_average"], 4.5)
+        self.assertEqual(response.data["rating_count"], 2)
+        self.assertEqual(response.data["rating_histogram"], {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1})
+    
+    def test_get_set_histogram_with_sparse_fields(self):
+        Review.objects.create(rating=3, flashcard_set=self.flashcard_set_public, user=self.standard_user)
+        response = self.client.get(f'/api/sets/?fields=id,rating_histogram')
+        histograms = {row["id"]: row["rating_histogram"] for row in response.data["results"]}
+        self.assertEqual(histograms[self.flashcard_set_public.id]["3"], 1)
+    # endregion
     # endregion
     # region Post
     def test_create_set_as_logged_out_user(self):
@@ -151,6 +187,29 @@ class EndpointTests(APITestCase):
             "flashcard_collection": 1
         })
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    @override_settings(QUOTAS={"create_set": 2})
+    def test_create_set_over_daily_limit(self):
+        self.client.login(username="owner", password="owner_password")
+        data = {"title": "New test set", "flashcard_collection": self.flashcard_collection_public.id}
+        for _ in range(2):
+            response = self.client.post('/api/sets/', data=data)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post('/api/sets/', data=data)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(FlashcardSet.objects.filter(title="New test set").count(), 2)
+        # Deleting one of today's sets makes room for another
+        self.client.delete(f'/api/sets/{FlashcardSet.objects.filter(title="New test set").first().id}/')
+        response = self.client.post('/api/sets/', data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    
+    @override_settings(QUOTAS={"create_set": 1})
+    def test_invalid_set_does_not_use_quota(self):
+        self.client.login(username="owner", password="owner_password")
+        response = self.client.post('/api/sets/', data={"title": "", "flashcard_collection": self.flashcard_collection_public.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/sets/', data={"title": "New test set", "flashcard_collection": self.flashcard_collection_public.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
     # endregion
     
     # region Put
@@ -0,0 +1,79 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard, Comment
+
+class SparseFieldsetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Public Collection",
+            user=cls.user,
+            description="Collection description",
+            public=True)
+        cls.set = FlashcardSet.objects.create(
+            title="Public Set",
+            flashcard_collection=cls.collection,
+            description="Set description")
+        cls.flashcard = FlashCard.objects.create(
+            question="Question",
+            answer="Answer",
+            difficulty="easy",
+            flashcard_set=cls.set)
+        cls.comment = Comment.objects.create(
+            comment="Comment",
+            flashcard_set=cls.set,
+            user=cls.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, " ".join(query["sql"] for query in queries)
+
+    def test_fields(self):
+        response, sql = self.get('/api/flashcards/?fields=id,question')
+        self.assertEqual(response.data["results"], [{"id": self.flashcard.id, "question": "Question"}])
+        self.assertNotIn('"answer"', sql)
+        self.assertNotIn("auth_user", sql)
+
+    def test_omit(self):
+        response, sql = self.get('/api/flashcards/?omit=answer')
+        self.assertNotIn("answer", response.data["results"][0])
+        self.assertEqual(response.data["results"][0]["user"], "owner")
+        self.assertNotIn('"answer"', sql)
+
+    def test_fields_through_relation(self):
+        response, _ = self.get('/api/flashcards/?fields=id,user')
+        self.assertEqual(response.data["results"], [{"id": self.flashcard.id, "user": "owner"}])
+
+    def test_set_fields(self):
+        response, sql = self.get(f'/api/sets/{self.set.id}/?fields=id,title,flashcard_count')
+        self.assertEqual(response.data, {"id": self.set.id, "title": "Public Set", "flashcard_count": 1})
+        self.assertNotIn('"description"', sql)
+
+    def test_collection_fields_skip_prefetch(self):
+        response, sql = self.get('/api/collections/?fields=id,title')
+        self.assertEqual(response.data["results"], [{"id": self.collection.id, "title": "Public Collection"}])
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn("flashcard_flashcardset", sql)
+
+    def test_retrieve_comment_without_flashcard_set(self):
+        self.client.login(username="owner", password="owner_password")
+        response, _ = self.get(f'/api/comments/{self.comment.id}/?omit=flashcard_set')
+        self.assertNotIn("flashcard_set", response.data)
+
+    def test_fields_ignored_for_writes(self):
+        self.client.login(username="owner", password="owner_password")
+        response = self.client.post('/api/flashcards/?fields=id', {
+            "question": "New question",
+            "answer": "New answer",
+            "difficulty": "hard",
+            "flashcard_set": self.set.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["answer"], "New answer")
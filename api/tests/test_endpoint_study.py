@@ -0,0 +1,106 @@
+from datetime import timedelta
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, StudyProgress
+
+class StudyTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="owner_password")
+        cls.student = User.objects.create_user(username="student", password="student_password")
+        cls.public_collection = FlashcardCollection.objects.create(title="Public", user=cls.owner, public=True)
+        cls.private_collection = FlashcardCollection.objects.create(title="Private", user=cls.owner, public=False)
+        cls.set = FlashcardSet.objects.create(title="Set", flashcard_collection=cls.public_collection)
+        cls.private_set = FlashcardSet.objects.create(title="Private", flashcard_collection=cls.private_collection)
+        cls.flashcards = [FlashCard.objects.create(question=f"Question {i}", answer="Answer", difficulty="easy", flashcard_set=cls.set)
+                          for i in range(3)]
+        cls.private_flashcard = FlashCard.objects.create(question="Private", answer="Answer", difficulty="easy", flashcard_set=cls.private_set)
+
+    def setUp(self):
+        self.client.force_authenticate(self.student)
+
+    def grade(self, flashcard, grade):
+        return self.client.post(f'/api/flashcards/{flashcard.id}/grade/', {"grade": grade}, format="json")
+
+    #region Grading
+    def test_grade(self):
+        response = self.grade(self.flashcards[0], 4)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["flashcard"], self.flashcards[0].id)
+        self.assertEqual(response.data["interval"], 1)
+        self.assertEqual(response.data["repetitions"], 1)
+        response = self.grade(self.flashcards[0], 5)
+        self.assertEqual(response.data["interval"], 6)
+        self.assertEqual(StudyProgress.objects.filter(user=self.student).count(), 1)
+
+    def test_invalid_grade(self):
+        for grade in [-1, 6, "good", None]:
+            with self.subTest(grade=grade):
+                response = self.grade(self.flashcards[0], grade)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("grade", response.data)
+
+    def test_cant_grade_hidden_or_missing_flashcard(self):
+        self.assertEqual(self.grade(self.private_flashcard, 4).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post('/api/flashcards/999/grade/', {"grade": 4}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_owner_can_grade_private_flashcard(self):
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.grade(self.private_flashcard, 4).status_code, status.HTTP_200_OK)
+
+    def test_anonymous_cant_grade(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.grade(self.flashcards[0], 4).status_code, status.HTTP_403_FORBIDDEN)
+    #endregion
+
+    #region Due queue
+    def due(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_new_flashcards_are_due(self):
+        results = self.due(f'/api/sets/{self.set.id}/due/')
+        self.assertEqual([result["id"] for result in results], [flashcard.id for flashcard in self.flashcards])
+        self.assertIsNone(results[0]["progress"])
+
+    def test_graded_flashcards_wait_until_due(self):
+        self.grade(self.flashcards[0], 5)
+        self.assertEqual([result["id"] for result in self.due(f'/api/sets/{self.set.id}/due/')],
+                         [flashcard.id for flashcard in self.flashcards[1:]])
+        StudyProgress.objects.filter(flashcard=self.flashcards[0]).update(due_at=timezone.now() - timedelta(minutes=1))
+        results = self.due(f'/api/collections/{self.public_collection.id}/due/')
+        self.assertEqual(results[0]["id"], self.flashcards[0].id)
+        self.assertEqual(results[0]["progress"]["repetitions"], 1)
+
+    def test_progress_is_per_user(self):
+        self.grade(self.flashcards[0], 5)
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(len(self.due(f'/api/sets/{self.set.id}/due/')), 3)
+
+    @override_settings(STUDY_MAX_DUE_LIMIT=2)
+    def test_limit(self):
+        self.assertEqual(len(self.due(f'/api/sets/{self.set.id}/due/', limit=1)), 1)
+        self.assertEqual(len(self.due(f'/api/sets/{self.set.id}/due/', limit=10)), 2)
+        response = self.client.get(f'/api/sets/{self.set.id}/due/', {"limit": "many"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hidden_set_is_not_found(self):
+        response = self.client.get(f'/api/sets/{self.private_set.id}/due/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_pk_is_not_found(self):
+        for url in ['/api/sets/abc/due/', '/api/collections/abc/due/']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_anonymous_has_no_queue(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(f'/api/sets/{self.set.id}/due/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    #endregion
@@ -0,0 +1,151 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.test import override_settings
+from flashcard import suggest
+from flashcard.models import FlashcardSet, FlashcardCollection, Review, SetChange
+
+class SuggestTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="owner_password")
+        cls.reviewer = User.objects.create_user(username="reviewer", password="reviewer_password")
+        cls.public_collection = FlashcardCollection.objects.create(title="Public", user=cls.owner, public=True)
+        cls.private_collection = FlashcardCollection.objects.create(title="Private", user=cls.owner, public=False)
+        cls.photosynthesis = FlashcardSet.objects.create(title="Photosynthesis", flashcard_collection=cls.public_collection)
+        cls.photography = FlashcardSet.objects.create(title="Intro to photography", flashcard_collection=cls.public_collection)
+        cls.private_set = FlashcardSet.objects.create(title="Photons", flashcard_collection=cls.private_collection)
+        Review.objects.create(rating=5, flashcard_set=cls.photography, user=cls.reviewer)
+
+    def setUp(self):
+        suggest.reset()
+
+    def suggested(self, prefix, **params):
+        response = self.client.get('/api/suggest', {"prefix": prefix, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [result["title"] for result in response.data["results"]]
+
+    #region Suggestions
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.suggested("Photo"), ["Intro to photography", "Photosynthesis"])
+        self.assertEqual(self.suggested("intro t"), ["Intro to photography"])
+        self.assertEqual(self.suggested("photos"), ["Photosynthesis"])
+        self.assertEqual(self.suggested("x"), [])
+        self.assertEqual(self.suggested(""), [])
+
+    def test_better_rated_first(self):
+        Review.objects.create(rating=5, flashcard_set=self.photosynthesis, user=self.owner)
+        Review.objects.create(rating=4, flashcard_set=self.photosynthesis, user=self.reviewer)
+        self.assertEqual(self.suggested("p"), ["Photosynthesis", "Intro to photography"])
+
+    def test_only_public_sets(self):
+        self.assertNotIn("Photons", self.suggested("photo"))
+
+    def test_limit(self):
+        self.assertEqual(self.suggested("photo", limit=1), ["Intro to photography"])
+        response = self.client.get('/api/suggest', {"prefix": "photo", "limit": "many"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_no_queries_once_built(self):
+        suggest.suggest("photo", 10)
+        with self.assertNumQueries(0):
+            suggest.suggest("photo", 10)
+            suggest.suggest("in", 10)
+
+    def test_many_titles(self):
+        # Enough titles that the trie has branches, to check them against ranking every title
+        FlashcardSet.objects.bulk_create([
+            FlashcardSet(title=f"Part {i % 7} {i}", flashcard_collection=self.public_collection, rating_average=i % 5, rating_count=i)
+            for i in range(300)])
+        titles = {flashcard_set.id: (flashcard_set.title, suggest.weight(flashcard_set.rating_average, flashcard_set.rating_count))
+                  for flashcard_set in FlashcardSet.objects.filter(flashcard_collection=self.public_collection)}
+        def expected(prefix):
+            matches = [pk for pk, (title, _) in titles.items() if any(key.startswith(prefix) for key in suggest.keys_of(title))]
+            matches.sort(key=lambda pk: (-titles[pk][1], titles[pk][0], pk))
+            return [titles[pk][0] for pk in matches[:10]]
+        for prefix in ["p", "part", "part 3", "part 3 1", "3", "29", "intro"]:
+            with self.subTest(prefix=prefix):
+                self.assertEqual(self.suggested(prefix), expected(prefix))
+        FlashcardSet.objects.filter(title__startswith="Part 3").update(rating_average=5, rating_count=1000)
+        FlashcardSet.objects.filter(title="Part 3 3").delete()
+        for flashcard_set in FlashcardSet.objects.filter(title__startswith="Part 3"):
+            titles[flashcard_set.id] = (flashcard_set.title, suggest.weight(5, 1000))
+        titles = {pk: title for pk, title in titles.items() if title[0] != "Part 3 3"}
+        suggest.refresh()
+        for prefix in ["p", "part", "part 3", "3"]:
+            with self.subTest(prefix=prefix):
+                self.assertEqual(self.suggested(prefix), expected(prefix))
+    #endregion
+
+    #region Refreshing
+    def test_changes_are_picked_up(self):
+        self.suggested("p")
+        added = FlashcardSet.objects.create(title="Physics", flashcard_collection=self.public_collection)
+        self.photosynthesis.title = "Calvin cycle"
+        self.photosynthesis.save()
+        suggest.refresh()
+        self.assertEqual(self.suggested("p"), ["Intro to photography", "Physics"])
+        self.assertEqual(self.suggested("calvin"), ["Calvin cycle"])
+        added.delete()
+        suggest.refresh()
+        self.assertEqual(self.suggested("p"), ["Intro to photography"])
+
+    def test_collection_made_public_or_private(self):
+        self.suggested("p")
+        self.private_collection.public = True
+        self.private_collection.save()
+        suggest.refresh()
+        self.assertIn("Photons", self.suggested("photo"))
+        FlashcardCollection.objects.filter(pk=self.public_collection.id).update(public=False)
+        suggest.refresh()
+        self.assertEqual(self.suggested("photo"), ["Photons"])
+
+    def test_changes_are_not_read_by_suggestions(self):
+        self.suggested("p")
+        FlashcardSet.objects.create(title="Physics", flashcard_collection=self.public_collection)
+        with self.assertNumQueries(0):
+            self.assertNotIn("Physics", [result["title"] for result in suggest.suggest("p", 10)])
+
+    def test_refresh_only_reloads_changed_sets(self):
+        suggest.suggest("p", 10)
+        FlashcardSet.objects.create(title="Physics", flashcard_collection=self.public_collection)
+        with self.assertNumQueries(2):
+            # The changes and the changed set
+            suggest.index.refresh()
+
+    def test_saving_unchanged_set_is_not_logged(self):
+        changes = SetChange.objects.count()
+        self.photosynthesis.save()
+        self.assertEqual(SetChange.objects.count(), changes)
+
+    @override_settings(SUGGEST_CHANGE_LOG_SIZE=2)
+    def test_log_is_pruned_and_missed_changes_rebuild(self):
+        self.suggested("p")
+        for title in ["Physics", "Poetry", "Politics"]:
+            FlashcardSet.objects.create(title=title, flashcard_collection=self.public_collection)
+        # Suggestions don't prune the log, refreshes do
+        changes = SetChange.objects.count()
+        self.suggested("p")
+        self.assertEqual(SetChange.objects.count(), changes)
+        suggest.refresh()
+        self.assertEqual(len(self.suggested("p")), 5)
+        self.assertLessEqual(SetChange.objects.count(), 2)
+
+    @override_settings(SUGGEST_MAX_TITLES=1)
+    def test_memory_is_bounded(self):
+        self.assertEqual(self.suggested("photo"), ["Intro to photography"])
+        self.assertEqual(len(suggest.index.tree.titles), 1)
+        FlashcardSet.objects.create(title="Physics", flashcard_collection=self.public_collection)
+        suggest.refresh()
+        self.assertEqual(self.suggested("p"), ["Intro to photography"])
+        physics = FlashcardSet.objects.create(title="Physics 2", flashcard_collection=self.public_collection)
+        Review.objects.create(rating=5, flashcard_set=physics, user=self.owner)
+        Review.objects.create(rating=5, flashcard_set=physics, user=self.reviewer)
+        suggest.refresh()
+        self.assertEqual(self.suggested("p"), ["Physics 2"])
+        self.assertEqual(len(suggest.index.tree.titles), 1)
+
+    def test_no_background_refresh_in_tests(self):
+        self.suggested("p")
+        self.assertIsNone(suggest.index.refresher)
+    #endregion
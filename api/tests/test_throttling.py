@@ -0,0 +1,155 @@
+import io
+from unittest import mock
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from api.models import ThrottleBucket
+from api.throttling import TokenBucketThrottle
+from flashcard.models import FlashcardSet, FlashcardCollection
+
+RATES = {"read": "3/min", "write": "2/min", "bulk": "1/min", "anon_read": "2/min"}
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": RATES})
+class ThrottlingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner",
+            password="owner_password")
+        cls.other_user = User.objects.create_user(
+            username="other",
+            password="other_password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Collection",
+            user=cls.user,
+            public=True)
+        cls.set = FlashcardSet.objects.create(
+            title="Set",
+            flashcard_collection=cls.collection)
+
+    def setUp(self):
+        # Time stands still unless a test moves it
+        self.now = 1000000.0
+        patcher = mock.patch("api.throttling.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url="/api/sets/", **kwargs):
+        return self.client.get(url, **kwargs)
+
+    def test_rate_limit_headers(self):
+        self.client.force_authenticate(self.user)
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["RateLimit-Limit"], "3")
+        self.assertEqual(response["RateLimit-Remaining"], "2")
+        # A token comes back every 20 seconds
+        self.assertEqual(response["RateLimit-Reset"], "20")
+
+    def test_throttled_after_burst(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "20")
+        self.assertEqual(response["RateLimit-Remaining"], "0")
+
+    def test_tokens_come_back_over_time(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            self.get()
+        self.now += 10
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "10")
+        self.now += 10
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        # Never more than the bucket holds, however long the client waits
+        self.now += 3600
+        self.assertEqual(self.get()["RateLimit-Remaining"], "2")
+
+    def test_scopes_have_separate_buckets(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            self.get()
+        self.assertEqual(self.get().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.post("/api/collections/", {"title": "New"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["RateLimit-Limit"], "2")
+
+    def test_bulk_scope(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.get(f"/api/sets/{self.set.id}/export/?format=csv").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get(f"/api/sets/{self.set.id}/export/?format=csv").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Other reads still have their tokens
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+
+    def test_users_have_separate_buckets(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            self.get()
+        self.client.force_authenticate(self.other_user)
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+
+    def test_anonymous_clients_by_ip(self):
+        for _ in range(2):
+            self.assertEqual(self.get(REMOTE_ADDR="203.0.113.1").status_code, status.HTTP_200_OK)
+        response = self.get(REMOTE_ADDR="203.0.113.1")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # The anon_read rate rather than read
+        self.assertEqual(response["RateLimit-Limit"], "2")
+        self.assertEqual(self.get(REMOTE_ADDR="203.0.113.2").status_code, status.HTTP_200_OK)
+
+    def test_scope_without_rate_is_not_throttled(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}):
+            response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("RateLimit-Limit", response)
+        self.assertFalse(ThrottleBucket.objects.exists())
+
+    def test_query_count(self):
+        throttle = TokenBucketThrottle()
+        throttle.key = "read:user:1"
+        throttle.num_requests, throttle.duration = 3, 60
+        self.assertTrue(throttle.take_token())
+        # Read the bucket and write it back
+        with self.assertNumQueries(2):
+            self.assertTrue(throttle.take_token())
+        throttle.take_token()
+        # A client over the limit only costs the read
+        with self.assertNumQueries(1):
+            self.assertFalse(throttle.take_token())
+
+    def test_bucket_changed_while_taking_token(self):
+        throttle = TokenBucketThrottle()
+        throttle.key = "read:user:1"
+        throttle.num_requests, throttle.duration = 3, 60
+        throttle.take_token()
+        # Another request takes a token between this one's read and write, so this one reads the bucket again
+        update = ThrottleBucket.objects.filter(pk=throttle.key).update
+        original = ThrottleBucket.objects.filter
+        def filter(*args, **kwargs):
+            queryset = original(*args, **kwargs)
+            if "tokens" in kwargs and ThrottleBucket.objects.get(pk=throttle.key).tokens == 2:
+                update(tokens=1)
+            return queryset
+        with mock.patch.object(ThrottleBucket.objects, "filter", filter):
+            self.assertTrue(throttle.take_token())
+        self.assertEqual(ThrottleBucket.objects.get(pk=throttle.key).tokens, 0)
+
+    def test_clear_idle_buckets(self):
+        self.client.force_authenticate(self.user)
+        self.get()
+        self.now += 30
+        self.client.force_authenticate(self.other_user)
+        self.get()
+        # Only the first bucket has had a minute (the longest rate period) to fill up again
+        self.now += 31
+        stdout = io.StringIO()
+        call_command("clear_throttle_buckets", stdout=stdout)
+        self.assertIn("Deleted 1 idle throttle buckets.", stdout.getvalue())
+        self.assertEqual(list(ThrottleBucket.objects.values_list("key", flat=True)), [f"read:user:{self.other_user.id}"])
@@ -0,0 +1,110 @@
+import math
+import time
+from django.db import IntegrityError, transaction
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+from .models import ThrottleBucket
+
+# Token bucket throttling. Each scope's rate (e.g. "600/min", set in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]) is also
+# the size of its bucket: a client can make that many requests in a burst, then gets a token back every 1/600th of a minute.
+# Requests are "read" or "write" by method, except on views throttled with BulkThrottle (imports, exports and bulk creates).
+# Signed in users have a bucket per scope, anonymous clients one per scope and IP, using the "anon_<scope>" rate if there is one.
+# Buckets are rows in ThrottleBucket, so every worker process shares them.
+
+# Times to retry when another request changes the bucket between reading and writing it
+RETRIES = 3
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    # The scope of every request, or None for "read" or "write" by method
+    scope = None
+    
+    def __init__(self):
+        # The rate depends on the request, see allow_request
+        pass
+    
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"{self.scope}:user:{request.user.pk}"
+        return f"{self.scope}:anon:{self.get_ident(request)}"
+    
+    # Read when the request comes in rather than at import, so settings can change (e.g. in tests)
+    def get_rate(self):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        if self.anonymous and f"anon_{self.scope}" in rates:
+            return rates[f"anon_{self.scope}"]
+        return rates.get(self.scope)
+    
+    def allow_request(self, request, view):
+        self.scope = type(self).scope or ("read" if request.method in SAFE_METHODS else "write")
+        self.anonymous = not (request.user and request.user.is_authenticated)
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        allowed = self.take_token()
+        # For RateLimitHeadersMiddleware
+        request._request.rate_limit = self.headers()
+        return allowed
+    
+    # Takes a token from the bucket if it has one. Leaves self.tokens as how many are left.
+    def take_token(self):
+        for _ in range(RETRIES):
+            now = time.time()
+            bucket = ThrottleBucket.objects.filter(pk=self.key).values_list("tokens", "updated_at").first()
+            if bucket is None:
+                try:
+                    with transaction.atomic():
+                        ThrottleBucket.objects.create(key=self.key, tokens=self.num_requests - 1, updated_at=now)
+                    self.tokens = self.num_requests - 1
+                    return True
+                except IntegrityError:
+                    # Another request made the bucket first
+                    continue
+            tokens, updated_at = bucket
+            self.tokens = min(self.num_requests, tokens + max(now - updated_at, 0) * self.num_requests / self.duration)
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            # Only write if the bucket hasn't changed since it was read
+            if ThrottleBucket.objects.filter(pk=self.key, tokens=tokens, updated_at=updated_at).update(tokens=self.tokens, updated_at=now):
+                return True
+        # Other requests kept getting there first, so there are plenty of them already
+        self.tokens = 0
+        return False
+    
+    # Seconds until the bucket has a token again
+    def wait(self):
+        return max(1 - self.tokens, 0) * self.duration / self.num_requests
+    
+    def headers(self):
+        return {
+            "RateLimit-Limit": str(self.num_requests),
+            "RateLimit-Remaining": str(math.floor(self.tokens)),
+            # Seconds until the bucket is full
+            "RateLimit-Reset": str(math.ceil((self.num_requests - self.tokens) * self.duration / self.num_requests)),
+        }
+
+class BulkThrottle(TokenBucketThrottle):
+    scope = "bulk"
+
+# Buckets that have had time to fill up again work the same as missing ones, so they can be deleted.
+# Returns how many were.
+def clear_idle_buckets():
+    throttle = TokenBucketThrottle()
+    rates = [rate for rate in api_settings.DEFAULT_THROTTLE_RATES.values() if rate]
+    longest = max((throttle.parse_rate(rate)[1] for rate in rates), default=0)
+    deleted, _ = ThrottleBucket.objects.filter(updated_at__lt=time.time() - longest).delete()
+    return deleted
+
+# Adds the rate limit headers of a throttled API request to its response
+class RateLimitHeadersMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        for header, value in getattr(request, "rate_limit", {}).items():
+            response[header] = value
+        return response
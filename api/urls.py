@@ -14,5 +14,8 @@ router.register(r'reviews', views.ReviewViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('version', APIVersionView.as_view(), name='api')
+    path('version', APIVersionView.as_view(), name='api'),
+    path('search', views.SearchView.as_view(), name='api-search'),
+    path('search/fuzzy', views.FuzzySearchView.as_view(), name='api-fuzzy-search'),
+    path('suggest', views.SuggestView.as_view(), name='api-suggest'),
 ]
\ No newline at end of file
@@ -1,36 +1,54 @@
 #from django.contrib.auth.models import user
 from flashcard.models import *
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 from .serializers import *
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.http import HttpResponseNotFound, HttpResponseBadRequest, HttpResponseNotAllowed, HttpResponseForbidden
-from django.shortcuts import get_object_or_404
-import datetime
+from django.conf import settings
+from flashcard.bulk import bulk_create_flashcards
+from flashcard.importers import FIELDS, ImportFormatError, read_rows, import_flashcards
+from flashcard.anki import import_apkg
+from flashcard.quotas import CREATE_SET, QuotaExceeded, consume
+from flashcard.study import record_grade
+from flashcard.visibility import visible_to
+from flashcard import search, suggest
+from flashcard.permissions import ResolverMixin
 from .variables import API_VERSION
+from .mixins import QueryPlanMixin, ConditionalGetMixin, ExportMixin, StudyMixin
+from .throttling import BulkThrottle
+from .pagination import KeysetPagination
 
-class FlashcardViewSet(viewsets.ModelViewSet):
+class FlashcardViewSet(ResolverMixin, ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = FlashCard.objects.all()
     serializer_class = FlashCardSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # "user" is read through flashcard_set -> flashcard_collection -> user
+    query_plans = {
+        "default": {"select_related": ["flashcard_set__flashcard_collection__user"]},
+        "destroy": {"select_related": ["flashcard_set__flashcard_collection"]},
+    }
+    # Saving or deleting a flashcard moves its set's updated_at forward
+    last_modified_field = "flashcard_set__updated_at"
         
-    def get_queryset(self):
-        if self.request.user.is_superuser:
-            return FlashCard.objects.all()
-        if self.request.user.is_authenticated:
-            return FlashCard.objects.filter(Q(flashcard_set__flashcard_collection__user=self.request.user) | Q(flashcard_set__flashcard_collection__public=True))
-        return FlashCard.objects.filter(flashcard_set__flashcard_collection__public=True)
+    def get_visible_queryset(self):
+        return visible_to(FlashCard.objects.all(), self.request.user)
     
     def create(self, request, *args, **kwargs):
         if not self.request.user.is_authenticated:
             return HttpResponseForbidden("You do not have permission to add to this set.")
         
-        flashcard_set = get_object_or_404(FlashcardSet, id=request.data.get("flashcard_set"))
-        flashcard_collection = flashcard_set.flashcard_collection
+        # The serializer gets the set from the resolver too, rather than looking it up again
+        flashcard_set = self.resolver.flashcard_set(request.data.get("flashcard_set"))
         
-        if self.request.user != flashcard_collection.user:
+        if not self.resolver.can_write(flashcard_set):
             return HttpResponseForbidden("You are trying to add a set to a collection that you do not own.")
         else:
             return super().create(request, *args, **kwargs)
@@ -39,10 +57,9 @@ class FlashcardViewSet(viewsets.ModelViewSet):
         if not self.request.user.is_authenticated:
             return HttpResponseForbidden("You do not have permission to add to this set.")
         
-        flashcard_set = get_object_or_404(FlashcardSet, id=request.data.get("flashcard_set"))
-        flashcard_collection = flashcard_set.flashcard_collection
+        flashcard_set = self.resolver.flashcard_set(request.data.get("flashcard_set"))
         
-        if self.request.user != flashcard_collection.user:
+        if not self.resolver.can_write(flashcard_set):
             return HttpResponseForbidden("You do not have permission to modify this.")
         return super().update(request, *args, **kwargs)
     
@@ -50,47 +67,120 @@ class FlashcardViewSet(viewsets.ModelViewSet):
         if not self.request.user.is_authenticated:
             return HttpResponseForbidden("You do not have permission to add to this set.")
         
-        flashcard = get_object_or_404(FlashCard, id=self.kwargs.get("pk"))
-        flashcard_collection = flashcard.flashcard_set.flashcard_collection
+        flashcard = self.resolver.flashcard(self.kwargs.get("pk"))
         
-        if not self.request.user.is_superuser and self.request.user != flashcard_collection.user:
+        if not self.resolver.can_delete(flashcard):
             return HttpResponseForbidden("You do not have permission to modify this.")
         return super().destroy(request, *args, **kwargs)
 
-class FlashcardSetViewSet(viewsets.ModelViewSet) :
+    # Record how well the user remembered a flashcard they can see (0 to 5), and return when it is next due
+    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    def grade(self, request, *args, **kwargs):
+        flashcard = self.resolver.flashcard(self.kwargs.get("pk"))
+        if not self.resolver.can_read(flashcard):
+            raise NotFound("No FlashCard matches the given query.")
+        serializer = GradeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        progress = record_grade(request.user, flashcard, serializer.validated_data["grade"])
+        return Response(StudyProgressSerializer(progress).data)
+
+    # Create many flashcards (for one or more sets) in one request.
+    # Takes a list of flashcards and either creates all of them, or none and returns the errors for each row.
+    @action(detail=False, methods=["post"], throttle_classes=[BulkThrottle])
+    def bulk(self, request, *args, **kwargs):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({"non_field_errors": ["Expected a list of flashcards."]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.API_BULK_MAX_SIZE:
+            return Response({"non_field_errors": [f"Can't create more than {settings.API_BULK_MAX_SIZE} flashcards at once."]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Validate every row in memory, without touching the database
+        serializer = FlashCardBulkSerializer()
+        validated_rows, errors = [], []
+        for row in rows:
+            try:
+                validated_rows.append(serializer.run_validation(row))
+                errors.append({})
+            except ValidationError as e:
+                validated_rows.append(None)
+                errors.append(e.detail)
+        
+        # One query for every set in the request
+        set_ids = {row["flashcard_set"] for row in validated_rows if row is not None}
+        flashcard_sets = self.resolver.prefetch(FlashcardSet, set_ids)
+        allowed = self.resolver.writable(FlashcardSet, set_ids)
+        for row, row_errors in zip(validated_rows, errors):
+            if row is None:
+                continue
+            if row["flashcard_set"] not in flashcard_sets:
+                row_errors["flashcard_set"] = [f'Invalid pk "{row["flashcard_set"]}" - object does not exist.']
+            elif row["flashcard_set"] not in allowed:
+                row_errors["flashcard_set"] = ["You do not have permission to add to this set."]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        flashcards = [FlashCard(
+            question=row["question"],
+            answer=row["answer"],
+            difficulty=row["difficulty"],
+            flashcard_set=flashcard_sets[row["flashcard_set"]]) for row in validated_rows]
+        bulk_create_flashcards(flashcards)
+        return Response(FlashCardSerializer(flashcards, many=True).data, status=status.HTTP_201_CREATED)
+
+class FlashcardSetViewSet(ResolverMixin, ExportMixin, StudyMixin, ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet) :
     queryset = FlashcardSet.objects.all()
     serializer_class = FlashcardSetSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # "owner" is read through flashcard_collection -> user
+    query_plans = {
+        "default": {"select_related": ["flashcard_collection__user"]},
+        "destroy": {"select_related": ["flashcard_collection"]},
+    }
+    # version counts comment changes, which don't move updated_at
+    last_modified_field = "updated_at"
+    version_fields = ["version"]
+    export_lookup = "flashcard_set"
+    export_name = "set"
+    study_lookup = "flashcard_set"
+    # Child id lists for ?expand=, loaded with one prefetch per relation
+    expand_prefetches = {
+        "flashcard": Prefetch("flashcard", queryset=FlashCard.objects.only("id", "flashcard_set_id")),
+        "comments": Prefetch("comments", queryset=Comment.objects.only("id", "flashcard_set_id")),
+    }
+    
+    def get_visible_queryset(self):
+        return visible_to(FlashcardSet.objects.all(), self.request.user)
     
     def get_queryset(self):
-        if self.request.user.is_superuser:
-            return FlashcardSet.objects.all()
-        if self.request.user.is_authenticated:
-            return FlashcardSet.objects.filter(Q(flashcard_collection__user=self.request.user) | Q(flashcard_collection__public=True))
-        return FlashcardSet.objects.filter(flashcard_collection__public=True)
+        queryset = self.get_visible_queryset()
+        if self.action != "destroy":
+            for field in get_expanded_fields(self.request, FlashcardSetSerializer.expandable_fields):
+                queryset = queryset.prefetch_related(self.expand_prefetches[field])
+        return self.apply_query_plan(queryset)
     
     def create(self, request, *args, **kwargs):
         if self.request.user.is_anonymous:
             return HttpResponseNotAllowed("Please log in to create a set.")
         
-        if FlashcardSet.objects.filter(created_at__date = datetime.datetime.now()).count() > 19:
-            return HttpResponseNotAllowed("The daily limit for flashcards created has been reached. Please remove an existing set created today or try again tomorrow.")
+        flashcard_collection = self.resolver.collection(request.data.get("flashcard_collection"))
         
-        flashcard_collection = get_object_or_404(FlashcardCollection, id=request.data.get("flashcard_collection"))
-        
-        if request.user != flashcard_collection.user:
+        if not self.resolver.can_write(flashcard_collection):
             return HttpResponseForbidden("You are trying to add a set to a collection that you do not own.")
-        else:
-            return super().create(request, *args, **kwargs)
+        # A set that fails validation doesn't use up the quota
+        try:
+            with transaction.atomic():
+                consume(request.user, CREATE_SET)
+                return super().create(request, *args, **kwargs)
+        except QuotaExceeded:
+            return HttpResponseNotAllowed("The daily limit for flashcards created has been reached. Please remove an existing set created today or try again tomorrow.")
         
     def update(self, request, *args, **kwargs):
         if self.request.user.is_anonymous:
             return HttpResponseForbidden("You do not have permission to modify this.")
         
-        flashcard_set_id = self.kwargs.get("pk")
-        flashcard_set = get_object_or_404(FlashcardSet, id=flashcard_set_id)
+        flashcard_set = self.resolver.flashcard_set(self.kwargs.get("pk"))
         
-        if flashcard_set.flashcard_collection.user != request.user:
+        if not self.resolver.can_write(flashcard_set):
             return HttpResponseForbidden("You are trying to move this set to a collection that you do not own.")
         # update time
         return super().update(request, *args, **kwargs)
@@ -99,71 +189,120 @@ class FlashcardSetViewSet(viewsets.ModelViewSet) :
         if self.request.user.is_anonymous:
             return HttpResponseForbidden("You do not have permission to modify this.")
         
-        flashcard_set_id = self.kwargs.get("pk")
-        flashcard_set = get_object_or_404(FlashcardSet, id=flashcard_set_id)
+        flashcard_set = self.resolver.flashcard_set(self.kwargs.get("pk"))
         
-        if not request.user.is_superuser and flashcard_set.flashcard_collection.user != request.user:
+        if not self.resolver.can_delete(flashcard_set):
             return HttpResponseForbidden("You do not have permission to modify this.")
         return super().destroy(request, *args, **kwargs)
 
-class FlashcardCollectionViewSet(viewsets.ModelViewSet):
+    # Import flashcards into this set from an uploaded CSV, TSV, JSON or NDJSON "file".
+    # The upload is read and inserted in batches, so large files don't have to fit in memory.
+    # Optional form fields: "format" (otherwise taken from the file name), "difficulty" (for rows without one)
+    # and "<field>_column" to read question, answer or difficulty from a differently named column.
+    @action(detail=True, methods=["post"], url_path="import", parser_classes=[MultiPartParser], throttle_classes=[BulkThrottle])
+    def import_flashcards(self, request, *args, **kwargs):
+        flashcard_set = self.resolver.flashcard_set(self.kwargs.get("pk"))
+        if not self.resolver.can_write(flashcard_set):
+            return HttpResponseForbidden("You do not have permission to add to this set.")
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"file": ["No file was uploaded."]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        columns = {field: request.data[f"{field}_column"] for field in FIELDS if request.data.get(f"{field}_column")}
+        try:
+            rows = read_rows(upload, request.data.get("format"), upload.name)
+            report = import_flashcards(flashcard_set, rows, columns, request.data.get("difficulty"))
+        except ImportFormatError as e:
+            return Response({"file": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report["created"] else status.HTTP_200_OK)
+
+class FlashcardCollectionViewSet(ResolverMixin, ExportMixin, StudyMixin, ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = FlashcardCollection.objects.all()
     serializer_class = FlashcardCollectionSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # "flashcard_set" is a list of child set ids
+    query_plans = {
+        "default": {"prefetch_related": [Prefetch("flashcard_set", queryset=FlashcardSet.objects.only("id", "flashcard_collection_id"))]},
+        "destroy": {},
+    }
+    # Saving or deleting a set moves its collection's updated_at forward
+    last_modified_field = "updated_at"
+    export_lookup = "flashcard_set__flashcard_collection"
+    export_name = "collection"
+    study_lookup = "flashcard_set__flashcard_collection"
     
-    def get_queryset(self):
-        if self.request.user.is_superuser:
-            return FlashcardCollection.objects.all()
-        if self.request.user.is_authenticated:
-            return FlashcardCollection.objects.filter(Q(user=self.request.user) | Q(public=True))
-        return FlashcardCollection.objects.filter(public=True)
+    def get_visible_queryset(self):
+        return visible_to(FlashcardCollection.objects.all(), self.request.user)
     
     def update(self, request, *args, **kwargs):
-        if not self.request.user.is_authenticated or request.user != self.get_object().user:
+        if not self.resolver.can_write(self.get_object()):
             return HttpResponseForbidden("You don't have permission to modify this set.")
         return super().update(request, *args, **kwargs)
         
     def destroy(self, request, *args, **kwargs):
         if not self.request.user.is_authenticated:
             return HttpResponseForbidden("You don't have permission to delete this.")
-        if not self.request.user.is_superuser and request.user != self.get_object().user:
+        if not self.resolver.can_delete(self.get_object()):
             return HttpResponseForbidden("You don't have permission to delete this.")
         return super().destroy(request, *args, **kwargs)
 
-class CommentViewSet(viewsets.ModelViewSet):
+    # Import an uploaded Anki package (.apkg) "file" into this collection, as one new set per deck.
+    # Optional form field "difficulty" is used for notes that aren't tagged easy, medium or hard.
+    @action(detail=True, methods=["post"], url_path="import", parser_classes=[MultiPartParser], throttle_classes=[BulkThrottle])
+    def import_anki(self, request, *args, **kwargs):
+        collection = self.resolver.collection(self.kwargs.get("pk"))
+        if not self.resolver.can_write(collection):
+            return HttpResponseForbidden("You do not have permission to add to this collection.")
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"file": ["No file was uploaded."]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        difficulty = request.data.get("difficulty") or Difficulty.MEDIUM.value
+        try:
+            report = import_apkg(upload, collection, difficulty, user=request.user)
+        except ImportFormatError as e:
+            return Response({"file": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        except QuotaExceeded:
+            return HttpResponseNotAllowed("The daily limit for flashcards created has been reached. Please remove an existing set created today or try again tomorrow.")
+        return Response(report, status=status.HTTP_201_CREATED if report["created"] else status.HTTP_200_OK)
+
+class CommentViewSet(ResolverMixin, QueryPlanMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
     queryset = Comment.objects.all()
+    # Comments only serialize their own columns and foreign key ids, so no joins are needed
+    query_plans = {}
     
-    def get_queryset(self):
-        if (not self.request.user.is_superuser):
-            return Comment.objects.filter(Q(user=self.request.user) | Q(flashcard_set__flashcard_collection__public=True))
-        else:
-            return Comment.objects.all()
+    def get_visible_queryset(self):
+        return visible_to(Comment.objects.all(), self.request.user)
         
     def create(self, request, *args, **kwargs):
-        flashcard_set = get_object_or_404(FlashcardSet, id=request.data.get("flashcard_set"))
-        flashcard_collection = flashcard_set.flashcard_collection
-        if ((request.user != flashcard_collection.user) and not flashcard_collection.public):
+        flashcard_set = self.resolver.flashcard_set(request.data.get("flashcard_set"))
+        if not self.resolver.can_read(flashcard_set):
             return HttpResponseForbidden("You are trying to add a comment to a private set that you do not own.")
         else:
             return super().create(request, *args, **kwargs)
     
     def update(self, request, *args, **kwargs):
-        if request.user != self.get_object().user:
+        if request.user.id != self.get_object().user_id:
             return HttpResponseForbidden("You do not have permission to modify this set.")
         else:
             return super().update(request, *args, **kwargs)
     
     def destroy(self, request, *args, **kwargs):
-        if request.user != self.get_object().user:
+        if request.user.id != self.get_object().user_id:
             return HttpResponseForbidden("You do not have permission to delete this set.")
         else:
             return super().destroy(request, *args, **kwargs)
     
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    # "comment" is a list of the user's comment ids
+    query_plans = {
+        "default": {"prefetch_related": [Prefetch("comment", queryset=Comment.objects.only("id", "user_id"))]},
+        "destroy": {},
+    }
     
     def destroy(self, request, *args, **kwargs):
         if not self.request.user.is_superuser:
@@ -182,39 +321,35 @@ class UserViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         return [permissions.IsAdminUser()]
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ResolverMixin, QueryPlanMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     queryset = Review.objects.all()
+    # Reviews only serialize their own columns and foreign key ids, so no joins are needed
+    query_plans = {}
     
-    def get_queryset(self):
-        if self.request.user.is_superuser:
-            return Review.objects.all()
-        if self.request.user.is_authenticated:
-            return Review.objects.filter(Q(user=self.request.user) | Q(flashcard_set__flashcard_collection__public=True))
-        return Review.objects.filter(flashcard_set__flashcard_collection__public=True)
+    def get_visible_queryset(self):
+        return visible_to(Review.objects.all(), self.request.user)
     
     def create(self, request, *args, **kwargs):
-        flashcard_set = get_object_or_404(FlashcardSet, id=request.data.get("flashcard_set"))
-        flashcard_collection = flashcard_set.flashcard_collection
-        if ((request.user != flashcard_collection.user) and not flashcard_collection.public):
+        flashcard_set = self.resolver.flashcard_set(request.data.get("flashcard_set"))
+        if not self.resolver.can_read(flashcard_set):
             return HttpResponseForbidden("You are trying to add a review to a private set that you do not own.")
         
-        x = Review.objects.filter(
-            user=self.request.user, 
-            flashcard_set__id=flashcard_set.id).first()
-        if x is not None:
+        # The unique constraint on (user, flashcard_set) rejects a second review
+        try:
+            return super().create(request, *args, **kwargs)
+        except IntegrityError:
             return HttpResponseForbidden("You have already created a review for this set.")
-        return super().create(request, *args, **kwargs)
 
     def update(self, request, *args, **kwargs):
-        if request.user != self.get_object().user:
+        if request.user.id != self.get_object().user_id:
             return HttpResponseForbidden("You do not have permission to modify this review.")
         else:
             return super().update(request, *args, **kwargs)
 
     def destroy(self, request, *args, **kwargs):
-        if not request.user.is_superuser and request.user != self.get_object().user:
+        if not request.user.is_superuser and request.user.id != self.get_object().user_id:
             return HttpResponseForbidden("You do not have permission to delete this set.")
         else:
             return super().destroy(request, *args, **kwargs)
@@ -223,4 +358,49 @@ class ReviewViewSet(viewsets.ModelViewSet):
 class APIVersionView(APIView):
     def get(self, request):
         # Return the API version
-        return Response({"version": API_VERSION})
\ No newline at end of file
+        return Response({"version": API_VERSION})
+
+# GET /api/search?q= - flashcards and sets the user can see that have every word of q, best matches first,
+# with the matches in <mark> tags in each result's snippet (see flashcard/search.py)
+class SearchView(APIView):
+    def get(self, request):
+        q = request.query_params.get("q", "").strip()
+        if not q:
+            raise ValidationError({"q": ["This field is required."]})
+        after = None
+        if "cursor" in request.query_params:
+            try:
+                after = search.decode_cursor(request.query_params["cursor"])
+            except ValueError:
+                raise NotFound("Invalid cursor.")
+        page_size = KeysetPagination().get_page_size(request)
+        results, next_after = search.search(request.user, q, page_size, after)
+        next_url = None
+        if next_after is not None:
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", search.encode_cursor(next_after))
+        return Response({"next": next_url, "results": results})
+
+# GET /api/search/fuzzy?q= - the set and collection titles the user can see that are most like q, even misspelt
+# (see fuzzy_search in flashcard/search.py). ?limit= asks for up to API_FUZZY_SEARCH_MAX_LIMIT results.
+class FuzzySearchView(APIView):
+    def get(self, request):
+        q = request.query_params.get("q", "").strip()
+        if not q:
+            raise ValidationError({"q": ["This field is required."]})
+        try:
+            limit = int(request.query_params.get("limit", settings.API_FUZZY_SEARCH_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+        limit = max(1, min(limit, settings.API_FUZZY_SEARCH_MAX_LIMIT))
+        return Response({"results": search.fuzzy_search(request.user, q, limit)})
+
+# GET /api/suggest?prefix= - public set titles with a word starting with prefix, best rated and most reviewed first.
+# Answered from the process's in-memory index (see flashcard/suggest.py), without querying the database.
+class SuggestView(APIView):
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", settings.SUGGEST_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+        limit = max(1, min(limit, settings.SUGGEST_LIMIT))
+        return Response({"results": suggest.suggest(request.query_params.get("prefix", ""), limit)})
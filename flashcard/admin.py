@@ -6,4 +6,6 @@ admin.site.register(FlashCard)
 admin.site.register(FlashcardSet)
 admin.site.register(FlashcardCollection)
 admin.site.register(Comment)
-admin.site.register(Review)
\ No newline at end of file
+admin.site.register(Review)
+admin.site.register(Quota)
+admin.site.register(StudyProgress)
@@ -0,0 +1,119 @@
+import math
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils.timezone import now
+from .models import Comment, FlashCard, FlashcardCollection, FlashcardSet, Review, RATINGS
+
+# Sets are checked this many at a time
+CHUNK_SIZE = 1000
+SET_COUNTER_FIELDS = ["flashcard_count", "comment_count"]
+COLLECTION_COUNTER_FIELDS = ["set_count", "card_count"]
+RATING_FIELDS = ["rating_sum", "rating_count", "rating_average", *(f"rating_{rating}_count" for rating in RATINGS)]
+
+# The rating totals each set should have, worked out from its reviews in one grouped query
+def rating_aggregates(set_ids):
+    totals = {set_id: {"rating_sum": 0, "rating_count": 0, "rating_average": None, **{f"rating_{rating}_count": 0 for rating in RATINGS}} for set_id in set_ids}
+    rows = Review.objects.filter(flashcard_set__in=set_ids).order_by().values("flashcard_set").annotate(
+        rating_sum=Sum("rating"),
+        rating_count=Count("pk"),
+        **{f"rating_{rating}_count": Count("pk", filter=Q(rating=rating)) for rating in RATINGS})
+    for row in rows:
+        set_id = row.pop("flashcard_set")
+        row["rating_average"] = row["rating_sum"] / row["rating_count"]
+        totals[set_id] = row
+    return totals
+
+def is_stale(flashcard_set, totals):
+    for field, value in totals.items():
+        current = getattr(flashcard_set, field)
+        if field == "rating_average" and current is not None and value is not None:
+            if not math.isclose(current, value):
+                return True
+        elif current != value:
+            return True
+    return False
+
+# Recalculates every set's rating totals from its reviews, fixing any that have drifted (e.g. after a bulk update of reviews).
+# Works through the sets in primary key order a chunk at a time. Each chunk is locked while it is checked,
+# so reviews saved at the same time are either counted here or added on top afterwards, never lost.
+# progress, if given, is called with the number of sets checked and fixed after each chunk.
+# Returns (checked, fixed).
+def rebuild_rating_aggregates(chunk_size=CHUNK_SIZE, progress=None):
+    checked = fixed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            sets = list(FlashcardSet.objects.select_for_update().filter(pk__gt=last_id).order_by("pk").only("pk", *RATING_FIELDS)[:chunk_size])
+            if not sets:
+                break
+            totals = rating_aggregates([flashcard_set.pk for flashcard_set in sets])
+            stale = []
+            for flashcard_set in sets:
+                if is_stale(flashcard_set, totals[flashcard_set.pk]):
+                    for field, value in totals[flashcard_set.pk].items():
+                        setattr(flashcard_set, field, value)
+                    # Ratings are part of the set's API representation
+                    flashcard_set.version = F("version") + 1
+                    stale.append(flashcard_set)
+            FlashcardSet.objects.bulk_update(stale, RATING_FIELDS + ["version"])
+        last_id = sets[-1].pk
+        checked += len(sets)
+        fixed += len(stale)
+        if progress is not None:
+            progress(checked, fixed)
+    return checked, fixed
+
+# The counts each set should have, from one grouped query per counter
+def set_counters(set_ids):
+    totals = {set_id: {field: 0 for field in SET_COUNTER_FIELDS} for set_id in set_ids}
+    for field, model in [("flashcard_count", FlashCard), ("comment_count", Comment)]:
+        for set_id, count in model.objects.filter(flashcard_set__in=set_ids).order_by().values_list("flashcard_set").annotate(Count("pk")):
+            totals[set_id][field] = count
+    return totals
+
+# The same for collections, counting their flashcards directly rather than trusting their sets' counts
+def collection_counters(collection_ids):
+    totals = {collection_id: {field: 0 for field in COLLECTION_COUNTER_FIELDS} for collection_id in collection_ids}
+    sets = FlashcardSet.objects.filter(flashcard_collection__in=collection_ids).values_list("flashcard_collection")
+    cards = FlashCard.objects.filter(flashcard_set__flashcard_collection__in=collection_ids).values_list("flashcard_set__flashcard_collection")
+    for field, rows in [("set_count", sets), ("card_count", cards)]:
+        for collection_id, count in rows.order_by().annotate(Count("pk")):
+            totals[collection_id][field] = count
+    return totals
+
+# Works through model's rows in primary key order a chunk at a time, locking each chunk while it is checked, and sets
+# the fields of rows that don't match counters(ids) (plus the changes in touch, which mark the row as updated).
+# Returns (checked, fixed).
+def rebuild_fields(model, fields, counters, touch, chunk_size, progress):
+    checked = fixed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = list(model.objects.select_for_update().filter(pk__gt=last_id).order_by("pk").only("pk", *fields)[:chunk_size])
+            if not rows:
+                break
+            totals = counters([row.pk for row in rows])
+            stale = []
+            for row in rows:
+                if any(getattr(row, field) != value for field, value in totals[row.pk].items()):
+                    for field, value in {**totals[row.pk], **touch}.items():
+                        setattr(row, field, value)
+                    stale.append(row)
+            model.objects.bulk_update(stale, fields + list(touch))
+        last_id = rows[-1].pk
+        checked += len(rows)
+        fixed += len(stale)
+        if progress is not None:
+            progress(checked, fixed)
+    return checked, fixed
+
+# Recounts every set's flashcards and comments, and every collection's sets and flashcards, fixing any that have
+# drifted (e.g. after deleting flashcards with raw SQL). progress, if given, is called with the number of rows
+# checked and fixed after each chunk. Returns (checked, fixed), sets and collections together.
+def rebuild_counters(chunk_size=CHUNK_SIZE, progress=None):
+    sets_checked, sets_fixed = rebuild_fields(FlashcardSet, SET_COUNTER_FIELDS, set_counters, {"version": F("version") + 1}, chunk_size, progress)
+    # Carry on counting from the sets
+    collection_progress = progress and (lambda checked, fixed: progress(sets_checked + checked, sets_fixed + fixed))
+    collections_checked, collections_fixed = rebuild_fields(FlashcardCollection, COLLECTION_COUNTER_FIELDS, collection_counters,
+                                                            {"updated_at": now()}, chunk_size, collection_progress)
+    return sets_checked + collections_checked, sets_fixed + collections_fixed
@@ -0,0 +1,121 @@
+import html
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import strip_tags
+from .bulk import BATCH_SIZE
+from .importers import ImportFormatError, import_rows
+from .models import FlashcardSet, Difficulty
+from .quotas import CREATE_SET, consume
+
+# An Anki package (.apkg) is a zip holding the deck's SQLite database (plus any media, which is ignored).
+# Each deck becomes a FlashcardSet and each note a FlashCard, with the note's first field as the question
+# and its second as the answer.
+
+DIFFICULTIES = {tag.value for tag in Difficulty}
+# The note's first card decides its deck. Cards in a filtered deck remember their real deck in odid.
+NOTES_QUERY = """
+    SELECT notes.flds, notes.tags, (
+        SELECT CASE WHEN cards.odid THEN cards.odid ELSE cards.did END
+        FROM cards WHERE cards.nid = notes.id ORDER BY cards.ord LIMIT 1)
+    FROM notes ORDER BY notes.id
+"""
+LINE_BREAK = re.compile(r"<br\s*/?>|</div>|</p>", re.IGNORECASE)
+SOUND = re.compile(r"\[sound:[^\]]*\]")
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# The collection database inside the package, as an open zip member
+def open_collection(file):
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ImportFormatError("The file isn't an Anki package (.apkg).")
+    names = set(archive.namelist())
+    # Packages in the newer compressed format also hold a placeholder collection.anki2, so check for them first
+    if "collection.anki21b" in names:
+        raise ImportFormatError("This deck uses Anki's newer compressed format. Export it again with \"Support older Anki versions\" ticked.")
+    for name in ["collection.anki21", "collection.anki2"]:
+        if name in names:
+            info = archive.getinfo(name)
+            if info.file_size > settings.ANKI_MAX_COLLECTION_SIZE:
+                raise collection_too_large()
+            return archive.open(info)
+    raise ImportFormatError("The file isn't an Anki package (.apkg).")
+
+def collection_too_large():
+    return ImportFormatError(f"The Anki collection unpacks to more than {settings.ANKI_MAX_COLLECTION_SIZE} bytes.")
+
+# Unpack the collection to target, a chunk at a time. A small package can unpack to a lot, and the size the zip
+# gives for it is only what the package claims, so the bytes are counted as they are written as well.
+def copy_collection(source, target):
+    copied = 0
+    while chunk := source.read(COPY_CHUNK_SIZE):
+        copied += len(chunk)
+        if copied > settings.ANKI_MAX_COLLECTION_SIZE:
+            raise collection_too_large()
+        target.write(chunk)
+
+# Deck names by id. Newer collections have a decks table, older ones keep them as JSON in col.decks.
+def read_decks(db):
+    tables = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "decks" in tables:
+        # Nested deck names are separated with \x1f rather than "::" here
+        return {deck_id: name.replace("\x1f", "::") for deck_id, name in db.execute("SELECT id, name FROM decks")}
+    (decks,) = db.execute("SELECT decks FROM col").fetchone()
+    return {int(deck_id): deck["name"] for deck_id, deck in json.loads(decks).items()}
+
+# Anki fields are HTML, flashcards are plain text
+def clean_field(value):
+    value = SOUND.sub("", LINE_BREAK.sub("\n", value))
+    return html.unescape(strip_tags(value)).replace("\xa0", " ").strip()
+
+def note_row(fields, tags):
+    fields = fields.split("\x1f")
+    # A note tagged easy, medium or hard gets that difficulty
+    difficulty = next((tag for tag in tags.lower().split() if tag in DIFFICULTIES), None)
+    return {
+        "question": clean_field(fields[0]),
+        "answer": clean_field(fields[1]) if len(fields) > 1 else "",
+        "difficulty": difficulty,
+    }
+
+# Imports the notes in an Anki package into new sets (one per deck) in collection, all in one transaction.
+# Returns import_rows' report, plus the sets that were created. Each set uses one of user's daily create_set quota
+# (if a user is given), and QuotaExceeded rolls the whole import back.
+def import_apkg(file, collection, default_difficulty=Difficulty.MEDIUM.value, batch_size=BATCH_SIZE, progress=None, user=None):
+    # sqlite3 can only open a database on disk
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "collection.anki2")
+        with open_collection(file) as source, open(path, "wb") as target:
+            copy_collection(source, target)
+        db = sqlite3.connect(path)
+        try:
+            with transaction.atomic():
+                return import_notes(db, collection, default_difficulty, batch_size, progress, user)
+        except sqlite3.DatabaseError as e:
+            raise ImportFormatError(f"Couldn't read the Anki collection: {e}")
+        finally:
+            db.close()
+
+def import_notes(db, collection, default_difficulty, batch_size, progress, user):
+    decks = read_decks(db)
+    sets = {}
+
+    # Sets are only created for decks that have notes
+    def rows():
+        for fields, tags, deck_id in db.execute(NOTES_QUERY):
+            if deck_id not in sets:
+                if user is not None:
+                    consume(user, CREATE_SET)
+                title = decks.get(deck_id, "Default")[:FlashcardSet._meta.get_field("title").max_length]
+                sets[deck_id] = FlashcardSet.objects.create(title=title, flashcard_collection=collection)
+            yield sets[deck_id], note_row(fields, tags)
+
+    report = import_rows(rows(), default_difficulty=default_difficulty, batch_size=batch_size, progress=progress)
+    report["sets"] = [{"id": flashcard_set.id, "title": flashcard_set.title} for flashcard_set in sets.values()]
+    return report
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FlashcardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'flashcard'
+
+    def ready(self):
+        # Connect the quota and tile cache signal receivers
+        from . import quotas, tiles
@@ -0,0 +1,29 @@
+from collections import Counter
+from itertools import islice
+from django.db import transaction
+from .models import FlashCard, FlashcardSet
+
+BATCH_SIZE = 500
+
+# Insert flashcards (any iterable of unsaved FlashCard objects) in batches inside one transaction.
+# Unlike FlashCard.save() this skips full_clean(), so the caller has to validate the rows first.
+# Each affected set (and its collection) is counted and touched once at the end instead of once per card.
+# progress, if given, is called with the running total after each batch.
+# Returns the number of flashcards created.
+def bulk_create_flashcards(flashcards, batch_size=BATCH_SIZE, progress=None):
+    flashcards = iter(flashcards)
+    set_counts = Counter()
+    created = 0
+    with transaction.atomic():
+        while True:
+            batch = list(islice(flashcards, batch_size))
+            if not batch:
+                break
+            FlashCard.objects.bulk_create(batch, batch_size=batch_size)
+            set_counts.update(flashcard.flashcard_set_id for flashcard in batch)
+            created += len(batch)
+            if progress is not None:
+                progress(created)
+        for set_id, count in set_counts.items():
+            FlashcardSet.change_flashcard_count(set_id, count)
+    return created
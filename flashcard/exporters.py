@@ -0,0 +1,42 @@
+import csv
+import io
+import json
+from itertools import islice
+
+# Rows are read from the database and written out this many at a time
+CHUNK_SIZE = 2000
+# question, answer and difficulty use the same names as the importers, so an export can be imported again
+EXPORT_FIELDS = ["id", "question", "answer", "difficulty", "flashcard_set", "flashcard_set_title"]
+
+# Streams the flashcards in a queryset, with their set's title from the same (joined) query, as tuples in EXPORT_FIELDS order
+def export_rows(flashcards):
+    return flashcards.order_by("flashcard_set_id", "id").values_list(
+        "id", "question", "answer", "difficulty", "flashcard_set_id", "flashcard_set__title").iterator(chunk_size=CHUNK_SIZE)
+
+def batches(rows):
+    rows = iter(rows)
+    while batch := list(islice(rows, CHUNK_SIZE)):
+        yield batch
+
+# Exporters turn rows into an iterator of strings, one string per chunk of rows
+
+# One JSON object per line
+def export_ndjson(rows):
+    for batch in batches(rows):
+        yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in batch)
+
+def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    for batch in batches(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+EXPORTERS = {
+    "ndjson": export_ndjson,
+    "csv": export_csv,
+}
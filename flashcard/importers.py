@@ -0,0 +1,177 @@
+import codecs
+import csv
+import json
+import os
+from django.core.exceptions import ValidationError
+from .bulk import bulk_create_flashcards, BATCH_SIZE
+from .models import FlashCard
+
+# Files are read this many bytes at a time
+CHUNK_SIZE = 64 * 1024
+# A single JSON row can't be bigger than this
+MAX_ROW_SIZE = 1024 * 1024
+# Only the first few row errors are returned, the rest are just counted
+MAX_REPORTED_ERRORS = 100
+FIELDS = ["question", "answer", "difficulty"]
+
+# Raised when a file can't be read at all (as opposed to a row failing validation)
+class ImportFormatError(ValueError):
+    pass
+
+# Readers take a file opened in binary mode and yield one dict per row.
+# They only hold one chunk (or one CSV line) in memory at a time, so memory use doesn't grow with the file.
+def decode(file):
+    chunks = iter(lambda: file.read(CHUNK_SIZE), b"")
+    return codecs.iterdecode(chunks, "utf-8-sig")
+
+def decoded_lines(file):
+    # Uploaded and opened files both iterate line by line
+    try:
+        for line in codecs.iterdecode(file, "utf-8-sig"):
+            yield line
+    except UnicodeDecodeError:
+        raise ImportFormatError("The file isn't valid UTF-8.")
+
+def read_delimited(file, delimiter):
+    reader = csv.DictReader(decoded_lines(file), delimiter=delimiter)
+    try:
+        yield from reader
+    except csv.Error as e:
+        raise ImportFormatError(f"Line {reader.line_num}: {e}")
+
+def read_csv(file):
+    return read_delimited(file, ",")
+
+def read_tsv(file):
+    return read_delimited(file, "\t")
+
+# One JSON object per line
+def read_ndjson(file):
+    for number, line in enumerate(decoded_lines(file), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ImportFormatError(f"Line {number}: {e.msg}")
+
+# A JSON list of objects, decoded one item at a time as the chunks arrive
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    # What comes next: the opening "[", an item, a "," or "]" after an item, or nothing
+    state = "start"
+    try:
+        chunks = with_last(decode(file))
+        for chunk, last in chunks:
+            buffer = buffer[position:] + chunk
+            position = 0
+            while True:
+                while position < len(buffer) and buffer[position].isspace():
+                    position += 1
+                if position == len(buffer):
+                    break
+                character = buffer[position]
+                if state == "start":
+                    if character != "[":
+                        raise ImportFormatError("Expected a JSON list of flashcards.")
+                    position += 1
+                    state = "first"
+                elif state in ("first", "item"):
+                    if state == "first" and character == "]":
+                        position += 1
+                        state = "end"
+                        continue
+                    try:
+                        row, end = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError as e:
+                        if last or len(buffer) - position > MAX_ROW_SIZE:
+                            raise ImportFormatError(f"Invalid JSON: {e.msg}")
+                        break
+                    if end == len(buffer) and not last:
+                        # A number at the end of the chunk might carry on in the next one
+                        break
+                    yield row
+                    position = end
+                    state = "separator"
+                elif state == "separator":
+                    if character not in ",]":
+                        raise ImportFormatError("Invalid JSON: expected ',' or ']' after a flashcard.")
+                    position += 1
+                    state = "item" if character == "," else "end"
+                else:
+                    raise ImportFormatError("Invalid JSON: extra data after the list.")
+    except UnicodeDecodeError:
+        raise ImportFormatError("The file isn't valid UTF-8.")
+    if state != "end":
+        raise ImportFormatError("Invalid JSON: the list isn't closed.")
+
+# Pairs each item with whether it is the last one. An empty iterable gives a single ("", True).
+def with_last(iterable):
+    previous = ""
+    for item in iterable:
+        yield previous, False
+        previous = item
+    yield previous, True
+
+READERS = {
+    "csv": read_csv,
+    "tsv": read_tsv,
+    "json": read_json,
+    "ndjson": read_ndjson,
+    "jsonl": read_ndjson,
+}
+
+# Rows from file, in the given format or the one its name's extension suggests
+def read_rows(file, format=None, name=None):
+    if not format and name:
+        format = os.path.splitext(name)[1].lstrip(".")
+    format = (format or "").lower()
+    if format not in READERS:
+        raise ImportFormatError(f"Unsupported format \"{format}\", expected one of {', '.join(READERS)}.")
+    return READERS[format](file)
+
+# Turns a row into an unsaved flashcard, raising ValidationError if it isn't valid.
+# columns maps flashcard fields to the row's keys, which are otherwise matched to the field names ignoring case.
+def build_flashcard(flashcard_set, row, columns, default_difficulty=None):
+    if not isinstance(row, dict):
+        raise ValidationError("Expected an object with question, answer and difficulty.")
+    values = {key.strip().lower(): value for key, value in row.items() if isinstance(key, str)}
+    fields = {}
+    for field in FIELDS:
+        value = values.get(columns.get(field, field).strip().lower())
+        fields[field] = value.strip() if isinstance(value, str) else value
+    if not fields["difficulty"]:
+        fields["difficulty"] = default_difficulty
+    if isinstance(fields["difficulty"], str):
+        fields["difficulty"] = fields["difficulty"].lower()
+    flashcard = FlashCard(flashcard_set=flashcard_set, **fields)
+    # The set was already checked, and no other field needs the database
+    flashcard.full_clean(exclude=["flashcard_set"])
+    return flashcard
+
+# Imports rows (any iterable of dicts, e.g. from read_rows) into flashcard_set in one transaction.
+# Invalid rows are skipped and reported, but an ImportFormatError part way through rolls the whole import back.
+# Returns a report: how many rows were read, created and skipped, and the errors for the first skipped rows
+# (rows are numbered from 1, not counting a CSV header).
+def import_flashcards(flashcard_set, rows, columns=None, default_difficulty=None, batch_size=BATCH_SIZE, progress=None):
+    return import_rows(((flashcard_set, row) for row in rows), columns, default_difficulty, batch_size, progress)
+
+# Like import_flashcards, for (flashcard_set, row) pairs that can be spread over many sets
+def import_rows(rows, columns=None, default_difficulty=None, batch_size=BATCH_SIZE, progress=None):
+    columns = columns or {}
+    report = {"rows": 0, "created": 0, "skipped": 0, "errors": []}
+
+    def flashcards():
+        for number, (flashcard_set, row) in enumerate(rows, start=1):
+            report["rows"] = number
+            try:
+                yield build_flashcard(flashcard_set, row, columns, default_difficulty)
+            except ValidationError as e:
+                report["skipped"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"row": number, "errors": e.message_dict if hasattr(e, "error_dict") else {"non_field_errors": e.messages}})
+
+    report["created"] = bulk_create_flashcards(flashcards(), batch_size, progress)
+    return report
@@ -0,0 +1,76 @@
+import time
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review
+from flashcard.visibility import visible_to
+
+BATCH_SIZE = 10000
+
+# The filters the API used before flashcard.visibility, to compare against
+def or_filter(queryset, user):
+    collection = {FlashcardCollection: "", FlashcardSet: "flashcard_collection__"}.get(queryset.model, "flashcard_set__flashcard_collection__")
+    public = Q(**{f"{collection}public": True})
+    if not user.is_authenticated:
+        return queryset.filter(public)
+    if queryset.model in (Comment, Review):
+        return queryset.filter(Q(user=user) | public)
+    return queryset.filter(Q(**{f"{collection}user": user}) | public)
+
+class Command(BaseCommand):
+    help = ("Time the visibility filters against the OR filters they replaced, on generated data that is rolled back "
+            "afterwards. Run it against a development database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=1000000)
+        parser.add_argument("--cards-per-set", type=int, default=100)
+        parser.add_argument("--sets-per-collection", type=int, default=5)
+        parser.add_argument("--public-share", type=float, default=0.1, help="The share of collections that are public")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.generate(options["cards"], options["cards_per_set"], options["sets_per_collection"], options["public_share"])
+            self.stdout.write(f"{'':<14}{'client':<11}{'query':<12}{'OR (ms)':>10}{'UNION (ms)':>12}")
+            for model in [FlashCard, FlashcardSet, Comment, Review]:
+                for client in [AnonymousUser(), user]:
+                    for name, run in [("first page", lambda qs: list(qs.order_by("pk")[:50])), ("count", lambda qs: qs.count())]:
+                        old = self.time(lambda: run(or_filter(model.objects.all(), client)), options["repeat"])
+                        new = self.time(lambda: run(visible_to(model.objects.all(), client)), options["repeat"])
+                        label = "anonymous" if client.is_anonymous else "user"
+                        self.stdout.write(f"{model.__name__:<14}{label:<11}{name:<12}{old:>10.1f}{new:>12.1f}")
+            transaction.set_rollback(True)
+
+    # Each user has two collections, public_share of them public. Every set has a comment and a review from another user.
+    # Returns the first user.
+    def generate(self, cards, cards_per_set, sets_per_collection, public_share):
+        set_count = max(cards // cards_per_set, 1)
+        collection_count = max(set_count // sets_per_collection, 2)
+        user_count = max(collection_count // 2, 2)
+        self.stdout.write(f"Generating {user_count} users, {collection_count} collections, {set_count} sets and {cards} flashcards...")
+        users = User.objects.bulk_create([User(username=f"benchmark_{i}", password="!") for i in range(user_count)])
+        # Spread the public ones evenly
+        collections = FlashcardCollection.objects.bulk_create([
+            FlashcardCollection(title="Collection", user=users[i % user_count], public=int((i + 1) * public_share) > int(i * public_share))
+            for i in range(collection_count)])
+        sets = FlashcardSet.objects.bulk_create([
+            FlashcardSet(title="Set", flashcard_collection=collections[i % len(collections)]) for i in range(set_count)],
+            batch_size=BATCH_SIZE)
+        for start in range(0, cards, BATCH_SIZE):
+            FlashCard.objects.bulk_create([
+                FlashCard(question="Question", answer="Answer", difficulty="easy", flashcard_set=sets[i // cards_per_set % set_count])
+                for i in range(start, min(start + BATCH_SIZE, cards))])
+        authors = [users[(i + 1) % user_count] for i in range(set_count)]
+        Comment.objects.bulk_create([Comment(comment="Comment", flashcard_set=s, user=author) for s, author in zip(sets, authors)], batch_size=BATCH_SIZE)
+        Review.objects.bulk_create([Review(rating=3, flashcard_set=s, user=author) for s, author in zip(sets, authors)], batch_size=BATCH_SIZE)
+        return users[0]
+
+    # The fastest of repeat runs, in milliseconds
+    def time(self, function, repeat):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append((time.perf_counter() - start) * 1000)
+        return min(times)
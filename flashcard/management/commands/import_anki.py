@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from flashcard.anki import import_apkg
+from flashcard.bulk import BATCH_SIZE
+from flashcard.importers import ImportFormatError
+from flashcard.models import FlashcardCollection, Difficulty
+
+class Command(BaseCommand):
+    help = "Import the decks in an Anki package (.apkg) as new sets in a collection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("collection_id", type=int)
+        parser.add_argument("path")
+        parser.add_argument("--difficulty", choices=[tag.value for tag in Difficulty], default=Difficulty.MEDIUM.value,
+            help="Difficulty for notes that aren't tagged easy, medium or hard.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            collection = FlashcardCollection.objects.get(pk=options["collection_id"])
+        except FlashcardCollection.DoesNotExist:
+            raise CommandError(f"Collection {options['collection_id']} does not exist.")
+        progress = lambda created: self.stdout.write(f"{created} flashcards imported...")
+
+        try:
+            with open(options["path"], "rb") as file:
+                report = import_apkg(file, collection, options["difficulty"], options["batch_size"], progress)
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for error in report["errors"]:
+            self.stderr.write(f"Note {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} of {report['rows']} notes into {len(report['sets'])} sets in \"{collection.title}\" ({report['skipped']} skipped)."))
@@ -0,0 +1,43 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from flashcard.bulk import BATCH_SIZE
+from flashcard.importers import READERS, FIELDS, ImportFormatError, read_rows, import_flashcards
+from flashcard.models import FlashcardSet, Difficulty
+
+class Command(BaseCommand):
+    help = "Import flashcards into a set from a CSV, TSV, JSON or NDJSON file (or - for stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("set_id", type=int)
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=list(READERS), help="Defaults to the file's extension.")
+        parser.add_argument("--difficulty", choices=[tag.value for tag in Difficulty], help="Difficulty for rows that don't have one.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        for field in FIELDS:
+            parser.add_argument(f"--{field}-column", help=f"Column to read the {field} from (defaults to \"{field}\").")
+
+    def handle(self, *args, **options):
+        try:
+            flashcard_set = FlashcardSet.objects.get(pk=options["set_id"])
+        except FlashcardSet.DoesNotExist:
+            raise CommandError(f"Set {options['set_id']} does not exist.")
+        columns = {field: options[f"{field}_column"] for field in FIELDS if options[f"{field}_column"]}
+        progress = lambda created: self.stdout.write(f"{created} flashcards imported...")
+
+        try:
+            if options["path"] == "-":
+                report = self.run_import(flashcard_set, sys.stdin.buffer, columns, progress, options)
+            else:
+                with open(options["path"], "rb") as file:
+                    report = self.run_import(flashcard_set, file, columns, progress, options)
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for error in report["errors"]:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} of {report['rows']} rows into \"{flashcard_set.title}\" ({report['skipped']} skipped)."))
+
+    def run_import(self, flashcard_set, file, columns, progress, options):
+        rows = read_rows(file, options["format"], getattr(file, "name", None))
+        return import_flashcards(flashcard_set, rows, columns, options["difficulty"], options["batch_size"], progress)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from flashcard.aggregates import CHUNK_SIZE, rebuild_counters
+
+class Command(BaseCommand):
+    help = "Recount every set's flashcards and comments, and every collection's sets and flashcards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        progress = lambda checked, fixed: self.stdout.write(f"{checked} sets and collections checked, {fixed} fixed...")
+        checked, fixed = rebuild_counters(options["chunk_size"], progress)
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} sets and collections, fixed {fixed}."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from flashcard.aggregates import CHUNK_SIZE, rebuild_rating_aggregates
+
+class Command(BaseCommand):
+    help = "Recalculate every set's stored rating totals from its reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        progress = lambda checked, fixed: self.stdout.write(f"{checked} sets checked, {fixed} fixed...")
+        checked, fixed = rebuild_rating_aggregates(options["chunk_size"], progress)
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} sets, fixed {fixed}."))
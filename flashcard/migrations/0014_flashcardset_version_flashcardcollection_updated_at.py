@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcard', '0013_alter_review_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcardcollection',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.16 on 2026-10-17 19:55
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+# Fill in the totals for existing reviews
+def calculate_ratings(apps, schema_editor):
+    FlashcardSet = apps.get_model('flashcard', 'FlashcardSet')
+    Review = apps.get_model('flashcard', 'Review')
+    rows = Review.objects.order_by().values('flashcard_set').annotate(
+        rating_sum=Sum('rating'),
+        rating_count=Count('pk'),
+        **{f'rating_{rating}_count': Count('pk', filter=Q(rating=rating)) for rating in range(1, 6)})
+    for row in rows:
+        set_id = row.pop('flashcard_set')
+        FlashcardSet.objects.filter(pk=set_id).update(rating_average=row['rating_sum'] / row['rating_count'], **row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcard', '0014_flashcardset_version_flashcardcollection_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcardset',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='rating_average',
+            field=models.FloatField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(calculate_ratings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='flashcardset',
+            index=models.Index(fields=['flashcard_collection', '-rating_average'], name='set_collection_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-17 20:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+# Count the children that already exist
+def count_children(apps, schema_editor):
+    FlashcardCollection = apps.get_model('flashcard', 'FlashcardCollection')
+    FlashcardSet = apps.get_model('flashcard', 'FlashcardSet')
+    FlashCard = apps.get_model('flashcard', 'FlashCard')
+    Comment = apps.get_model('flashcard', 'Comment')
+
+    def count(model, fk):
+        counts = model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(count=Count('pk')).values('count')
+        return Coalesce(Subquery(counts), 0)
+
+    FlashcardSet.objects.update(
+        flashcard_count=count(FlashCard, 'flashcard_set'),
+        comment_count=count(Comment, 'flashcard_set'))
+    cards = FlashcardSet.objects.filter(flashcard_collection=OuterRef('pk')).order_by().values('flashcard_collection').annotate(total=Sum('flashcard_count')).values('total')
+    FlashcardCollection.objects.update(
+        set_count=count(FlashcardSet, 'flashcard_collection'),
+        card_count=Coalesce(Subquery(cards), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcard', '0015_flashcardset_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcardcollection',
+            name='card_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardcollection',
+            name='set_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flashcardset',
+            name='flashcard_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_children, migrations.RunPython.noop),
+    ]
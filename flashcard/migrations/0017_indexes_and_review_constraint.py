@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-17 20:14
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+# Reviews used to be checked for duplicates before they were created, which two requests at once could get past.
+# Keep each user's latest review of a set, and recalculate the rating totals of the sets that lost one.
+def remove_duplicate_reviews(apps, schema_editor):
+    FlashcardSet = apps.get_model('flashcard', 'FlashcardSet')
+    Review = apps.get_model('flashcard', 'Review')
+    duplicates = Review.objects.order_by().values('user', 'flashcard_set').annotate(latest=Max('pk'), count=Count('pk')).filter(count__gt=1)
+    set_ids = set()
+    for row in duplicates:
+        Review.objects.filter(user=row['user'], flashcard_set=row['flashcard_set'], pk__lt=row['latest']).delete()
+        set_ids.add(row['flashcard_set'])
+    rows = Review.objects.filter(flashcard_set__in=set_ids).order_by().values('flashcard_set').annotate(
+        rating_sum=Sum('rating'),
+        rating_count=Count('pk'),
+        **{f'rating_{rating}_count': Count('pk', filter=Q(rating=rating)) for rating in range(1, 6)})
+    for row in rows:
+        set_id = row.pop('flashcard_set')
+        FlashcardSet.objects.filter(pk=set_id).update(rating_average=row['rating_sum'] / row['rating_count'], **row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcard', '0016_child_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flashcardcollection',
+            index=models.Index(condition=models.Q(('public', True)), fields=['id'], name='collection_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcardcollection',
+            index=models.Index(fields=['user', 'public'], name='collection_user_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcardset',
+            index=models.Index(fields=['created_at'], name='set_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcardset',
+            index=models.Index(fields=['flashcard_collection', 'updated_at'], name='set_collection_updated_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('user', 'flashcard_set'), name='review_user_set_unique'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.16 on 2026-10-17 20:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+import django.db.models.deletion
+
+
+# Count the sets users have already made today towards their quota
+def count_todays_sets(apps, schema_editor):
+    FlashcardSet = apps.get_model('flashcard', 'FlashcardSet')
+    Quota = apps.get_model('flashcard', 'Quota')
+    midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = FlashcardSet.objects.filter(created_at__gte=midnight).order_by().values('flashcard_collection__user').annotate(used=Count('pk'))
+    Quota.objects.bulk_create([
+        Quota(user_id=row['flashcard_collection__user'], action='create_set', day=midnight.date(), used=row['used']) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('flashcard', '0017_indexes_and_review_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Quota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('used', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quota', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='quota',
+            constraint=models.UniqueConstraint(fields=('user', 'action', 'day'), name='quota_user_action_day_unique'),
+        ),
+        migrations.RunPython(count_todays_sets, migrations.RunPython.noop),
+    ]
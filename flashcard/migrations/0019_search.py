@@ -0,0 +1,47 @@
+# Generated by Django 4.2.16 on 2026-10-17 21:05
+
+from django.db import migrations
+
+
+# Full-text indexes for flashcard/search.py. They are FTS5 "external content" tables: they only hold the index,
+# and read the text back from the flashcard and set tables for snippets. Triggers keep them in step with every
+# insert, update and delete, including bulk creates, queryset updates and cascades that don't send signals.
+INDEXES = {
+    'flashcard_flashcard_fts': ('flashcard_flashcard', ['question', 'answer']),
+    'flashcard_flashcardset_fts': ('flashcard_flashcardset', ['title', 'description']),
+}
+
+
+def create_sql(index, table, columns):
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {index} USING fts5({names}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        # Only changes to the indexed columns, not the counters that are updated all the time
+        f"CREATE TRIGGER {index}_update AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new}); END",
+        # Index the rows that already exist
+        f"INSERT INTO {index}({index}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql(index):
+    return [f"DROP TRIGGER {index}_{event}" for event in ['insert', 'delete', 'update']] + [f"DROP TABLE {index}"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcard', '0018_quota'),
+    ]
+
+    operations = [
+        migrations.RunSQL(create_sql(index, table, columns), drop_sql(index))
+        for index, (table, columns) in INDEXES.items()
+    ]
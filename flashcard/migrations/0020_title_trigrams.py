@@ -0,0 +1,45 @@
+# Generated by Django 4.2.16 on 2026-10-17 21:08
+
+from django.db import migrations
+
+
+# Trigram indexes of set and collection titles, for fuzzy_search in flashcard/search.py. Like the indexes in 0019
+# they are FTS5 external content tables kept in step by triggers, but split titles into every three characters
+# rather than into words, so a misspelt title still shares most of its entries with the right one. Each has a
+# vocabulary table with how many titles have each trigram.
+INDEXES = {
+    'flashcard_flashcardset_trigram': 'flashcard_flashcardset',
+    'flashcard_flashcardcollection_trigram': 'flashcard_flashcardcollection',
+}
+
+
+def create_sql(index, table):
+    return [
+        f"CREATE VIRTUAL TABLE {index} USING fts5(title, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {index}(rowid, title) VALUES (new.id, new.title); END",
+        f"CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, title) VALUES ('delete', old.id, old.title); END",
+        f"CREATE TRIGGER {index}_update AFTER UPDATE OF title ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, title) VALUES ('delete', old.id, old.title); "
+        f"INSERT INTO {index}(rowid, title) VALUES (new.id, new.title); END",
+        f"INSERT INTO {index}({index}) VALUES ('rebuild')",
+        # How many titles have each trigram
+        f"CREATE VIRTUAL TABLE {index}_vocab USING fts5vocab({index}, 'row')",
+    ]
+
+
+def drop_sql(index):
+    return [f"DROP TABLE {index}_vocab"] + [f"DROP TRIGGER {index}_{event}" for event in ['insert', 'delete', 'update']] + [f"DROP TABLE {index}"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcard', '0019_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(create_sql(index, table), drop_sql(index))
+        for index, table in INDEXES.items()
+    ]
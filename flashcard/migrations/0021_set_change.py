@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+# Log every change to what a set's suggestion shows or is weighted by, see SetChange
+TRIGGERS = {
+    'flashcard_setchange_insert':
+        "AFTER INSERT ON flashcard_flashcardset BEGIN "
+        "INSERT INTO flashcard_setchange(set_id) VALUES (new.id); END",
+    'flashcard_setchange_delete':
+        "AFTER DELETE ON flashcard_flashcardset BEGIN "
+        "INSERT INTO flashcard_setchange(set_id) VALUES (old.id); END",
+    # Saving a set writes every column, so only log the ones where something in the suggestion changed
+    'flashcard_setchange_update':
+        "AFTER UPDATE OF title, flashcard_collection_id, rating_average, rating_count ON flashcard_flashcardset "
+        "WHEN old.title IS NOT new.title OR old.flashcard_collection_id IS NOT new.flashcard_collection_id "
+        "OR old.rating_average IS NOT new.rating_average OR old.rating_count IS NOT new.rating_count BEGIN "
+        "INSERT INTO flashcard_setchange(set_id) VALUES (new.id); END",
+    # Making a collection public or private adds or removes all of its sets
+    'flashcard_setchange_public':
+        "AFTER UPDATE OF public ON flashcard_flashcardcollection WHEN old.public IS NOT new.public BEGIN "
+        "INSERT INTO flashcard_setchange(set_id) SELECT id FROM flashcard_flashcardset WHERE flashcard_collection_id = new.id; END",
+}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcard', '0020_title_trigrams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SetChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('set_id', models.BigIntegerField()),
+            ],
+        ),
+    ] + [
+        migrations.RunSQL(f"CREATE TRIGGER {name} {sql}", f"DROP TRIGGER {name}")
+        for name, sql in TRIGGERS.items()
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-17 21:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('flashcard', '0021_set_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudyProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.PositiveIntegerField(default=0)),
+                ('ease', models.FloatField(default=2.5)),
+                ('repetitions', models.PositiveIntegerField(default=0)),
+                ('lapses', models.PositiveIntegerField(default=0)),
+                ('due_at', models.DateTimeField()),
+                ('reviewed_at', models.DateTimeField()),
+                ('flashcard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='study_progress', to='flashcard.flashcard')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='study_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'due_at'], name='study_user_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='studyprogress',
+            constraint=models.UniqueConstraint(fields=('user', 'flashcard'), name='study_user_flashcard_unique'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-17 21:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Delete a flashcard's study progress with it, however the flashcard is deleted (including the collector's fast
+# deletes of a set's flashcards, which don't load them)
+TRIGGER = (
+    "CREATE TRIGGER flashcard_studyprogress_delete AFTER DELETE ON flashcard_flashcard BEGIN "
+    "DELETE FROM flashcard_studyprogress WHERE flashcard_id = old.id; END"
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcard', '0022_study_progress'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studyprogress',
+            name='flashcard',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='study_progress', to='flashcard.flashcard'),
+        ),
+        migrations.RunSQL(TRIGGER, "DROP TRIGGER flashcard_studyprogress_delete"),
+    ]
@@ -0,0 +1,152 @@
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.functional import cached_property
+from .permissions import ResolverMixin
+from .tiles import Tiles
+
+# For views under /flashcard/collections/<collection_id>/<set_id>/<flashcard_id>.
+# The deepest object in the URL is loaded with everything above it in one joined query (through the request's
+# PermissionResolver, so later permission checks don't query again), and each one must belong to the one above it
+# in the URL, otherwise the page is a 404.
+# The objects are self.flashcard_collection, self.flashcard_set and self.flashcard (None when the URL stops above
+# them), are in the template context under the same names, and are what get_object() returns for views of them.
+class URLChainMixin(ResolverMixin):
+    @cached_property
+    def url_chain(self):
+        flashcard_collection = flashcard_set = flashcard = None
+        if "flashcard_id" in self.kwargs:
+            flashcard = self.resolver.flashcard(self.kwargs["flashcard_id"])
+            if flashcard.flashcard_set_id != self.kwargs["set_id"]:
+                raise Http404("The flashcard could not be found.")
+            flashcard_set = flashcard.flashcard_set
+        elif "set_id" in self.kwargs:
+            flashcard_set = self.resolver.flashcard_set(self.kwargs["set_id"])
+        if flashcard_set is not None:
+            if flashcard_set.flashcard_collection_id != self.kwargs["collection_id"]:
+                raise Http404("The set could not be found.")
+            flashcard_collection = flashcard_set.flashcard_collection
+        else:
+            flashcard_collection = self.resolver.collection(self.kwargs["collection_id"])
+        return {"flashcard_collection": flashcard_collection, "flashcard_set": flashcard_set, "flashcard": flashcard}
+
+    @property
+    def flashcard_collection(self):
+        return self.url_chain["flashcard_collection"]
+
+    @property
+    def flashcard_set(self):
+        return self.url_chain["flashcard_set"]
+
+    @property
+    def flashcard(self):
+        return self.url_chain["flashcard"]
+
+    def get_object(self, queryset=None):
+        for obj in reversed(self.url_chain.values()):
+            if obj is not None and isinstance(obj, self.model):
+                return obj
+        return super().get_object(queryset)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        for name, obj in self.url_chain.items():
+            if obj is not None:
+                context.setdefault(name, obj)
+        return context
+
+# For ListViews: shows one page of rows at a time, with a "load more" link to the next page.
+# Pages are found by keyset rather than OFFSET: the next page is the rows after the last one shown, in the view's
+# ordering (?after=<cursor>), so the database reads them straight from an index in order instead of sorting and
+# skipping every row before the page.
+# ordering must end in a unique field (e.g. "id") so the rows are always in the same order. Nullable fields sort
+# their nulls last.
+# Pages hold WEB_PAGE_SIZE rows, or ?page_size= up to WEB_MAX_PAGE_SIZE.
+class KeysetPaginationMixin:
+    ordering = ["id"]
+
+    def get_paginate_by(self, queryset):
+        try:
+            page_size = int(self.request.GET["page_size"])
+        except (KeyError, ValueError):
+            page_size = settings.WEB_PAGE_SIZE
+        return max(1, min(page_size, settings.WEB_MAX_PAGE_SIZE))
+
+    # The ordering as (field, descending) pairs
+    def get_keyset(self):
+        return [(name.lstrip("-"), name.startswith("-")) for name in self.get_ordering()]
+
+    def is_nullable(self, name):
+        return self.model._meta.get_field(name).null
+
+    def order_by(self, name, descending):
+        if not self.is_nullable(name):
+            return F(name).desc() if descending else F(name).asc()
+        return F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_first=True)
+
+    # The rows after a row with the given values
+    def after(self, keyset, values):
+        condition = None
+        for (name, descending), value in reversed(list(zip(keyset, values))):
+            if value is None:
+                same = Q(**{f"{name}__isnull": True})
+                # Nulls come first going up and last going down
+                later = None if descending else Q(**{f"{name}__isnull": False})
+            else:
+                same = Q(**{name: value})
+                later = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if descending and self.is_nullable(name):
+                    later |= Q(**{f"{name}__isnull": True})
+            after_same = same & condition if condition is not None else None
+            parts = [part for part in [later, after_same] if part is not None]
+            condition = parts[0] if len(parts) == 1 else parts[0] | parts[1]
+        return condition
+
+    def encode_cursor(self, obj, keyset):
+        # str() keeps every digit of dates and decimals (DjangoJSONEncoder drops microseconds), to_python reads them back
+        values = json.dumps([getattr(obj, name) for name, _ in keyset], default=str)
+        return base64.urlsafe_b64encode(values.encode()).decode()
+
+    def decode_cursor(self, cursor, keyset):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(keyset):
+                raise ValueError
+            return [None if value is None else self.model._meta.get_field(name).to_python(value)
+                    for (name, _), value in zip(keyset, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise Http404("Invalid cursor.")
+
+    # Returns what ListView expects (paginator, page, rows, is_paginated), without a Paginator: there is no page count
+    def paginate_queryset(self, queryset, page_size):
+        keyset = self.get_keyset()
+        queryset = queryset.order_by(*[self.order_by(name, descending) for name, descending in keyset])
+        cursor = self.request.GET.get("after")
+        if cursor:
+            queryset = queryset.filter(self.after(keyset, self.decode_cursor(cursor, keyset)))
+        # One extra row says whether there is another page
+        rows = list(queryset[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self.encode_cursor(rows[-1], keyset) if has_next else None
+        return (None, None, rows, has_next)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["next_url"] = None
+        if self.next_cursor:
+            query = self.request.GET.copy()
+            query["after"] = self.next_cursor
+            context["next_url"] = f"{self.request.path}?{query.urlencode()}"
+        return context
+
+# For the collection and set lists: the page's cached tiles, for {% tile %}
+class TileCacheMixin:
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["tiles"] = Tiles(context["object_list"])
+        return context
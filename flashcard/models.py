@@ -1,42 +1,243 @@
-from django.db import models
+import threading
+from django.db import models, transaction
 from enum import Enum
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.timezone import now
+from django.db.models import Count, F, FloatField, Subquery
+from django.db.models.functions import Cast, NullIf
+from django.db.models.signals import pre_delete, post_delete
+from django.dispatch import receiver
 
 # Create your models here.
+RATINGS = range(1, 6)
+
 class Difficulty(Enum):
     EASY = "easy"
     MEDIUM = "medium"
     HARD = "hard"
 
+# Counters (listed in a model's counter_fields) are only changed with F() expressions. Saving an existing row
+# leaves them out, so an instance loaded before a change can't write the old value back.
+def skip_counter_fields(instance, kwargs):
+    if not instance._state.adding and kwargs.get("update_fields") is None:
+        kwargs["update_fields"] = [field.name for field in instance._meta.concrete_fields
+                                   if not field.primary_key and field.name not in instance.counter_fields]
+
+# Whether a delete was started from one of these models (an instance or a queryset), for cascades
+# that don't need to update rows the same delete is about to remove
+def deleted_with(origin, *model_classes):
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return issubclass(model, model_classes)
+
 class FlashcardCollection(models.Model):
     title = models.CharField(max_length=100)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="flashcard_collection")
     description = models.TextField(default=None, blank=True, null=True)
     public = models.BooleanField(default=False)
+    # Also moved forward whenever one of the collection's sets changes
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of sets, and of flashcards in all of them
+    set_count = models.PositiveIntegerField(default=0)
+    card_count = models.PositiveIntegerField(default=0)
+    counter_fields = ["set_count", "card_count"]
+    
+    class Meta:
+        indexes = [
+            # Public collections in id (page) order. Django filters on a boolean as a bare "WHERE public", which
+            # SQLite can't look up in an index on public, but it can use a partial index with the same condition.
+            models.Index(fields=["id"], condition=models.Q(public=True), name="collection_public_idx"),
+            # A user's public or private collections
+            models.Index(fields=["user", "public"], name="collection_user_public_idx"),
+        ]
     
     def save(self, *args, **kwargs):
         self.full_clean()
+        skip_counter_fields(self, kwargs)
         super().save(*args, **kwargs)
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def touch(cls, *collection_ids):
+        cls.objects.filter(pk__in=collection_ids).update(updated_at=now())
+    
+    # Add to (or with negative numbers, take from) the collection's counters, which also counts as updating it.
+    # cards can be an expression, e.g. a subquery for a set's flashcard_count.
+    @classmethod
+    def change_counts(cls, collection_id, sets=0, cards=0):
+        cls.objects.filter(pk=collection_id).update(
+            updated_at=now(),
+            set_count=F("set_count") + sets,
+            card_count=F("card_count") + cards)
+    
 class FlashcardSet(models.Model):
     title = models.CharField(max_length=100)
     flashcard_collection = models.ForeignKey(FlashcardCollection, on_delete=models.CASCADE, related_name="flashcard_set")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     description = models.TextField(default=None, blank=True, null=True)
+    # Bumped when comments are added or removed, which doesn't count as the set being updated
+    version = models.PositiveIntegerField(default=0)
+    # Review ratings, kept up to date as reviews change (see change_rating) so lists don't have to aggregate every review.
+    # rebuild_rating_aggregates recalculates them from scratch.
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(default=None, blank=True, null=True)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    # Number of children, kept up to date as they are added and deleted
+    flashcard_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    counter_fields = ["version", "rating_sum", "rating_count", "rating_average", *(f"rating_{rating}_count" for rating in RATINGS),
+                      "flashcard_count", "comment_count"]
+    
+    class Meta:
+        indexes = [
+            # Sets in a collection, best rated first
+            models.Index(fields=["flashcard_collection", "-rating_average"], name="set_collection_rating_idx"),
+            # Sets by when they were created, e.g. today's
+            models.Index(fields=["created_at"], name="set_created_at_idx"),
+            # Sets in a collection, most recently updated first (and the collection's last modified time)
+            models.Index(fields=["flashcard_collection", "updated_at"], name="set_collection_updated_idx"),
+        ]
+    
+    # Remember the collection the set was loaded in, so moving it also touches the old collection
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_collection_id = instance.__dict__.get("flashcard_collection_id")
+        return instance
     
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        loaded_collection_id = getattr(self, "_loaded_collection_id", None)
+        skip_counter_fields(self, kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                FlashcardCollection.change_counts(self.flashcard_collection_id, sets=1)
+            elif loaded_collection_id not in (None, self.flashcard_collection_id):
+                # Move the set and its flashcards between the collections' counts
+                cards = Subquery(FlashcardSet.objects.filter(pk=self.pk).values("flashcard_count"))
+                FlashcardCollection.change_counts(loaded_collection_id, sets=-1, cards=-cards)
+                FlashcardCollection.change_counts(self.flashcard_collection_id, sets=1, cards=cards)
+            else:
+                FlashcardCollection.touch(self.flashcard_collection_id)
+        self._loaded_collection_id = self.flashcard_collection_id
     
     def __str__(self):
         return self.title
+    
+    # Move updated_at forward on these sets and their collections without saving each set
+    @classmethod
+    def touch(cls, *set_ids):
+        cls.objects.filter(pk__in=set_ids).update(updated_at=now())
+        FlashcardCollection.objects.filter(flashcard_set__in=set_ids).update(updated_at=now())
+    
+    # Touch the set when the current transaction commits (straight away outside of one).
+    # Touching many sets, or the same set many times, in one transaction only runs one touch(): the set ids are
+    # collected in this thread's PendingSetTouches for the connection, which is registered with on_commit on every
+    # call. Whatever part of the transaction is rolled back, some registration survives to run it, and the first
+    # to run touches every collected set while the rest find nothing to do.
+    @classmethod
+    def touch_on_commit(cls, set_id, using=None):
+        connection = transaction.get_connection(using)
+        if not connection.in_atomic_block:
+            cls.touch(set_id)
+            return
+        pending = getattr(pending_set_touches, connection.alias, None)
+        if pending is None or pending.done:
+            pending = PendingSetTouches()
+            setattr(pending_set_touches, connection.alias, pending)
+        pending.set_ids.add(set_id)
+        transaction.on_commit(pending, using)
+    
+    # Add count flashcards to the set's and its collection's counts (or remove them, with a negative count).
+    # Also touches both, since adding or removing flashcards counts as updating them.
+    @classmethod
+    def change_flashcard_count(cls, set_id, count):
+        cls.objects.filter(pk=set_id).update(updated_at=now(), flashcard_count=F("flashcard_count") + count)
+        FlashcardCollection.objects.filter(flashcard_set=set_id).update(updated_at=now(), card_count=F("card_count") + count)
+    
+    # Comments are part of the set's API representation but don't count as updating it, so only the version changes
+    @classmethod
+    def change_comment_count(cls, set_id, count):
+        cls.objects.filter(pk=set_id).update(comment_count=F("comment_count") + count, version=F("version") + 1)
+    
+    # Move the set's rating totals from old_rating to new_rating (either can be None, to add or remove a rating) in one UPDATE.
+    # All the new values are calculated from the current row by the database, so concurrent reviews can't lose an update.
+    @classmethod
+    def change_rating(cls, set_id, old_rating=None, new_rating=None):
+        if old_rating == new_rating:
+            return
+        rating_sum = F("rating_sum") + (new_rating or 0) - (old_rating or 0)
+        rating_count = F("rating_count") + (new_rating is not None) - (old_rating is not None)
+        histogram = {}
+        if old_rating is not None:
+            histogram[f"rating_{old_rating}_count"] = F(f"rating_{old_rating}_count") - 1
+        if new_rating is not None:
+            histogram[f"rating_{new_rating}_count"] = F(f"rating_{new_rating}_count") + 1
+        cls.objects.filter(pk=set_id).update(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            rating_average=Cast(rating_sum, FloatField()) / NullIf(rating_count, 0),
+            # Ratings are part of the set's API representation
+            version=F("version") + 1,
+            **histogram)
+    
+    @property
+    def rating_histogram(self):
+        return {rating: getattr(self, f"rating_{rating}_count") for rating in RATINGS}
+    
+    # Every review has a rating
+    @property
+    def review_count(self):
+        return self.rating_count
+
+# Deleting a set (directly or as a queryset) takes it and its flashcards off its collection's counts.
+# This runs before the set's flashcards are deleted, so it can still read how many it has.
+@receiver(pre_delete, sender=FlashcardSet)
+def remove_set_counts(sender, instance, origin=None, **kwargs):
+    # Deleting the collection or its user removes the collection too
+    if deleted_with(origin, FlashcardCollection, User):
+        return
+    cards = Subquery(FlashcardSet.objects.filter(pk=instance.pk).values("flashcard_count"))
+    FlashcardCollection.change_counts(instance.flashcard_collection_id, sets=-1, cards=-cards)
+
+# Sets to touch when a transaction commits, see FlashcardSet.touch_on_commit. Sets collected in a transaction that
+# is rolled back are touched with the next one instead, which only moves their updated_at on.
+class PendingSetTouches:
+    def __init__(self, *set_ids):
+        self.set_ids = set(set_ids)
+        self.done = False
+    
+    def __call__(self):
+        if self.done:
+            return
+        self.done = True
+        FlashcardSet.touch(*self.set_ids)
+
+# This thread's PendingSetTouches by database alias (connections are per thread too)
+pending_set_touches = threading.local()
+
+# Deleting flashcards as a queryset (e.g. the admin's delete action) takes them off their sets' and collections' counts,
+# with one UPDATE per set. Flashcards deleted along with their set skip this (the collector deletes them directly),
+# remove_set_counts covers them. FlashCard has no delete signals, so those deletes don't have to load the flashcards.
+class FlashCardQuerySet(models.QuerySet):
+    def delete(self):
+        with transaction.atomic():
+            counts = list(self.order_by().values_list("flashcard_set").annotate(count=Count("pk")))
+            result = super().delete()
+            for set_id, count in counts:
+                FlashcardSet.change_flashcard_count(set_id, -count)
+        return result
 
 class FlashCard(models.Model):
     question = models.TextField()
@@ -46,11 +247,45 @@ class FlashCard(models.Model):
     )
     flashcard_set = models.ForeignKey(FlashcardSet, on_delete=models.CASCADE, related_name="flashcard")
     
+    objects = FlashCardQuerySet.as_manager()
+    
+    # Remember the set the flashcard was loaded in, so moving it also moves it between the sets' counts
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_set_id = instance.__dict__.get("flashcard_set_id")
+        return instance
+    
+    # Changing a flashcard updates its set. Adding, removing or moving a flashcard changes the set's count, which touches it
+    # at the same time. Otherwise the set row is only written once per transaction, see FlashcardSet.touch_on_commit.
     def save(self, *args, **kwargs):
         self.full_clean()
-        self.flashcard_set.updated_at = now()
-        self.flashcard_set.save()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        loaded_set_id = getattr(self, "_loaded_set_id", None)
+        if adding or loaded_set_id not in (None, self.flashcard_set_id):
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if not adding:
+                    FlashcardSet.change_flashcard_count(loaded_set_id, -1)
+                FlashcardSet.change_flashcard_count(self.flashcard_set_id, 1)
+        else:
+            super().save(*args, **kwargs)
+            FlashcardSet.touch_on_commit(self.flashcard_set_id)
+        self._loaded_set_id = self.flashcard_set_id
+        self.touch_cached_set()
+    
+    # Flashcards deleted along with their set don't come through here, remove_set_counts covers them
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            FlashcardSet.change_flashcard_count(self.flashcard_set_id, -1)
+        self.touch_cached_set()
+        return result
+    
+    # Keep an already loaded set in step with the database, without loading it if it isn't
+    def touch_cached_set(self):
+        if FlashCard.flashcard_set.is_cached(self):
+            self.flashcard_set.updated_at = now()
     
     def __str__(self):
         return self.question
@@ -62,7 +297,11 @@ class Comment(models.Model):
     
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                FlashcardSet.change_comment_count(self.flashcard_set_id, 1)
     
     def __str__(self):
         return self.comment
@@ -73,6 +312,12 @@ class Review(models.Model):
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField(default=None, blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            # One review per user and set. Its index also finds a user's review of a set.
+            models.UniqueConstraint(fields=["user", "flashcard_set"], name="review_user_set_unique"),
+        ]
+
     def clean(self):
         if self.rating < 1 or self.rating > 5:
             raise ValidationError("Rating must be between 1 and 5.")
@@ -80,9 +325,94 @@ class Review(models.Model):
             raise ValidationError("Rating must be an integer.")
         return super().clean()
     
+    # Remember the rating as loaded, so an update can move the set's totals from the old rating to the new one
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = (instance.__dict__.get("flashcard_set_id"), instance.__dict__.get("rating"))
+        return instance
+    
+    # A second review of the same set raises IntegrityError. The constraint is left to the insert rather
+    # than checked first, so two requests at once can't both get through.
     def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+        self.full_clean(validate_constraints=False)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            loaded_set_id, loaded_rating = getattr(self, "_loaded_rating", (None, None))
+            if loaded_set_id in (None, self.flashcard_set_id):
+                FlashcardSet.change_rating(self.flashcard_set_id, loaded_rating, self.rating)
+            else:
+                FlashcardSet.change_rating(loaded_set_id, loaded_rating, None)
+                FlashcardSet.change_rating(self.flashcard_set_id, None, self.rating)
+            self._loaded_rating = (self.flashcard_set_id, self.rating)
+    
+    def __str__(self):
+        return "@" + self.user.username + " | Rating: " + str(self.rating)
+
+# Deleting a comment, directly or through a cascade (e.g. deleting its user), takes it off the set's count
+@receiver(post_delete, sender=Comment)
+def remove_comment_count(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, FlashcardSet, FlashcardCollection):
+        FlashcardSet.change_comment_count(instance.flashcard_set_id, -1)
+
+# The same for reviews and the set's rating totals
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, FlashcardSet, FlashcardCollection):
+        FlashcardSet.change_rating(instance.flashcard_set_id, instance.rating, None)
+
+# How much of an action a user has used on a day. flashcard/quotas.py sets the limits and updates these.
+class Quota(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="quota")
+    action = models.CharField(max_length=50)
+    day = models.DateField()
+    used = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "action", "day"], name="quota_user_action_day_unique"),
+        ]
+    
+    def __str__(self):
+        return f"@{self.user_id} | {self.action} on {self.day}: {self.used}"
+
+# A set whose suggestion in flashcard/suggest.py (its title, rating or whether it is public) may have changed. Rows
+# are written by database triggers (see migration 0021), so changes that don't send signals are logged too, and
+# read back in id order by every process after the last one it saw.
+class SetChange(models.Model):
+    # Not a foreign key, deleted sets are logged too
+    set_id = models.BigIntegerField()
+    
+    def __str__(self):
+        return f"#{self.pk} | set {self.set_id}"
+
+# Where a user is in studying a flashcard, scheduled with SM-2 (see flashcard/study.py). Flashcards the user hasn't
+# studied yet don't have one.
+class StudyProgress(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="study_progress")
+    # Deleted along with the flashcard by a database trigger (see migration 0023), so deleting a set or collection
+    # can still delete its flashcards without loading them
+    flashcard = models.ForeignKey(FlashCard, on_delete=models.DO_NOTHING, related_name="study_progress")
+    # Days from the last review until the flashcard is due again
+    interval = models.PositiveIntegerField(default=0)
+    # How quickly the interval grows with each correct answer
+    ease = models.FloatField(default=2.5)
+    # Correct answers in a row
+    repetitions = models.PositiveIntegerField(default=0)
+    # Times the flashcard was forgotten after being learnt
+    lapses = models.PositiveIntegerField(default=0)
+    due_at = models.DateTimeField()
+    reviewed_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            # One schedule per user and flashcard. Its index also finds the flashcards a user hasn't studied.
+            models.UniqueConstraint(fields=["user", "flashcard"], name="study_user_flashcard_unique"),
+        ]
+        indexes = [
+            # A user's due flashcards, soonest first, as a range of this index
+            models.Index(fields=["user", "due_at"], name="study_user_due_idx"),
+        ]
     
     def __str__(self):
-        return "@" + self.user.username + " | Rating: " + str(self.rating)
\ No newline at end of file
+        return f"@{self.user_id} | flashcard {self.flashcard_id} due {self.due_at}"
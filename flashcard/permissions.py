@@ -0,0 +1,115 @@
+from django.http import Http404
+from .models import FlashCard, FlashcardSet, FlashcardCollection
+
+# Answers "can this user read / write / delete this collection, set or flashcard" for one request.
+# The rules are the same as visibility.py's: anyone can read a public collection and everything in it, owners can
+# read and write their own, and superusers can read and delete anything.
+#
+# Every collection, set and flashcard the resolver loads is kept (with the set and collection above it), so asking
+# about the same object, or anything under an object that is already loaded, doesn't query again.
+# prefetch() loads any number of them in one query.
+
+# How each model is loaded, with everything above it joined
+LOADERS = {
+    FlashcardCollection: lambda: FlashcardCollection.objects.select_related("user"),
+    FlashcardSet: lambda: FlashcardSet.objects.select_related("flashcard_collection__user"),
+    FlashCard: lambda: FlashCard.objects.select_related("flashcard_set__flashcard_collection__user"),
+}
+
+# An id from a URL or a request body, or None if it can't be one
+def clean_pk(pk):
+    if isinstance(pk, bool):
+        return None
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        return None
+
+class PermissionResolver:
+    def __init__(self, user):
+        self.user = user
+        self.cache = {model: {} for model in LOADERS}
+
+    # Keeps obj, and the set and collection it was loaded with
+    def remember(self, obj):
+        self.cache[type(obj)][obj.pk] = obj
+        if isinstance(obj, FlashCard):
+            self.remember(obj.flashcard_set)
+        elif isinstance(obj, FlashcardSet):
+            self.remember(obj.flashcard_collection)
+        return obj
+
+    # Loads the objects of model with the given ids that haven't been asked for yet, in one query.
+    # Returns every one of them that exists, by id. Ids that don't exist are remembered as None.
+    def prefetch(self, model, pks):
+        pks = {pk for pk in map(clean_pk, pks) if pk is not None}
+        cache = self.cache[model]
+        missing = pks - cache.keys()
+        if missing:
+            for obj in LOADERS[model]().filter(pk__in=missing):
+                self.remember(obj)
+            for pk in missing - cache.keys():
+                cache[pk] = None
+        return {pk: cache[pk] for pk in pks if cache[pk] is not None}
+
+    # The object of model with id pk, or None if there isn't one
+    def get(self, model, pk):
+        return self.prefetch(model, [pk]).get(clean_pk(pk))
+
+    def get_or_404(self, model, pk):
+        obj = self.get(model, pk)
+        if obj is None:
+            raise Http404(f"No {model._meta.object_name} matches the given query.")
+        return obj
+
+    def collection(self, pk):
+        return self.get_or_404(FlashcardCollection, pk)
+
+    def flashcard_set(self, pk):
+        return self.get_or_404(FlashcardSet, pk)
+
+    def flashcard(self, pk):
+        return self.get_or_404(FlashCard, pk)
+
+    # The collection a collection, set or flashcard is in, from the cache where possible
+    def collection_of(self, obj):
+        if isinstance(obj, FlashCard):
+            return self.collection_of(self.cache[FlashcardSet].get(obj.flashcard_set_id) or obj.flashcard_set)
+        if isinstance(obj, FlashcardSet):
+            return self.cache[FlashcardCollection].get(obj.flashcard_collection_id) or obj.flashcard_collection
+        return obj
+
+    def is_owner(self, obj):
+        return self.user.is_authenticated and self.collection_of(obj).user_id == self.user.id
+
+    def can_read(self, obj):
+        return self.user.is_superuser or self.collection_of(obj).public or self.is_owner(obj)
+
+    def can_write(self, obj):
+        return self.is_owner(obj)
+
+    def can_delete(self, obj):
+        return self.user.is_superuser or self.is_owner(obj)
+
+    # Batch checks: the objects of model with the given ids that exist and that the user can read / write, by id
+    def readable(self, model, pks):
+        return {pk: obj for pk, obj in self.prefetch(model, pks).items() if self.can_read(obj)}
+
+    def writable(self, model, pks):
+        return {pk: obj for pk, obj in self.prefetch(model, pks).items() if self.can_write(obj)}
+
+# The resolver for request, made the first time it is asked for.
+# DRF's Request reads missing attributes from the HttpRequest it wraps, whose (session) user can differ from the one
+# DRF authenticated, so a resolver is only reused for the same user.
+def resolver_for(request):
+    resolver = getattr(request, "permission_resolver", None)
+    if resolver is None or resolver.user != request.user:
+        resolver = PermissionResolver(request.user)
+        request.permission_resolver = resolver
+    return resolver
+
+# For views and viewsets: self.resolver is the request's PermissionResolver
+class ResolverMixin:
+    @property
+    def resolver(self):
+        return resolver_for(self.request)
@@ -0,0 +1,84 @@
+from datetime import datetime, time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils.timezone import localdate, make_aware
+from .models import FlashcardCollection, FlashcardSet, Quota, deleted_with
+
+# Per-user daily limits on actions, set in settings.QUOTAS. Each user's use of an action on a day is one Quota row,
+# changed with a single conditional UPDATE, so checking a quota doesn't depend on how many rows the action made
+# and two requests at once can't both take the last one.
+
+CREATE_SET = "create_set"
+
+class QuotaExceeded(Exception):
+    def __init__(self, action, limit):
+        super().__init__(f"The daily limit of {limit} for {action} has been reached.")
+        self.action = action
+        self.limit = limit
+
+# (user id, action, day) of quotas known to be used up, so further attempts that day don't need the database.
+# Only used with settings.QUOTA_CACHE on. It is per process: a quota given back in another process stays
+# used up here until the next day.
+exhausted = set()
+
+def limit(action):
+    return settings.QUOTAS[action]
+
+# Uses amount of user's quota for action today, raising QuotaExceeded (and using none of it) if there isn't enough left.
+# Run it in the same transaction as the action, so it is given back if the action fails.
+def consume(user, action, amount=1):
+    day = localdate()
+    key = (user.pk, action, day)
+    maximum = limit(action)
+    if settings.QUOTA_CACHE and key in exhausted:
+        raise QuotaExceeded(action, maximum)
+    if not use(user, action, day, amount, maximum):
+        if settings.QUOTA_CACHE:
+            # Forget other days while we're here
+            exhausted.difference_update([other for other in exhausted if other[2] != day])
+            exhausted.add(key)
+        raise QuotaExceeded(action, maximum)
+
+def use(user, action, day, amount, maximum):
+    quotas = Quota.objects.filter(user=user, action=action, day=day, used__lte=maximum - amount)
+    if quotas.update(used=F("used") + amount):
+        return True
+    if amount > maximum:
+        return False
+    # Either the user hasn't used the action today, or the quota is used up
+    try:
+        with transaction.atomic():
+            Quota.objects.create(user=user, action=action, day=day, used=amount)
+        return True
+    except IntegrityError:
+        # Another request made today's row first
+        return bool(quotas.update(used=F("used") + amount))
+
+# Gives back amount of the user's quota for action on day (today by default)
+def release(user_id, action, amount=1, day=None):
+    day = day or localdate()
+    Quota.objects.filter(user_id=user_id, action=action, day=day, used__gte=amount).update(used=F("used") - amount)
+    exhausted.discard((user_id, action, day))
+
+# Deleting a set gives it back to its owner's quota for the day it was created, so a user who hits the limit
+# can remove a set made today to make another. Deleting the user deletes their quotas anyway.
+@receiver(pre_delete, sender=FlashcardSet)
+def release_set_quota(sender, instance, origin=None, **kwargs):
+    # Deleting the collection gives back all of its sets at once, see release_collection_quota
+    if deleted_with(origin, FlashcardCollection, User) or localdate(instance.created_at) != localdate():
+        return
+    owner = FlashcardCollection.objects.filter(pk=instance.flashcard_collection_id).values_list("user_id", flat=True).first()
+    release(owner, CREATE_SET)
+
+@receiver(pre_delete, sender=FlashcardCollection)
+def release_collection_quota(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, User):
+        return
+    start_of_today = make_aware(datetime.combine(localdate(), time()))
+    created_today = FlashcardSet.objects.filter(flashcard_collection=instance, created_at__gte=start_of_today).count()
+    if created_today:
+        release(instance.user_id, CREATE_SET, amount=created_today)
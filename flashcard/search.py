@@ -0,0 +1,208 @@
+import base64
+import binascii
+import html
+import json
+import math
+import re
+from django.db import connection
+from .visibility import visible_collection_ids
+
+# Full-text search over flashcards (question and answer) and sets (title and description), through the FTS5 indexes
+# made in migration 0019 (kept in step by triggers). Each index is searched for the rows that have every word of the
+# query, ranked by BM25, and only in collections the user can see. The two are merged into one list, best first.
+#
+# Results are paged by keyset like the rest of the API: the next page starts after the last result's
+# (score, kind, id), so each index only has to return the rows that come after it.
+
+# What each kind of result is searched in. weights are BM25's for each indexed column, so a word in a set's title
+# counts for more than one in its description.
+SOURCES = {
+    "flashcard": {
+        "index": "flashcard_flashcard_fts",
+        "join": "JOIN flashcard_flashcard f ON f.id = flashcard_flashcard_fts.rowid JOIN flashcard_flashcardset s ON s.id = f.flashcard_set_id",
+        "set_id": "f.flashcard_set_id",
+        "weights": (1.0, 1.0),
+    },
+    "set": {
+        "index": "flashcard_flashcardset_fts",
+        "join": "JOIN flashcard_flashcardset s ON s.id = flashcard_flashcardset_fts.rowid",
+        "set_id": "s.id",
+        "weights": (2.0, 1.0),
+    },
+}
+
+# Words after this many are ignored
+MAX_TERMS = 20
+# Words of context around the matches in a snippet
+SNIPPET_WORDS = 16
+# Put around matched words by SQLite, and swapped for <mark> tags after the rest of the snippet is escaped
+MARK_START, MARK_END = "\ue000", "\ue001"
+
+# The FTS5 query for a search: every word in it, each quoted so nothing in it is read as FTS5 syntax
+def match_expression(q):
+    return " ".join(f'"{term}"' for term in re.findall(r"\w+", q)[:MAX_TERMS])
+
+# The snippet as HTML, with the matched words in <mark> tags
+def mark(snippet):
+    return html.escape(snippet or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+# SQL for one kind's results (and its parameters), best first, starting after the key `after` if there is one
+def source_sql(kind, source, expression, user, after, limit):
+    index = source["index"]
+    score = f"bm25({index}, {', '.join(map(str, source['weights']))})"
+    sql = (f"SELECT %s AS kind, {index}.rowid AS id, {source['set_id']} AS set_id, s.flashcard_collection_id AS collection_id, "
+           f"{score} AS score FROM {index} {source['join']} WHERE {index} MATCH %s")
+    params = [kind, expression]
+    if not user.is_superuser:
+        collections, collection_params = visible_collection_ids(user).query.sql_with_params()
+        sql += f" AND s.flashcard_collection_id IN ({collections})"
+        params += collection_params
+    if after is not None:
+        after_score, after_kind, after_id = after
+        # Results are in (score, kind, id) order, and every row here has the same kind
+        if kind < after_kind:
+            sql += f" AND {score} > %s"
+            params += [after_score]
+        elif kind == after_kind:
+            sql += f" AND ({score} > %s OR ({score} = %s AND {index}.rowid > %s))"
+            params += [after_score, after_score, after_id]
+        else:
+            sql += f" AND {score} >= %s"
+            params += [after_score]
+    sql += " ORDER BY score, id LIMIT %s"
+    params += [limit]
+    return f"SELECT * FROM ({sql})", params
+
+# Up to limit results for q that user can see, after the key `after`.
+# Returns the results, and the key to pass as `after` for the next page (None on the last page).
+def search(user, q, limit, after=None):
+    expression = match_expression(q)
+    if not expression:
+        return [], None
+    parts, params = [], []
+    for kind, source in SOURCES.items():
+        sql, source_params = source_sql(kind, source, expression, user, after, limit + 1)
+        parts.append(sql)
+        params += source_params
+    # One extra result says whether there is another page
+    sql = " UNION ALL ".join(parts) + " ORDER BY score, kind, id LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit + 1])
+        rows = cursor.fetchall()
+    page = rows[:limit]
+    snippets = {kind: get_snippets(source, expression, [pk for row_kind, pk, *_ in page if row_kind == kind])
+                for kind, source in SOURCES.items()}
+    results = [{
+        "type": kind,
+        "id": pk,
+        "flashcard_set": set_id,
+        "flashcard_collection": collection_id,
+        "snippet": snippets[kind].get(pk, ""),
+    } for kind, pk, set_id, collection_id, score in page]
+    if len(rows) <= limit:
+        return results, None
+    kind, pk, *_, score = rows[limit - 1]
+    return results, (score, kind, pk)
+
+# The snippets for the rows with these ids, by id. They are made after the page is picked, since SQLite would
+# otherwise make one for every match before sorting them.
+def get_snippets(source, expression, pks):
+    if not pks:
+        return {}
+    index = source["index"]
+    sql = (f"SELECT rowid, snippet({index}, -1, %s, %s, %s, %s) FROM {index} "
+           f"WHERE {index} MATCH %s AND rowid IN ({', '.join(['%s'] * len(pks))})")
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [MARK_START, MARK_END, "…", SNIPPET_WORDS, expression, *pks])
+        return {pk: mark(snippet) for pk, snippet in cursor.fetchall()}
+
+# Cursors for the next page: the key of the last result, as base64 JSON. decode_cursor raises ValueError for anything else.
+def encode_cursor(after):
+    return base64.urlsafe_b64encode(json.dumps(list(after)).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        score, kind, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(score, (int, float)) or kind not in SOURCES or not isinstance(pk, int) or isinstance(pk, bool):
+        raise ValueError("Invalid cursor.")
+    return (score, kind, pk)
+
+# Fuzzy search over set and collection titles, for misspelt searches that find nothing above ("photosynthisis").
+# Titles are compared by trigrams (every three characters), and a title is a result if it has at least
+# MIN_SIMILARITY of the query's trigrams.
+# Such a title must have at least one of the query's rarest trigrams (all but the fewest it could have and still
+# be a result), so only titles with one of those are read, from the trigram indexes made in migration 0020. The
+# ones that share the most (by BM25, so rare trigrams count for more) are the candidates, which are then ranked by
+# how much of the query's trigrams they have.
+TRIGRAM_SOURCES = {
+    "set": {
+        "index": "flashcard_flashcardset_trigram",
+        "join": "JOIN flashcard_flashcardset s ON s.id = flashcard_flashcardset_trigram.rowid",
+        "collection_id": "s.flashcard_collection_id",
+    },
+    "collection": {
+        "index": "flashcard_flashcardcollection_trigram",
+        "join": "JOIN flashcard_flashcardcollection c ON c.id = flashcard_flashcardcollection_trigram.rowid",
+        "collection_id": "c.id",
+    },
+}
+
+# Trigrams of the query after this many are ignored
+MAX_TRIGRAMS = 64
+# Candidates read from each index for every result asked for
+CANDIDATES_PER_RESULT = 10
+# Share of the query's trigrams a title needs to have to be a result
+MIN_SIMILARITY = 0.5
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# Share of the query's trigrams that are in the title
+def similarity(query_trigrams, title):
+    return len(query_trigrams & trigrams(title)) / len(query_trigrams)
+
+# The trigrams to look titles up by: the rarest in the index, as many as a result could be missing plus one
+def rarest_trigrams(index, query_trigrams):
+    placeholders = ", ".join(["%s"] * len(query_trigrams))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT term, doc FROM {index}_vocab WHERE term IN ({placeholders})", list(query_trigrams))
+        counts = dict(cursor.fetchall())
+    # Trigrams no title has can't find anything
+    found = sorted((trigram for trigram in query_trigrams if trigram in counts), key=lambda trigram: (counts[trigram], trigram))
+    needed = math.ceil(MIN_SIMILARITY * len(query_trigrams))
+    return found[:len(query_trigrams) - needed + 1]
+
+# The k titles most like q that user can see, most alike first
+def fuzzy_search(user, q, k):
+    query_trigrams = set(sorted(trigrams(q.strip()))[:MAX_TRIGRAMS])
+    if not query_trigrams:
+        return []
+    results = []
+    for kind, source in TRIGRAM_SOURCES.items():
+        index = source["index"]
+        lookup = rarest_trigrams(index, query_trigrams)
+        if not lookup:
+            continue
+        # Any of the trigrams, each quoted (with quotes doubled) so it is read as text
+        expression = " OR ".join('"' + trigram.replace('"', '""') + '"' for trigram in lookup)
+        sql = (f"SELECT {index}.rowid, {index}.title, {source['collection_id']} FROM {index} {source['join']} "
+               f"WHERE {index} MATCH %s")
+        params = [expression]
+        if not user.is_superuser:
+            collections, collection_params = visible_collection_ids(user).query.sql_with_params()
+            sql += f" AND {source['collection_id']} IN ({collections})"
+            params += collection_params
+        sql += " ORDER BY rank LIMIT %s"
+        params += [k * CANDIDATES_PER_RESULT]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for pk, title, collection_id in cursor.fetchall():
+                score = similarity(query_trigrams, title)
+                if score >= MIN_SIMILARITY:
+                    results.append({"type": kind, "id": pk, "title": title, "flashcard_collection": collection_id,
+                                    "similarity": round(score, 3)})
+    results.sort(key=lambda result: (-result["similarity"], result["type"], result["id"]))
+    return results[:k]
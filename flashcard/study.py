@@ -0,0 +1,70 @@
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import now
+from .models import FlashCard, StudyProgress
+
+# Spaced repetition with SM-2. After studying a flashcard the user grades how well they remembered it, from 0 (not
+# at all) to 5 (perfectly). A pass (3 or more) makes the flashcard due again after 1 day, then 6, then the last
+# interval times its ease; a fail starts it again from 1 day. Every grade moves the ease, down to MIN_EASE.
+#
+# The study queue is the user's flashcards that are due, soonest first, read as a range of the (user, due_at) index,
+# followed by flashcards they haven't studied yet.
+
+GRADES = range(0, 6)
+PASSING_GRADE = 3
+MIN_EASE = 1.3
+
+# Move progress on for a review with the given grade at the given time (without saving it)
+def schedule(progress, grade, reviewed_at):
+    if grade >= PASSING_GRADE:
+        progress.repetitions += 1
+        if progress.repetitions == 1:
+            progress.interval = 1
+        elif progress.repetitions == 2:
+            progress.interval = 6
+        else:
+            progress.interval = round(progress.interval * progress.ease)
+    else:
+        if progress.repetitions > 0:
+            progress.lapses += 1
+        progress.repetitions = 0
+        progress.interval = 1
+    progress.ease = max(MIN_EASE, progress.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    progress.reviewed_at = reviewed_at
+    progress.due_at = reviewed_at + timedelta(days=progress.interval)
+    return progress
+
+# Record user's grade for flashcard, and return their progress on it
+def record_grade(user, flashcard, grade):
+    reviewed_at = now()
+    # Two grades of a new flashcard at once can both try to add its progress. The second then grades the first's.
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                progress = (StudyProgress.objects.filter(user=user, flashcard=flashcard).first()
+                            or StudyProgress(user=user, flashcard=flashcard))
+                schedule(progress, grade, reviewed_at)
+                progress.save()
+            return progress
+        except IntegrityError:
+            if attempt:
+                raise
+
+# Up to limit flashcards for user to study out of those matching lookup (e.g. {"flashcard_set": 1}): the due ones,
+# soonest first, then ones they haven't studied, in id order. Each has its progress as .progress (None for new ones).
+def due_flashcards(user, lookup, limit):
+    due = list(StudyProgress.objects
+               .filter(user=user, due_at__lte=now(), **{f"flashcard__{field}": value for field, value in lookup.items()})
+               .select_related("flashcard")
+               .order_by("due_at", "id")[:limit])
+    flashcards = []
+    for progress in due:
+        progress.flashcard.progress = progress
+        flashcards.append(progress.flashcard)
+    if len(flashcards) < limit:
+        studied = StudyProgress.objects.filter(user=user, flashcard=OuterRef("pk"))
+        for flashcard in FlashCard.objects.filter(**lookup).filter(~Exists(studied)).order_by("id")[:limit - len(flashcards)]:
+            flashcard.progress = None
+            flashcards.append(flashcard)
+    return flashcards
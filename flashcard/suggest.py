@@ -0,0 +1,265 @@
+import bisect
+import heapq
+import math
+import threading
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from .models import FlashcardSet, SetChange
+
+# Title suggestions for a search box (GET /api/suggest?prefix=), answered from memory without querying the database.
+# Each process keeps the titles of public sets (the SUGGEST_MAX_TITLES best weighted, to bound its memory) in a trie,
+# with a key for the title from the start of each of its words. Each branch of the trie keeps its best weighted set
+# ids, so a prefix's suggestions are found by walking down to it, however many titles it matches. Small subtrees are
+# kept as unsorted leaves of at most LEAF_SIZE keys, which are filtered and ranked when a prefix ends in one.
+#
+# The index is built by the first suggestion. After that a background thread reads the SetChange rows since the last
+# one it saw every SUGGEST_REFRESH_INTERVAL seconds, reloads only those sets, and prunes the log. It builds the index
+# from scratch when it has missed changes (too many of them, or ones that were pruned before it read them).
+
+# Most keys in a leaf before it is split into a branch
+LEAF_SIZE = 64
+# Words of a title after this many can't be searched from
+MAX_WORDS = 8
+
+# Better rated sets first, then more reviewed ones
+def weight(rating_average, rating_count):
+    return (rating_average or 0) * math.log1p(rating_count)
+
+# What the title can be found by: itself from the start of each word, folded to lowercase
+def keys_of(title):
+    text = title.casefold()
+    starts = [i for i, char in enumerate(text) if char.isalnum() and (i == 0 or not text[i - 1].isalnum())]
+    return {text[i:] for i in starts[:MAX_WORDS]}
+
+def public_sets():
+    return FlashcardSet.objects.filter(flashcard_collection__public=True).values_list("id", "title", "rating_average", "rating_count")
+
+class Node:
+    __slots__ = ["entries", "children", "top"]
+
+    def __init__(self, entries):
+        # (key, set id) pairs under a leaf, or those whose key ends at a branch
+        self.entries = entries
+        # Nodes by the next character of their keys, or None for a leaf
+        self.children = None
+        # A branch's best set ids, or None until they are next needed
+        self.top = None
+
+# The node for entries[start:end] of the sorted (key, set id) pairs, which share their first depth characters
+def build(entries, start, end, depth):
+    if end - start <= LEAF_SIZE:
+        return Node(set(entries[start:end]))
+    prefix = entries[start][0][:depth]
+    # Keys that end here sort first, and each child's keys are a range found by binary search
+    first_child = bisect.bisect_left(entries, (prefix + "\0",), start, end)
+    node = Node(set(entries[start:first_child]))
+    node.children = {}
+    start = first_child
+    while start < end:
+        char = entries[start][0][depth]
+        child_end = bisect.bisect_left(entries, (prefix + char + "\U0010ffff",), start, end)
+        node.children[char] = build(entries, start, child_end, depth + 1)
+        start = child_end
+    return node
+
+class TitleTree:
+    def __init__(self, rows):
+        # (title, weight) by set id
+        self.titles = {pk: (title, title_weight) for pk, title, title_weight in rows}
+        entries = sorted((key, pk) for pk, (title, _) in self.titles.items() for key in keys_of(title))
+        self.root = build(entries, 0, len(entries), 0)
+        # (weight, set id) of every title, lowest first, for making room. Entries for titles that have since been
+        # removed or reweighted are skipped when they come up.
+        self.weights = [(title_weight, pk) for pk, (_, title_weight) in self.titles.items()]
+        heapq.heapify(self.weights)
+        if self.root.children is not None:
+            self.top_of(self.root)
+
+    def rank(self, pk):
+        title, title_weight = self.titles[pk]
+        return (-title_weight, title, pk)
+
+    def lowest(self):
+        while self.weights:
+            title_weight, pk = self.weights[0]
+            if self.titles.get(pk, (None, None))[1] == title_weight:
+                return pk
+            heapq.heappop(self.weights)
+
+    def add(self, pk, title, title_weight):
+        if len(self.titles) >= settings.SUGGEST_MAX_TITLES:
+            # Make room by dropping the lowest weighted title, if this one is weighted higher
+            lowest = self.lowest()
+            if self.titles[lowest][1] >= title_weight:
+                return
+            self.remove(lowest)
+        self.titles[pk] = (title, title_weight)
+        heapq.heappush(self.weights, (title_weight, pk))
+        # Don't let skipped entries pile up
+        if len(self.weights) > 2 * len(self.titles) + LEAF_SIZE:
+            self.weights = [(title_weight, pk) for pk, (_, title_weight) in self.titles.items()]
+            heapq.heapify(self.weights)
+        for key in keys_of(title):
+            self.insert(key, pk)
+
+    def remove(self, pk):
+        if pk not in self.titles:
+            return
+        for key in keys_of(self.titles[pk][0]):
+            self.delete(key, pk)
+        del self.titles[pk]
+
+    def insert(self, key, pk):
+        node, depth = self.root, 0
+        while node.children is not None:
+            if node.top is not None and pk not in node.top:
+                top = node.top
+                if len(top) < settings.SUGGEST_LIMIT or self.rank(pk) < self.rank(top[-1]):
+                    top.append(pk)
+                    top.sort(key=self.rank)
+                    del top[settings.SUGGEST_LIMIT:]
+            if depth == len(key):
+                node.entries.add((key, pk))
+                return
+            node = node.children.setdefault(key[depth], Node(set()))
+            depth += 1
+        node.entries.add((key, pk))
+        if len(node.entries) > LEAF_SIZE:
+            branch = build(sorted(node.entries), 0, len(node.entries), depth)
+            node.entries, node.children = branch.entries, branch.children
+
+    def delete(self, key, pk):
+        node, depth = self.root, 0
+        while node.children is not None:
+            # Worked out again from the node's children when it is next needed
+            if node.top is not None and pk in node.top:
+                node.top = None
+            if depth == len(key):
+                break
+            node = node.children[key[depth]]
+            depth += 1
+        node.entries.discard((key, pk))
+
+    def top_of(self, node):
+        if node.top is None:
+            pks = {pk for _, pk in node.entries}
+            for child in node.children.values():
+                pks.update(self.top_of(child) if child.children is not None else (pk for _, pk in child.entries))
+            node.top = heapq.nsmallest(settings.SUGGEST_LIMIT, pks, key=self.rank)
+        return node.top
+
+    # The best weighted set ids with a key starting with prefix (limit is at most SUGGEST_LIMIT)
+    def best(self, prefix, limit):
+        node = self.root
+        for char in prefix:
+            if node.children is None:
+                break
+            node = node.children.get(char)
+            if node is None:
+                return []
+        if node.children is not None:
+            return self.top_of(node)[:limit]
+        # A title is in a leaf once for each of its words that starts with prefix
+        pks = {pk for key, pk in node.entries if key.startswith(prefix)}
+        return heapq.nsmallest(limit, pks, key=self.rank)
+
+class SuggestIndex:
+    def __init__(self):
+        # Held while the tree is read or changed
+        self.lock = threading.Lock()
+        # Held while the index is refreshed, so refreshes take turns
+        self.refreshing = threading.Lock()
+        self.stopped = threading.Event()
+        self.refresher = None
+        # The last SetChange read, or None before the index is built
+        self.version = None
+        self.tree = TitleTree([])
+
+    # Read every public set (outside the lock, so suggestions go on from the old tree meanwhile)
+    def rebuild(self):
+        # Read the version first: changes made while the sets load are read again on the next refresh
+        version = SetChange.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        rows = heapq.nlargest(settings.SUGGEST_MAX_TITLES, public_sets().iterator(), key=lambda row: weight(*row[2:]))
+        tree = TitleTree((pk, title, weight(*rating)) for pk, title, *rating in rows)
+        with self.lock:
+            self.tree = tree
+            self.version = version
+
+    # Reload the sets changed since the index was last refreshed
+    def refresh(self):
+        with self.refreshing:
+            if self.version is None:
+                self.rebuild()
+                return
+            log_size = settings.SUGGEST_CHANGE_LOG_SIZE
+            changes = list(SetChange.objects.filter(pk__gt=self.version).order_by("pk").values_list("pk", "set_id")[:log_size])
+            if not changes:
+                return
+            latest = changes[-1][0]
+            # Changes up to latest - log_size may have been pruned before they were read
+            if latest - log_size >= self.version:
+                self.rebuild()
+                return
+            set_ids = {set_id for _, set_id in changes}
+            rows = {pk: (title, weight(*rating)) for pk, title, *rating in public_sets().filter(pk__in=set_ids)}
+            with self.lock:
+                for pk in set_ids:
+                    if self.tree.titles.get(pk) == rows.get(pk):
+                        continue
+                    self.tree.remove(pk)
+                    if pk in rows:
+                        self.tree.add(pk, *rows[pk])
+                self.version = latest
+
+    # Keep the last SUGGEST_CHANGE_LOG_SIZE changes for processes that are further behind
+    def prune(self):
+        if self.version is not None:
+            SetChange.objects.filter(pk__lte=self.version - settings.SUGGEST_CHANGE_LOG_SIZE).delete()
+
+    def start(self):
+        with self.lock:
+            if self.refresher is not None or not settings.SUGGEST_REFRESH_INTERVAL:
+                return
+            self.refresher = threading.Thread(target=self.run, name="suggest-refresh", daemon=True)
+        self.refresher.start()
+
+    def run(self):
+        while not self.stopped.wait(settings.SUGGEST_REFRESH_INTERVAL):
+            # The thread has its own database connection, closed like a request's
+            close_old_connections()
+            try:
+                self.refresh()
+                self.prune()
+            except DatabaseError:
+                # Try again next time
+                pass
+            finally:
+                close_old_connections()
+
+    # Up to limit public sets with a word starting with prefix, best weighted first
+    def suggest(self, prefix, limit):
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        if self.version is None:
+            self.refresh()
+            self.start()
+        with self.lock:
+            return [{"id": pk, "title": self.tree.titles[pk][0]} for pk in self.tree.best(prefix, limit)]
+
+# This process's index
+index = SuggestIndex()
+
+def suggest(prefix, limit):
+    return index.suggest(prefix, limit)
+
+# Pick up changes now rather than on the refresher's next run (e.g. in tests, which don't start it)
+def refresh():
+    index.refresh()
+    index.prune()
+
+# Start again from scratch on the next suggestion (e.g. in tests, whose database changes are rolled back)
+def reset():
+    global index
+    index.stopped.set()
+    index = SuggestIndex()
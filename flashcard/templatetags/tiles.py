@@ -0,0 +1,31 @@
+from django import template
+
+register = template.Library()
+
+# {% tile obj %}...{% endtile %} renders the block once per version of obj and then reuses it from the cache,
+# see flashcard/tiles.py. The view puts the page's cached tiles in the context as "tiles" (TileCacheMixin);
+# without them the block is just rendered.
+@register.tag
+def tile(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError("'tile' takes the object the tile shows")
+    nodelist = parser.parse(("endtile",))
+    parser.delete_first_token()
+    return TileNode(nodelist, parser.compile_filter(bits[1]))
+
+class TileNode(template.Node):
+    def __init__(self, nodelist, obj):
+        self.nodelist = nodelist
+        self.obj = obj
+
+    def render(self, context):
+        tiles = context.get("tiles")
+        if tiles is None:
+            return self.nodelist.render(context)
+        obj = self.obj.resolve(context)
+        html = tiles.get(obj)
+        if html is None:
+            html = self.nodelist.render(context)
+            tiles.set(obj, html)
+        return html
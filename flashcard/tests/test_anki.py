@@ -0,0 +1,108 @@
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import zipfile
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from flashcard.anki import import_apkg, clean_field, copy_collection
+from flashcard.importers import ImportFormatError
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection
+
+# Builds an .apkg in memory. decks maps deck ids to names, notes are (fields, tags, deck id) tuples.
+# New style packages keep the decks in a table, old style ones as JSON in col.decks.
+def make_apkg(decks, notes, new_style=False):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "collection.anki2")
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE col (id INTEGER PRIMARY KEY, decks TEXT)")
+        db.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, flds TEXT, tags TEXT)")
+        db.execute("CREATE TABLE cards (id INTEGER PRIMARY KEY, nid INTEGER, did INTEGER, odid INTEGER, ord INTEGER)")
+        if new_style:
+            db.execute("CREATE TABLE decks (id INTEGER PRIMARY KEY, name TEXT)")
+            db.executemany("INSERT INTO decks VALUES (?, ?)", [(deck_id, name.replace("::", "\x1f")) for deck_id, name in decks.items()])
+            db.execute("INSERT INTO col VALUES (1, '{}')")
+        else:
+            db.execute("INSERT INTO col VALUES (1, ?)", [json.dumps({str(deck_id): {"id": deck_id, "name": name} for deck_id, name in decks.items()})])
+        for note_id, (fields, tags, deck_id) in enumerate(notes, start=1):
+            db.execute("INSERT INTO notes VALUES (?, ?, ?)", [note_id, "\x1f".join(fields), tags])
+            db.execute("INSERT INTO cards (nid, did, odid, ord) VALUES (?, ?, 0, 0)", [note_id, deck_id])
+        db.commit()
+        db.close()
+        package = io.BytesIO()
+        with zipfile.ZipFile(package, "w") as archive:
+            archive.write(path, "collection.anki2")
+            archive.writestr("media", "{}")
+    package.seek(0)
+    return package
+
+class TestAnkiImport(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.collection = FlashcardCollection.objects.create(title="Collection", user=cls.user)
+
+    def test_import(self):
+        notes = [([f"Question {i}", "Answer"], "", 1) for i in range(1200)] + [(["Bonjour", "Hello"], " french Hard ", 2)]
+        package = make_apkg({1: "Default", 2: "French::Greetings", 3: "Empty"}, notes)
+        report = import_apkg(package, self.collection, batch_size=500)
+        self.assertEqual((report["rows"], report["created"], report["skipped"]), (1201, 1201, 0))
+        self.assertEqual([s["title"] for s in report["sets"]], ["Default", "French::Greetings"])
+        sets = {s.title: s for s in self.collection.flashcard_set.all()}
+        self.assertEqual(set(sets), {"Default", "French::Greetings"})
+        self.assertEqual(sets["Default"].flashcard.filter(difficulty="medium").count(), 1200)
+        self.assertEqual(sets["French::Greetings"].flashcard.get().difficulty, "hard")
+
+    def test_new_style_decks(self):
+        report = import_apkg(make_apkg({5: "Parent::Child"}, [(["Q", "A"], "", 5)], new_style=True), self.collection)
+        self.assertEqual(report["sets"][0]["title"], "Parent::Child")
+
+    def test_invalid_notes_are_skipped(self):
+        report = import_apkg(make_apkg({1: "Deck"}, [(["Q", "A"], "", 1), (["Only a question"], "", 1)]), self.collection)
+        self.assertEqual((report["created"], report["skipped"]), (1, 1))
+        self.assertEqual(report["errors"][0]["row"], 2)
+
+    def test_clean_field(self):
+        self.assertEqual(clean_field("<b>Bonjour</b><br>Hello&nbsp;&amp; [sound:hello.mp3]"), "Bonjour\nHello &")
+
+    def test_not_a_package(self):
+        with self.assertRaises(ImportFormatError):
+            import_apkg(io.BytesIO(b"not a zip"), self.collection)
+        self.assertFalse(FlashcardSet.objects.exists())
+
+    def test_compressed_package(self):
+        package = io.BytesIO()
+        with zipfile.ZipFile(package, "w") as archive:
+            archive.writestr("collection.anki2", "placeholder")
+            archive.writestr("collection.anki21b", "compressed")
+        with self.assertRaises(ImportFormatError):
+            import_apkg(package, self.collection)
+
+    @override_settings(ANKI_MAX_COLLECTION_SIZE=1000)
+    def test_collection_too_large(self):
+        package = io.BytesIO()
+        with zipfile.ZipFile(package, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("collection.anki2", b"\0" * 1001)
+        with self.assertRaises(ImportFormatError):
+            import_apkg(package, self.collection)
+        self.assertFalse(FlashcardSet.objects.exists())
+
+    @override_settings(ANKI_MAX_COLLECTION_SIZE=1000)
+    def test_unpacked_bytes_are_counted(self):
+        # Whatever size the package claims
+        target = io.BytesIO()
+        with self.assertRaises(ImportFormatError):
+            copy_collection(io.BytesIO(b"\0" * 1001), target)
+        self.assertLessEqual(len(target.getvalue()), 1000)
+        copy_collection(io.BytesIO(b"\0" * 1000), target)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".apkg", delete=False) as file:
+            file.write(make_apkg({1: "Deck"}, [(["Q", "A"], "", 1)]).read())
+        self.addCleanup(os.remove, file.name)
+        stdout = io.StringIO()
+        call_command("import_anki", self.collection.id, file.name, "--difficulty", "easy", stdout=stdout)
+        self.assertEqual(FlashCard.objects.get().difficulty, "easy")
+        self.assertIn("Imported 1 of 1 notes into 1 sets", stdout.getvalue())
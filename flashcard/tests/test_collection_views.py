@@ -1,6 +1,8 @@
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth.models import User
-from flashcard.models import FlashcardSet, FlashcardCollection
+from flashcard.models import FlashcardSet, FlashcardCollection, FlashCard
 
 class CollectionCreateTests(TestCase):
     @classmethod
@@ -51,6 +53,21 @@ class CollectionReadTests(TestCase):
             user=cls.user, 
             public=False)
     
+    def test_collection_list_shows_counts(self):
+        flashcard_set = FlashcardSet.objects.create(title="Set", flashcard_collection=self.public_collection)
+        FlashCard.objects.create(question="Question", answer="Answer", difficulty="easy", flashcard_set=flashcard_set)
+        response = self.client.get(f"/flashcard/collections")
+        self.assertContains(response, "1 set &middot; 1 card")
+    
+    def test_collection_list_query_count_is_constant(self):
+        counts = []
+        for _ in range(2):
+            FlashcardCollection.objects.bulk_create([FlashcardCollection(title="Collection", user=self.other_user, public=True) for _ in range(10)])
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(f"/flashcard/collections")
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+    
     def test_get_all_collections_logged_out(self):
         response = self.client.get(f"/flashcard/collections")
         self.assertContains(response, self.public_collection)
@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import tempfile
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from flashcard import importers
+from flashcard.importers import ImportFormatError, read_rows, import_flashcards
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection
+
+class TestReaders(TestCase):
+    def read(self, content, format):
+        return list(read_rows(io.BytesIO(content.encode()), format))
+
+    def test_csv(self):
+        rows = self.read('\ufeffquestion,answer\n"Multi\nline",A\n', "csv")
+        self.assertEqual(rows, [{"question": "Multi\nline", "answer": "A"}])
+
+    def test_tsv(self):
+        self.assertEqual(self.read("question\tanswer\nQ\tA\n", "tsv"), [{"question": "Q", "answer": "A"}])
+
+    def test_ndjson(self):
+        self.assertEqual(self.read('{"question": "Q1"}\n\n{"question": "Q2"}\n', "ndjson"), [{"question": "Q1"}, {"question": "Q2"}])
+
+    def test_json_across_chunks(self):
+        rows = [{"question": f"Question {i}", "answer": "A" * i, "difficulty": i} for i in range(200)]
+        content = json.dumps(rows, indent=2)
+        original = importers.CHUNK_SIZE
+        importers.CHUNK_SIZE = 7
+        try:
+            self.assertEqual(self.read(content, "json"), rows)
+        finally:
+            importers.CHUNK_SIZE = original
+
+    def test_empty_json_list(self):
+        self.assertEqual(self.read(" [ ] ", "json"), [])
+
+    def test_invalid_json(self):
+        for content in ['{"question": "Q"}', '[{"question": "Q"}', '[{"question": "Q"} {}]', '[] []', '[{"question": }]']:
+            with self.subTest(content=content), self.assertRaises(ImportFormatError):
+                self.read(content, "json")
+
+    def test_format_from_name(self):
+        self.assertEqual(list(read_rows(io.BytesIO(b"question\nQ\n"), name="cards.CSV")), [{"question": "Q"}])
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ImportFormatError):
+            read_rows(io.BytesIO(b""), name="cards.xlsx")
+
+    def test_invalid_utf8(self):
+        with self.assertRaises(ImportFormatError):
+            list(read_rows(io.BytesIO(b"question\n\xff\n"), "csv"))
+
+class TestImportFlashcards(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.collection = FlashcardCollection.objects.create(title="Collection", user=cls.user)
+        cls.set = FlashcardSet.objects.create(title="Set", flashcard_collection=cls.collection)
+
+    def test_import(self):
+        rows = ({"Question": f"Q{i}", "ANSWER": "A", "difficulty": "Easy"} for i in range(1200))
+        batches = []
+        report = import_flashcards(self.set, rows, batch_size=500, progress=batches.append)
+        self.assertEqual(report, {"rows": 1200, "created": 1200, "skipped": 0, "errors": []})
+        self.assertEqual(batches, [500, 1000, 1200])
+        self.assertEqual(self.set.flashcard.filter(difficulty="easy").count(), 1200)
+
+    def test_invalid_rows_are_skipped(self):
+        rows = [{"question": "Q", "answer": "A", "difficulty": "easy"}, {"question": "Q", "difficulty": "easy"}, {"question": "Q", "answer": "A", "difficulty": "impossible"}, ["Q", "A"]]
+        report = import_flashcards(self.set, rows)
+        self.assertEqual((report["rows"], report["created"], report["skipped"]), (4, 1, 3))
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 3, 4])
+        self.assertIn("answer", report["errors"][0]["errors"])
+        self.assertIn("difficulty", report["errors"][1]["errors"])
+        self.assertIn("non_field_errors", report["errors"][2]["errors"])
+
+    def test_columns_and_default_difficulty(self):
+        report = import_flashcards(self.set, [{"Front": "Q", "Back": "A"}], columns={"question": "front", "answer": "back"}, default_difficulty="medium")
+        self.assertEqual(report["created"], 1)
+        flashcard = self.set.flashcard.get()
+        self.assertEqual((flashcard.question, flashcard.answer, flashcard.difficulty), ("Q", "A", "medium"))
+
+    def test_format_error_rolls_back(self):
+        with self.assertRaises(ImportFormatError):
+            import_flashcards(self.set, read_rows(io.BytesIO(b'[{"question": "Q", "answer": "A", "difficulty": "easy"}, oops]'), "json"), batch_size=1)
+        self.assertFalse(FlashCard.objects.exists())
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write("question,answer\nQ1,A1\nQ2,A2\n")
+        self.addCleanup(os.remove, file.name)
+        stdout = io.StringIO()
+        call_command("import_flashcards", self.set.id, file.name, "--difficulty", "hard", stdout=stdout)
+        self.assertEqual(self.set.flashcard.filter(difficulty="hard").count(), 2)
+        self.assertIn("Imported 2 of 2 rows", stdout.getvalue())
+
+    def test_command_missing_set(self):
+        with self.assertRaises(CommandError):
+            call_command("import_flashcards", 999, "cards.csv")
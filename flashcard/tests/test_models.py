@@ -1,6 +1,11 @@
+import io
 from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection, transaction, IntegrityError
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review
+from flashcard.bulk import bulk_create_flashcards
 from django.utils import timezone
 
 class TestFlashcard(TestCase):
@@ -103,6 +108,59 @@ class TestFlashcard(TestCase):
     def test_to_string(self):
         self.assertEqual(str(self.flashcard), self.flashcard.question)
 
+    # region set touches
+    def test_flashcard_saves_touch_set_once_on_commit(self):
+        updated_at = FlashcardSet.objects.get(pk=self.set.id).updated_at
+        flashcard = FlashCard.objects.get(pk=self.flashcard.id)
+        with self.captureOnCommitCallbacks() as callbacks, transaction.atomic():
+            for i in range(5):
+                flashcard.question = f"Question {i}"
+                flashcard.save()
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        # One UPDATE for the set and one for its collection
+        self.assertEqual(len(queries), 2)
+        self.assertGreater(FlashcardSet.objects.get(pk=self.set.id).updated_at, updated_at)
+    
+    def test_touches_of_many_sets_are_one_touch(self):
+        other_set = FlashcardSet.objects.create(title="Other set", flashcard_collection=self.collection)
+        other_flashcard = FlashCard.objects.create(question="Question", answer="Answer", difficulty="easy", flashcard_set=other_set)
+        with self.captureOnCommitCallbacks() as callbacks, transaction.atomic():
+            self.flashcard.save()
+            other_flashcard.save()
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len(queries), 2)
+    
+    def test_touch_after_rolled_back_savepoint(self):
+        updated_at = FlashcardSet.objects.get(pk=self.set.id).updated_at
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            try:
+                with transaction.atomic():
+                    self.flashcard.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            # The touch registered in the savepoint was dropped with it, this one still runs
+            self.flashcard.save()
+        self.assertGreater(FlashcardSet.objects.get(pk=self.set.id).updated_at, updated_at)
+
+    def test_rolled_back_flashcard_save_does_not_touch_set(self):
+        updated_at = FlashcardSet.objects.get(pk=self.set.id).updated_at
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    FlashCard.objects.create(question="Question", answer="ANSWER", difficulty="easy", flashcard_set=self.set)
+                    self.flashcard.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(FlashcardSet.objects.get(pk=self.set.id).updated_at, updated_at)
+    # endregion
+
 class TestFlashcardSet(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -257,6 +315,27 @@ class TestFlashcardCollection(TestCase):
             FlashCard.objects.get(pk=self.flashcard.id)
         with self.assertRaises(Exception):
             FlashcardSet.objects.get(pk=self.set.id)
+    
+    # region updated_at
+    def test_set_change_updates_collection(self):
+        updated_at = FlashcardCollection.objects.get(pk=self.collection.id).updated_at
+        self.set.title = "New title"
+        self.set.save()
+        self.assertGreater(FlashcardCollection.objects.get(pk=self.collection.id).updated_at, updated_at)
+    
+    def test_set_delete_updates_collection(self):
+        updated_at = FlashcardCollection.objects.get(pk=self.collection.id).updated_at
+        self.set.delete()
+        self.assertGreater(FlashcardCollection.objects.get(pk=self.collection.id).updated_at, updated_at)
+    
+    def test_set_move_updates_both_collections(self):
+        other_collection = FlashcardCollection.objects.create(title="Other", user=self.user)
+        flashcard_set = FlashcardSet.objects.get(pk=self.set.id)
+        updated_at = FlashcardCollection.objects.get(pk=self.collection.id).updated_at
+        flashcard_set.flashcard_collection = other_collection
+        flashcard_set.save()
+        self.assertGreater(FlashcardCollection.objects.get(pk=self.collection.id).updated_at, updated_at)
+    # endregion
 
 class TestComments(TestCase):
     @classmethod
@@ -329,6 +408,16 @@ class TestComments(TestCase):
         final_count = Comment.objects.count()
         self.assertEqual(initial_count - 1, final_count)
     
+    def test_comments_bump_set_version(self):
+        version = FlashcardSet.objects.get(pk=self.set.id).version
+        comment = Comment.objects.create(comment="New comment", user=self.user, flashcard_set=self.set)
+        self.assertEqual(FlashcardSet.objects.get(pk=self.set.id).version, version + 1)
+        comment.comment = "Edited comment"
+        comment.save()
+        self.assertEqual(FlashcardSet.objects.get(pk=self.set.id).version, version + 1)
+        comment.delete()
+        self.assertEqual(FlashcardSet.objects.get(pk=self.set.id).version, version + 2)
+    
     def test_to_string(self):
         self.assertEqual(self.comment.comment, str(self.comment))
         
@@ -454,4 +543,174 @@ class TestReviews(TestCase):
         self.assertEqual(initial_count - 1, final_count)
     
     def test_to_string(self):
-        self.assertEqual("@" + self.user.username + " | Rating: " + str(self.review.rating), str(self.review))
\ No newline at end of file
+        self.assertEqual("@" + self.user.username + " | Rating: " + str(self.review.rating), str(self.review))    
+    # region rating totals
+    def assertRatings(self, flashcard_set, rating_sum, rating_count, histogram):
+        flashcard_set = FlashcardSet.objects.get(pk=flashcard_set.id)
+        self.assertEqual((flashcard_set.rating_sum, flashcard_set.rating_count), (rating_sum, rating_count))
+        self.assertEqual(flashcard_set.rating_average, rating_sum / rating_count if rating_count else None)
+        self.assertEqual(flashcard_set.rating_histogram, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0, **histogram})
+    
+    def test_create_review_adds_rating(self):
+        self.assertRatings(self.set, 2, 1, {2: 1})
+        Review.objects.create(rating=5, user=self.other_user, flashcard_set=self.set)
+        self.assertRatings(self.set, 7, 2, {2: 1, 5: 1})
+    
+    def test_update_review_moves_rating(self):
+        review = Review.objects.get(pk=self.review.id)
+        review.rating = 4
+        review.save()
+        self.assertRatings(self.set, 4, 1, {4: 1})
+        # Saving again without a change doesn't count it twice
+        review.save()
+        self.assertRatings(self.set, 4, 1, {4: 1})
+    
+    def test_move_review_to_another_set(self):
+        other_set = FlashcardSet.objects.create(title="Other set", flashcard_collection=self.collection)
+        review = Review.objects.get(pk=self.review.id)
+        review.flashcard_set = other_set
+        review.save()
+        self.assertRatings(self.set, 0, 0, {})
+        self.assertRatings(other_set, 2, 1, {2: 1})
+    
+    def test_delete_review_removes_rating(self):
+        self.review.delete()
+        self.assertRatings(self.set, 0, 0, {})
+    
+    def test_cascade_delete_removes_rating(self):
+        Review.objects.create(rating=5, user=self.other_user, flashcard_set=self.set)
+        self.other_user.delete()
+        self.assertRatings(self.set, 2, 1, {2: 1})
+    
+    def test_second_review_of_set_is_rejected(self):
+        with self.assertRaises(IntegrityError):
+            Review.objects.create(rating=5, user=self.user, flashcard_set=self.set)
+        self.assertEqual(Review.objects.filter(user=self.user, flashcard_set=self.set).count(), 1)
+        self.assertRatings(self.set, 2, 1, {2: 1})
+    
+    def test_rating_change_bumps_set_version(self):
+        version = FlashcardSet.objects.get(pk=self.set.id).version
+        Review.objects.create(rating=5, user=self.other_user, flashcard_set=self.set)
+        self.assertEqual(FlashcardSet.objects.get(pk=self.set.id).version, version + 1)
+    
+    def test_rebuild_rating_aggregates(self):
+        # Bulk updates skip save(), so the totals drift until they are rebuilt
+        Review.objects.filter(pk=self.review.id).update(rating=3)
+        empty_set = FlashcardSet.objects.create(title="Empty", flashcard_collection=self.collection)
+        stdout = io.StringIO()
+        call_command("rebuild_rating_aggregates", "--chunk-size", "1", stdout=stdout)
+        self.assertRatings(self.set, 3, 1, {3: 1})
+        self.assertRatings(empty_set, 0, 0, {})
+        self.assertIn("Checked 2 sets, fixed 1.", stdout.getvalue())
+    # endregion
+
+class TestCounters(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.other_user = User.objects.create_user(username="other", password="password")
+        cls.collection = FlashcardCollection.objects.create(title="Collection", user=cls.user, public=True)
+        cls.other_collection = FlashcardCollection.objects.create(title="Other collection", user=cls.user, public=True)
+        cls.set = FlashcardSet.objects.create(title="Set", flashcard_collection=cls.collection)
+        cls.other_set = FlashcardSet.objects.create(title="Other set", flashcard_collection=cls.collection)
+        for i in range(3):
+            FlashCard.objects.create(question=f"Question {i}", answer="Answer", difficulty="easy", flashcard_set=cls.set)
+        Comment.objects.create(comment="Comment", flashcard_set=cls.set, user=cls.other_user)
+        Review.objects.create(rating=4, flashcard_set=cls.set, user=cls.other_user)
+    
+    def assertSetCounts(self, flashcard_set, flashcards, comments, reviews):
+        flashcard_set = FlashcardSet.objects.get(pk=flashcard_set.id)
+        self.assertEqual((flashcard_set.flashcard_count, flashcard_set.comment_count, flashcard_set.review_count), (flashcards, comments, reviews))
+    
+    def assertCollectionCounts(self, collection, sets, cards):
+        collection = FlashcardCollection.objects.get(pk=collection.id)
+        self.assertEqual((collection.set_count, collection.card_count), (sets, cards))
+    
+    def test_initial_counts(self):
+        self.assertSetCounts(self.set, 3, 1, 1)
+        self.assertSetCounts(self.other_set, 0, 0, 0)
+        self.assertCollectionCounts(self.collection, 2, 3)
+        self.assertCollectionCounts(self.other_collection, 0, 0)
+    
+    def test_delete_flashcard(self):
+        self.set.flashcard.first().delete()
+        self.assertSetCounts(self.set, 2, 1, 1)
+        self.assertCollectionCounts(self.collection, 2, 2)
+    
+    def test_delete_flashcards_queryset(self):
+        FlashCard.objects.create(question="Q", answer="A", difficulty="easy", flashcard_set=self.other_set)
+        FlashCard.objects.filter(flashcard_set__flashcard_collection=self.collection).exclude(question="Question 0").delete()
+        self.assertSetCounts(self.set, 1, 1, 1)
+        self.assertSetCounts(self.other_set, 0, 0, 0)
+        self.assertCollectionCounts(self.collection, 2, 1)
+        self.set.flashcard.all().delete()
+        self.assertSetCounts(self.set, 0, 1, 1)
+        self.assertCollectionCounts(self.collection, 2, 0)
+    
+    def test_rebuild_counters(self):
+        # Raw deletes skip the counts, so they drift until they are rebuilt
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM flashcard_flashcard WHERE flashcard_set_id = %s", [self.set.id])
+        version = FlashcardSet.objects.get(pk=self.set.id).version
+        stdout = io.StringIO()
+        call_command("rebuild_counters", "--chunk-size", "1", stdout=stdout)
+        self.assertSetCounts(self.set, 0, 1, 1)
+        self.assertSetCounts(self.other_set, 0, 0, 0)
+        self.assertCollectionCounts(self.collection, 2, 0)
+        self.assertCollectionCounts(self.other_collection, 0, 0)
+        self.assertEqual(FlashcardSet.objects.get(pk=self.set.id).version, version + 1)
+        self.assertIn("Checked 4 sets and collections, fixed 2.", stdout.getvalue())
+    
+    def test_move_flashcard(self):
+        flashcard = self.set.flashcard.first()
+        flashcard.flashcard_set = self.other_set
+        flashcard.save()
+        self.assertSetCounts(self.set, 2, 1, 1)
+        self.assertSetCounts(self.other_set, 1, 0, 0)
+        self.assertCollectionCounts(self.collection, 2, 3)
+    
+    def test_bulk_create_flashcards(self):
+        bulk_create_flashcards([FlashCard(question="Q", answer="A", difficulty="easy", flashcard_set=s) for s in [self.set, self.other_set, self.other_set]])
+        self.assertSetCounts(self.set, 4, 1, 1)
+        self.assertSetCounts(self.other_set, 2, 0, 0)
+        self.assertCollectionCounts(self.collection, 2, 6)
+    
+    def test_delete_set(self):
+        self.set.delete()
+        self.assertCollectionCounts(self.collection, 1, 0)
+    
+    def test_delete_sets_queryset(self):
+        FlashcardSet.objects.filter(flashcard_collection=self.collection).delete()
+        self.assertCollectionCounts(self.collection, 0, 0)
+    
+    def test_move_set(self):
+        flashcard_set = FlashcardSet.objects.get(pk=self.set.id)
+        flashcard_set.flashcard_collection = self.other_collection
+        flashcard_set.save()
+        self.assertCollectionCounts(self.collection, 1, 0)
+        self.assertCollectionCounts(self.other_collection, 1, 3)
+    
+    def test_delete_comment(self):
+        self.set.comments.get().delete()
+        self.assertSetCounts(self.set, 3, 0, 1)
+    
+    def test_delete_user_cascades_to_counts(self):
+        # other_user's comment and review are on a set they don't own
+        self.other_user.delete()
+        self.assertSetCounts(self.set, 3, 0, 0)
+    
+    def test_delete_collection(self):
+        self.collection.delete()
+        self.assertFalse(FlashcardSet.objects.filter(flashcard_collection=self.collection.id).exists())
+    
+    def test_stale_save_keeps_counts(self):
+        flashcard_set = FlashcardSet.objects.get(pk=self.set.id)
+        collection = FlashcardCollection.objects.get(pk=self.collection.id)
+        FlashCard.objects.create(question="Q", answer="A", difficulty="easy", flashcard_set=self.set)
+        flashcard_set.title = "Renamed"
+        flashcard_set.save()
+        collection.title = "Renamed"
+        collection.save()
+        self.assertSetCounts(self.set, 4, 1, 1)
+        self.assertCollectionCounts(self.collection, 2, 4)
+        self.assertEqual(FlashcardSet.objects.get(pk=self.set.id).title, "Renamed")
@@ -0,0 +1,75 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Comment
+
+@override_settings(WEB_PAGE_SIZE=2, WEB_MAX_PAGE_SIZE=3)
+class TestKeysetPagination(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.collection = FlashcardCollection.objects.create(title="Collection", user=cls.user, public=True)
+        # Sets with no reviews (rating_average is null) come after the rated ones
+        cls.sets = [FlashcardSet.objects.create(title=f"Set {i}", flashcard_collection=cls.collection) for i in range(5)]
+        for flashcard_set, average in zip(cls.sets, [4.0, None, 4.0, 2.5, None]):
+            FlashcardSet.objects.filter(pk=flashcard_set.pk).update(rating_average=average)
+        cls.set = cls.sets[0]
+        for i in range(5):
+            FlashCard.objects.create(question=f"Question {i}", answer="Answer", difficulty="easy", flashcard_set=cls.set)
+            Comment.objects.create(comment=f"Comment {i}", flashcard_set=cls.set, user=cls.user)
+
+    # Follows the "load more" links from url, returning every page's rows
+    def pages(self, url, name):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(list(response.context[name]))
+            url = response.context["next_url"]
+        return pages
+
+    def test_sets_follow_rating_order_across_pages(self):
+        pages = self.pages(f"/flashcard/collections/{self.collection.id}", "sets")
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        titles = [flashcard_set.title for page in pages for flashcard_set in page]
+        self.assertEqual(titles, ["Set 0", "Set 2", "Set 3", "Set 1", "Set 4"])
+
+    def test_every_list_pages_through_all_rows(self):
+        base = f"/flashcard/collections/{self.collection.id}/{self.set.id}"
+        for url, name, model in [(base, "flashcards", FlashCard), (f"{base}/comments", "comments", Comment)]:
+            with self.subTest(url=url):
+                rows = [row.id for page in self.pages(url, name) for row in page]
+                self.assertEqual(rows, list(model.objects.filter(flashcard_set=self.set).order_by("id").values_list("id", flat=True)))
+
+    def test_collections(self):
+        FlashcardCollection.objects.create(title="Private", user=User.objects.create_user(username="other"), public=False)
+        for i in range(3):
+            FlashcardCollection.objects.create(title=f"Collection {i}", user=self.user, public=True)
+        pages = self.pages("/flashcard/collections", "collections")
+        self.assertEqual([len(page) for page in pages], [2, 2])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(f"/flashcard/collections/{self.collection.id}?page_size=1000")
+        self.assertEqual(len(response.context["sets"]), 3)
+        response = self.client.get(f"/flashcard/collections/{self.collection.id}?page_size=1")
+        self.assertEqual(len(response.context["sets"]), 1)
+
+    def test_load_more_link(self):
+        response = self.client.get(f"/flashcard/collections/{self.collection.id}?page_size=3")
+        self.assertContains(response, "Load more")
+        self.assertIn("page_size=3", response.context["next_url"])
+        response = self.client.get(response.context["next_url"])
+        self.assertNotContains(response, "Load more")
+        self.assertIsNone(response.context["next_url"])
+
+    def test_page_queries_dont_grow(self):
+        url = f"/flashcard/collections/{self.collection.id}/{self.set.id}"
+        next_url = self.client.get(url).context["next_url"]
+        # The URL chain and one page of flashcards
+        with self.assertNumQueries(2):
+            self.client.get(next_url)
+
+    def test_invalid_cursor(self):
+        for cursor in ["nonsense", "WzFd", "WyJ4IiwgMV0="]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"/flashcard/collections/{self.collection.id}?after={cursor}")
+                self.assertEqual(response.status_code, 404)
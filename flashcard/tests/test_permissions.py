@@ -0,0 +1,89 @@
+from django.test import TestCase
+from django.http import Http404
+from django.contrib.auth.models import AnonymousUser, User
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection
+from flashcard.permissions import PermissionResolver
+
+class TestPermissionResolver(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        cls.other_user = User.objects.create_user(username="other", password="password")
+        cls.superuser = User.objects.create_superuser(username="super", password="password")
+        cls.public_collection = FlashcardCollection.objects.create(title="Public", user=cls.owner, public=True)
+        cls.private_collection = FlashcardCollection.objects.create(title="Private", user=cls.owner, public=False)
+        cls.public_set = FlashcardSet.objects.create(title="Public", flashcard_collection=cls.public_collection)
+        cls.private_set = FlashcardSet.objects.create(title="Private", flashcard_collection=cls.private_collection)
+        cls.private_flashcard = FlashCard.objects.create(question="Question", answer="Answer", difficulty="easy", flashcard_set=cls.private_set)
+
+    #region Rules
+    def test_anonymous_can_only_read_public(self):
+        resolver = PermissionResolver(AnonymousUser())
+        self.assertTrue(resolver.can_read(resolver.flashcard_set(self.public_set.id)))
+        self.assertFalse(resolver.can_read(resolver.flashcard(self.private_flashcard.id)))
+        self.assertFalse(resolver.can_write(resolver.collection(self.public_collection.id)))
+        self.assertFalse(resolver.can_delete(resolver.collection(self.public_collection.id)))
+
+    def test_owner_can_read_write_and_delete(self):
+        resolver = PermissionResolver(self.owner)
+        for obj in [resolver.collection(self.private_collection.id), resolver.flashcard_set(self.private_set.id), resolver.flashcard(self.private_flashcard.id)]:
+            with self.subTest(obj=obj):
+                self.assertTrue(resolver.can_read(obj))
+                self.assertTrue(resolver.can_write(obj))
+                self.assertTrue(resolver.can_delete(obj))
+
+    def test_other_user_can_only_read_public(self):
+        resolver = PermissionResolver(self.other_user)
+        self.assertTrue(resolver.can_read(resolver.flashcard_set(self.public_set.id)))
+        self.assertFalse(resolver.can_write(resolver.flashcard_set(self.public_set.id)))
+        self.assertFalse(resolver.can_read(resolver.flashcard_set(self.private_set.id)))
+
+    def test_superuser_can_read_and_delete_but_not_write(self):
+        resolver = PermissionResolver(self.superuser)
+        flashcard_set = resolver.flashcard_set(self.private_set.id)
+        self.assertTrue(resolver.can_read(flashcard_set))
+        self.assertTrue(resolver.can_delete(flashcard_set))
+        self.assertFalse(resolver.can_write(flashcard_set))
+    #endregion
+
+    #region Loading
+    def test_objects_are_loaded_once(self):
+        resolver = PermissionResolver(self.owner)
+        with self.assertNumQueries(1):
+            flashcard = resolver.flashcard(self.private_flashcard.id)
+            # The set and collection came with the flashcard
+            self.assertIs(resolver.flashcard_set(self.private_set.id), flashcard.flashcard_set)
+            self.assertIs(resolver.collection(self.private_collection.id), flashcard.flashcard_set.flashcard_collection)
+            self.assertTrue(resolver.can_write(flashcard))
+            resolver.flashcard(str(self.private_flashcard.id))
+
+    def test_prefetch_is_one_query(self):
+        resolver = PermissionResolver(self.other_user)
+        with self.assertNumQueries(1):
+            readable = resolver.readable(FlashcardSet, [self.public_set.id, self.private_set.id, 999])
+            writable = resolver.writable(FlashcardSet, [self.public_set.id, self.private_set.id, 999])
+        self.assertEqual(list(readable), [self.public_set.id])
+        self.assertEqual(writable, {})
+
+    def test_missing_or_invalid_pk(self):
+        resolver = PermissionResolver(self.owner)
+        for pk in [999, "abc", None, True]:
+            with self.subTest(pk=pk):
+                self.assertIsNone(resolver.get(FlashcardSet, pk))
+                with self.assertRaises(Http404):
+                    resolver.flashcard_set(pk)
+    #endregion
+
+class TestPermissionResolverViews(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        cls.collection = FlashcardCollection.objects.create(title="Collection", user=cls.owner, public=False)
+        cls.set = FlashcardSet.objects.create(title="Set", flashcard_collection=cls.collection)
+
+    def test_set_update_loads_collection_once(self):
+        self.client.force_login(self.owner)
+        with self.assertNumQueries(3):
+            # Session, user, and the set with its collection
+            response = self.client.get(f"/flashcard/collections/{self.collection.id}/{self.set.id}/update")
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,84 @@
+from unittest import skipUnless
+from django.test import TestCase
+from django.db import connection
+from django.db.models import F, Max, Q
+from django.contrib.auth.models import AnonymousUser, User
+from django.utils import timezone
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Review, StudyProgress
+from flashcard.visibility import visible_to
+
+# The queries the views run most often, and the index each one should be answered from
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite's")
+class TestQueryPlans(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Collection",
+            user=cls.user,
+            public=True)
+        cls.set = FlashcardSet.objects.create(
+            title="Set",
+            flashcard_collection=cls.collection)
+        Review.objects.create(rating=3, user=cls.user, flashcard_set=cls.set)
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    # Every step of the plan reads from an index (a plain "SCAN table" reads every row), and index is one of them
+    def assertUsesIndex(self, queryset, index):
+        plan = self.query_plan(queryset)
+        for step in plan:
+            self.assertTrue(step.startswith("SEARCH") or "USING" in step, plan)
+        self.assertTrue(any(index in step for step in plan), plan)
+
+    def test_public_collections(self):
+        self.assertUsesIndex(FlashcardCollection.objects.filter(public=True).order_by("id"), "collection_public_idx")
+
+    def test_user_public_collections(self):
+        for public in [True, False]:
+            with self.subTest(public=public):
+                self.assertUsesIndex(FlashcardCollection.objects.filter(user=self.user, public=public), "collection_user_public_idx")
+
+    def test_sets_created_today(self):
+        midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.assertUsesIndex(FlashcardSet.objects.filter(created_at__gte=midnight).values("pk"), "set_created_at_idx")
+
+    def test_collection_sets_by_updated_at(self):
+        sets = FlashcardSet.objects.filter(flashcard_collection=self.collection)
+        self.assertUsesIndex(sets.order_by("-updated_at"), "set_collection_updated_idx")
+        self.assertUsesIndex(sets.values("flashcard_collection").annotate(last_modified=Max("updated_at")), "set_collection_updated_idx")
+
+    def test_visible_flashcards(self):
+        # Found through the visible collections and sets rather than by reading every flashcard
+        for user in [AnonymousUser(), self.user]:
+            with self.subTest(user=str(user)):
+                plan = self.query_plan(visible_to(FlashCard.objects.all(), user))
+                self.assertFalse([step for step in plan if step.startswith("SCAN") and "USING" not in step], plan)
+
+    def test_user_review_of_set(self):
+        # The unique constraint's index, which SQLite names itself
+        plan = self.query_plan(Review.objects.filter(user=self.user, flashcard_set=self.set))
+        self.assertEqual(len(plan), 1, plan)
+        self.assertRegex(plan[0], r"^SEARCH flashcard_review USING (COVERING )?INDEX \S+ \(user_id=\? AND flashcard_set_id=\?\)")
+
+    def test_keyset_pages(self):
+        # The web list pages' "load more" queries, read in index order without a sort
+        sets = FlashcardSet.objects.filter(flashcard_collection=self.collection).order_by(F("rating_average").desc(nulls_last=True), "id")
+        after = Q(rating_average__lt=3) | Q(rating_average__isnull=True) | Q(rating_average=3, id__gt=1)
+        self.assertUsesIndex(sets.filter(after)[:31], "set_collection_rating_idx")
+        self.assertFalse([step for step in self.query_plan(sets.filter(after)[:31]) if "TEMP B-TREE" in step])
+        flashcards = FlashCard.objects.filter(flashcard_set=self.set, id__gt=1).order_by("id")[:31]
+        self.assertFalse([step for step in self.query_plan(flashcards) if "TEMP B-TREE" in step or step.startswith("SCAN")])
+
+    def test_due_queue(self):
+        # A range of the user's due flashcards, already in due order
+        now = timezone.now()
+        for lookup in [{}, {"flashcard__flashcard_set": self.set.id}, {"flashcard__flashcard_set__flashcard_collection": self.collection.id}]:
+            with self.subTest(lookup=lookup):
+                due = StudyProgress.objects.filter(user=self.user, due_at__lte=now, **lookup).order_by("due_at", "id")[:20]
+                self.assertUsesIndex(due, "study_user_due_idx")
+                self.assertFalse([step for step in self.query_plan(due) if "TEMP B-TREE" in step])
@@ -0,0 +1,106 @@
+import datetime
+from django.test import TestCase, override_settings
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.utils.timezone import localdate
+from flashcard.models import FlashcardSet, FlashcardCollection, Quota
+from flashcard import quotas
+from flashcard.quotas import CREATE_SET, QuotaExceeded, consume, release
+
+@override_settings(QUOTAS={CREATE_SET: 2}, QUOTA_CACHE=False)
+class TestQuotas(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.other_user = User.objects.create_user(username="other", password="password")
+        cls.collection = FlashcardCollection.objects.create(
+            title="Collection",
+            user=cls.user,
+            public=True)
+
+    def setUp(self):
+        quotas.exhausted.clear()
+        self.addCleanup(quotas.exhausted.clear)
+
+    def used(self, user=None):
+        quota = Quota.objects.filter(user=user or self.user, action=CREATE_SET, day=localdate()).first()
+        return quota.used if quota else 0
+
+    def test_consume_up_to_limit(self):
+        consume(self.user, CREATE_SET)
+        consume(self.user, CREATE_SET)
+        with self.assertRaises(QuotaExceeded):
+            consume(self.user, CREATE_SET)
+        self.assertEqual(self.used(), 2)
+
+    def test_quota_is_per_user(self):
+        consume(self.user, CREATE_SET, amount=2)
+        consume(self.other_user, CREATE_SET)
+        self.assertEqual((self.used(), self.used(self.other_user)), (2, 1))
+
+    def test_quota_is_per_day(self):
+        Quota.objects.create(user=self.user, action=CREATE_SET, day=localdate() - datetime.timedelta(days=1), used=2)
+        consume(self.user, CREATE_SET)
+        self.assertEqual(self.used(), 1)
+
+    def test_amount_over_limit_uses_nothing(self):
+        consume(self.user, CREATE_SET)
+        with self.assertRaises(QuotaExceeded):
+            consume(self.user, CREATE_SET, amount=2)
+        self.assertEqual(self.used(), 1)
+
+    def test_consume_is_one_query(self):
+        consume(self.user, CREATE_SET)
+        with self.assertNumQueries(1):
+            consume(self.user, CREATE_SET)
+
+    def test_rolled_back_action_gives_quota_back(self):
+        consume(self.user, CREATE_SET)
+        with self.assertRaises(ValueError), transaction.atomic():
+            consume(self.user, CREATE_SET)
+            raise ValueError
+        self.assertEqual(self.used(), 1)
+
+    def test_release(self):
+        consume(self.user, CREATE_SET, amount=2)
+        release(self.user.id, CREATE_SET)
+        self.assertEqual(self.used(), 1)
+        # Never below zero
+        release(self.user.id, CREATE_SET, amount=5)
+        self.assertEqual(self.used(), 1)
+
+    def test_deleting_todays_set_releases_quota(self):
+        consume(self.user, CREATE_SET)
+        flashcard_set = FlashcardSet.objects.create(title="Set", flashcard_collection=self.collection)
+        flashcard_set.delete()
+        self.assertEqual(self.used(), 0)
+
+    def test_deleting_older_set_keeps_quota(self):
+        consume(self.user, CREATE_SET)
+        flashcard_set = FlashcardSet.objects.create(title="Set", flashcard_collection=self.collection)
+        FlashcardSet.objects.filter(pk=flashcard_set.pk).update(created_at=flashcard_set.created_at - datetime.timedelta(days=2))
+        FlashcardSet.objects.get(pk=flashcard_set.pk).delete()
+        self.assertEqual(self.used(), 1)
+
+    def test_deleting_collection_releases_its_sets_at_once(self):
+        collection = FlashcardCollection.objects.create(title="Other", user=self.user)
+        for i in range(2):
+            consume(self.user, CREATE_SET)
+            FlashcardSet.objects.create(title=f"Set {i}", flashcard_collection=collection)
+        collection = FlashcardCollection.objects.get(pk=collection.pk)
+        # One count and one release for the whole collection, not a lookup per set
+        with self.assertNumQueries(8):
+            collection.delete()
+        self.assertEqual(self.used(), 0)
+
+    @override_settings(QUOTA_CACHE=True)
+    def test_cache_skips_database_once_used_up(self):
+        consume(self.user, CREATE_SET, amount=2)
+        with self.assertRaises(QuotaExceeded):
+            consume(self.user, CREATE_SET)
+        with self.assertNumQueries(0), self.assertRaises(QuotaExceeded):
+            consume(self.user, CREATE_SET)
+        # Giving quota back in this process forgets it was used up
+        release(self.user.id, CREATE_SET)
+        consume(self.user, CREATE_SET)
+        self.assertEqual(self.used(), 2)
@@ -1,6 +1,6 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
-from flashcard.models import FlashcardSet, FlashcardCollection
+from flashcard.models import FlashcardSet, FlashcardCollection, Review
 
 class SetCreateTests(TestCase):
     @classmethod
@@ -55,6 +55,16 @@ class SetCreateTests(TestCase):
             "flashcard_collection": self.public_collection
         }, follow=True)
         self.assertEqual(response.status_code, 404)
+    
+    @override_settings(QUOTAS={"create_set": 1})
+    def test_create_set_over_daily_limit(self):
+        self.client.login(username="owner", password="password")
+        url = f"/flashcard/collections/{self.private_collection.id}/create"
+        response = self.client.post(url, data={"title": "First", "description": "DESCRIPTION"})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(url, data={"title": "Second", "description": "DESCRIPTION"})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(FlashcardSet.objects.filter(title="Second").exists())
 
 class SetReadTests(TestCase):
     @classmethod
@@ -85,6 +95,15 @@ class SetReadTests(TestCase):
         response = self.client.get(f"/flashcard/collections/{self.public_collection.id}")
         self.assertContains(response, self.public_set)
     
+    def test_listed_sets_best_rated_first(self):
+        best_set = FlashcardSet.objects.create(title="Best set", flashcard_collection=self.public_collection)
+        Review.objects.create(rating=5, flashcard_set=best_set, user=self.other_user)
+        Review.objects.create(rating=2, flashcard_set=self.public_set, user=self.other_user)
+        response = self.client.get(f"/flashcard/collections/{self.public_collection.id}")
+        self.assertEqual(list(response.context["sets"]), [best_set, self.public_set])
+        self.assertContains(response, "Rating: 5/5")
+        self.assertContains(response, "0 cards &middot; 0 comments &middot; 1 review")
+    
     def test_get_private_listed_sets_logged_out(self):
         response = self.client.get(f"/flashcard/collections/{self.private_collection.id}")
         self.assertEqual(response.status_code, 404)
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, StudyProgress
+from flashcard.study import MIN_EASE, due_flashcards, record_grade, schedule
+
+class TestSchedule(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.progress = StudyProgress()
+
+    #region SM-2
+    def test_passes_grow_the_interval(self):
+        intervals = []
+        for _ in range(4):
+            schedule(self.progress, 4, self.now)
+            intervals.append(self.progress.interval)
+        self.assertEqual(intervals, [1, 6, 15, 38])
+        self.assertEqual(self.progress.repetitions, 4)
+        self.assertEqual(self.progress.due_at, self.now + timedelta(days=38))
+
+    def test_ease_follows_the_grade(self):
+        schedule(self.progress, 5, self.now)
+        self.assertAlmostEqual(self.progress.ease, 2.6)
+        schedule(self.progress, 3, self.now)
+        self.assertAlmostEqual(self.progress.ease, 2.46)
+
+    def test_fail_starts_again(self):
+        for grade in [5, 5, 5, 1]:
+            schedule(self.progress, grade, self.now)
+        self.assertEqual(self.progress.interval, 1)
+        self.assertEqual(self.progress.repetitions, 0)
+        self.assertEqual(self.progress.lapses, 1)
+
+    def test_failing_a_new_card_is_not_a_lapse(self):
+        schedule(self.progress, 0, self.now)
+        self.assertEqual(self.progress.lapses, 0)
+
+    def test_ease_has_a_floor(self):
+        for _ in range(10):
+            schedule(self.progress, 0, self.now)
+        self.assertEqual(self.progress.ease, MIN_EASE)
+    #endregion
+
+class TestStudyQueue(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="student", password="password")
+        cls.collection = FlashcardCollection.objects.create(title="Collection", user=cls.user, public=True)
+        cls.set = FlashcardSet.objects.create(title="Set", flashcard_collection=cls.collection)
+        cls.other_set = FlashcardSet.objects.create(title="Other", flashcard_collection=cls.collection)
+        cls.flashcards = [FlashCard.objects.create(question=f"Question {i}", answer="Answer", difficulty="easy", flashcard_set=cls.set)
+                          for i in range(4)]
+        cls.other_flashcard = FlashCard.objects.create(question="Other", answer="Answer", difficulty="easy", flashcard_set=cls.other_set)
+
+    def make_due(self, flashcard, days_ago):
+        progress = record_grade(self.user, flashcard, 4)
+        StudyProgress.objects.filter(pk=progress.pk).update(due_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_due_first_then_new(self):
+        self.make_due(self.flashcards[2], 1)
+        self.make_due(self.flashcards[3], 2)
+        # Studied and not due yet
+        record_grade(self.user, self.flashcards[0], 5)
+        queue = due_flashcards(self.user, {"flashcard_set": self.set.id}, 10)
+        self.assertEqual(queue, [self.flashcards[3], self.flashcards[2], self.flashcards[1]])
+        self.assertIsNotNone(queue[0].progress)
+        self.assertIsNone(queue[2].progress)
+
+    def test_limit_and_lookup(self):
+        self.assertEqual(due_flashcards(self.user, {"flashcard_set": self.set.id}, 2), self.flashcards[:2])
+        self.make_due(self.other_flashcard, 1)
+        queue = due_flashcards(self.user, {"flashcard_set__flashcard_collection": self.collection.id}, 1)
+        self.assertEqual(queue, [self.other_flashcard])
+
+    def test_grades_update_one_progress(self):
+        record_grade(self.user, self.flashcards[0], 4)
+        record_grade(self.user, self.flashcards[0], 4)
+        progress = StudyProgress.objects.get(user=self.user, flashcard=self.flashcards[0])
+        self.assertEqual(progress.repetitions, 2)
+        self.assertEqual(progress.interval, 6)
+
+    def test_queue_queries(self):
+        self.make_due(self.flashcards[0], 1)
+        with self.assertNumQueries(2):
+            # The due flashcards (with their progress), then new ones
+            queue = due_flashcards(self.user, {"flashcard_set": self.set.id}, 10)
+            [flashcard.question for flashcard in queue]
+
+    def test_progress_is_deleted_with_flashcards(self):
+        record_grade(self.user, self.flashcards[0], 4)
+        record_grade(self.user, self.flashcards[1], 4)
+        record_grade(self.user, self.other_flashcard, 4)
+        self.flashcards[0].delete()
+        self.assertEqual(StudyProgress.objects.count(), 2)
+        flashcard_set = FlashcardSet.objects.get(pk=self.set.id)
+        # The set's flashcards are deleted without being loaded (the trigger deletes their progress)
+        with self.assertNumQueries(7):
+            flashcard_set.delete()
+        self.assertEqual(list(StudyProgress.objects.values_list("flashcard", flat=True)), [self.other_flashcard.id])
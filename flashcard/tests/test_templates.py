@@ -57,12 +57,12 @@ class FlashcardTemplateTests(TestCase):
     
     def test_template_used_update(self):
         self.client.login(username="user", password="password")
-        response = self.client.get(f"/flashcard/collections/{self.public_collection.id}/{self.public_set.id}/{self.private_flashcard.id}/update")
+        response = self.client.get(f"/flashcard/collections/{self.private_collection.id}/{self.private_set.id}/{self.private_flashcard.id}/update")
         self.assertTemplateUsed(response, "flashcard/flashcard_update.html")
     
     def test_template_used_delete(self):
         self.client.login(username="user", password="password")
-        response = self.client.get(f"/flashcard/collections/{self.public_collection.id}/{self.public_set.id}/{self.private_flashcard.id}/delete")
+        response = self.client.get(f"/flashcard/collections/{self.private_collection.id}/{self.private_set.id}/{self.private_flashcard.id}/delete")
         self.assertTemplateUsed(response, "flashcard/flashcard_delete.html")
     
 class FlashcardSetTemplateTests(TestCase):
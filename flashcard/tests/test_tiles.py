@@ -0,0 +1,78 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.utils.timezone import now
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review
+from flashcard.tiles import tile_key
+
+class TestTileCache(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.collection = FlashcardCollection.objects.create(title="Collection", user=cls.user, public=True)
+        cls.set = FlashcardSet.objects.create(title="Set", flashcard_collection=cls.collection)
+        cls.other_set = FlashcardSet.objects.create(title="Other set", flashcard_collection=cls.collection)
+
+    def setUp(self):
+        cache.clear()
+        self.set_list = f"/flashcard/collections/{self.collection.id}"
+
+    def cached(self, model, pk):
+        return cache.get(tile_key(model, pk))
+
+    # Swaps the cached HTML for a marker, so a page showing the marker came from the cache
+    def mark(self, model, pk):
+        version, _ = self.cached(model, pk)
+        cache.set(tile_key(model, pk), (version, f"<p>cached {pk}</p>"))
+
+    def test_tiles_are_reused(self):
+        self.client.get(self.set_list)
+        self.mark(FlashcardSet, self.set.id)
+        response = self.client.get(self.set_list)
+        self.assertContains(response, f"cached {self.set.id}")
+        self.assertContains(response, "Other set")
+
+    def test_collection_tiles_are_reused(self):
+        self.client.get("/flashcard/collections")
+        self.mark(FlashcardCollection, self.collection.id)
+        self.assertContains(self.client.get("/flashcard/collections"), f"cached {self.collection.id}")
+
+    def test_signals_delete_affected_tiles(self):
+        self.client.get("/flashcard/collections")
+        changes = {
+            "set saved": (lambda: self.set.save(), [(FlashcardSet, self.set.id), (FlashcardCollection, self.collection.id)]),
+            "review": (lambda: Review.objects.create(rating=4, flashcard_set=self.set, user=self.user), [(FlashcardSet, self.set.id)]),
+            "comment": (lambda: Comment.objects.create(comment="Comment", flashcard_set=self.set, user=self.user), [(FlashcardSet, self.set.id)]),
+            "flashcard": (lambda: FlashCard.objects.create(question="Q", answer="A", difficulty="easy", flashcard_set=self.set), [(FlashcardSet, self.set.id)]),
+            "collection saved": (lambda: self.collection.save(), [(FlashcardCollection, self.collection.id)]),
+        }
+        for change, (write, deleted) in changes.items():
+            with self.subTest(change=change):
+                self.client.get(self.set_list)
+                self.client.get("/flashcard/collections")
+                write()
+                for model, pk in deleted:
+                    self.assertIsNone(self.cached(model, pk))
+                # Nothing else
+                self.assertIsNotNone(self.cached(FlashcardSet, self.other_set.id))
+
+    def test_changed_version_is_rendered_again(self):
+        self.client.get(self.set_list)
+        self.mark(FlashcardSet, self.set.id)
+        # A queryset update doesn't send signals, but still moves the version
+        FlashcardSet.objects.filter(pk=self.set.id).update(title="Renamed", updated_at=now())
+        response = self.client.get(self.set_list)
+        self.assertNotContains(response, f"cached {self.set.id}")
+        self.assertContains(response, "Renamed")
+
+    def test_renamed_owner_is_rendered_again(self):
+        self.client.get("/flashcard/collections")
+        User.objects.filter(pk=self.user.pk).update(username="renamed")
+        self.assertContains(self.client.get("/flashcard/collections"), "Created by: renamed")
+
+    def test_page_reads_tiles_in_one_lookup(self):
+        self.client.get(self.set_list)
+        with self.assertNumQueries(2):
+            # The collection and one page of sets, and none for the cached tiles
+            response = self.client.get(self.set_list)
+        self.assertContains(response, "Other set")
@@ -0,0 +1,70 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Review
+
+class TestURLChain(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        cls.collection = FlashcardCollection.objects.create(title="Collection", user=cls.owner, public=False)
+        cls.set = FlashcardSet.objects.create(title="Set", flashcard_collection=cls.collection)
+        cls.flashcard = FlashCard.objects.create(question="Question", answer="Answer", difficulty="easy", flashcard_set=cls.set)
+        cls.review = Review.objects.create(rating=4, flashcard_set=cls.set, user=cls.owner)
+        # Another collection of the owner's, so only the URL is wrong
+        cls.other_collection = FlashcardCollection.objects.create(title="Other", user=cls.owner, public=False)
+        cls.other_set = FlashcardSet.objects.create(title="Other", flashcard_collection=cls.other_collection)
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    #region Queries
+    def test_pages_load_the_chain_in_one_query(self):
+        base = f"/flashcard/collections/{self.collection.id}"
+        # Session, user and the chain, plus the page's own queries
+        pages = {
+            f"{base}/update": 3,
+            f"{base}/delete": 3,
+            f"{base}/{self.set.id}/update": 3,
+            f"{base}/{self.set.id}/delete": 3,
+            f"{base}/{self.set.id}/{self.flashcard.id}": 3,
+            f"{base}/{self.set.id}/{self.flashcard.id}/update": 3,
+            f"{base}/{self.set.id}/{self.flashcard.id}/delete": 3,
+            # The flashcards
+            f"{base}/{self.set.id}": 4,
+        }
+        for url, queries in pages.items():
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_pages_show_the_chain(self):
+        response = self.client.get(f"/flashcard/collections/{self.collection.id}/{self.set.id}/{self.flashcard.id}")
+        self.assertEqual(response.context["flashcard_collection"], self.collection)
+        self.assertEqual(response.context["flashcard_set"], self.set)
+        self.assertEqual(response.context["flashcard"], self.flashcard)
+    #endregion
+
+    #region Parents
+    def test_set_in_another_collection_is_not_found(self):
+        for suffix in ["", "/update", "/delete", "/comments", "/reviews", f"/{self.flashcard.id}"]:
+            with self.subTest(suffix=suffix):
+                response = self.client.get(f"/flashcard/collections/{self.other_collection.id}/{self.set.id}{suffix}")
+                self.assertEqual(response.status_code, 404)
+
+    def test_flashcard_in_another_set_is_not_found(self):
+        for suffix in ["", "/update", "/delete"]:
+            with self.subTest(suffix=suffix):
+                response = self.client.get(f"/flashcard/collections/{self.other_collection.id}/{self.other_set.id}/{self.flashcard.id}{suffix}")
+                self.assertEqual(response.status_code, 404)
+
+    def test_review_of_another_set_is_not_found(self):
+        for action in ["update", "delete"]:
+            with self.subTest(action=action):
+                response = self.client.get(f"/flashcard/collections/{self.other_collection.id}/{self.other_set.id}/reviews/{self.review.id}/{action}")
+                self.assertEqual(response.status_code, 404)
+
+    def test_delete_through_wrong_set_keeps_flashcard(self):
+        response = self.client.post(f"/flashcard/collections/{self.other_collection.id}/{self.other_set.id}/{self.flashcard.id}/delete")
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(FlashCard.objects.filter(pk=self.flashcard.id).exists())
+    #endregion
@@ -0,0 +1,67 @@
+import io
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import AnonymousUser, User
+from flashcard.models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review
+from flashcard.management.commands.benchmark_visibility import or_filter
+from flashcard.visibility import visible_to
+
+class TestVisibility(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        cls.other_user = User.objects.create_user(username="other", password="password")
+        cls.superuser = User.objects.create_superuser(username="super", password="password")
+        cls.public_collection = FlashcardCollection.objects.create(title="Public", user=cls.owner, public=True)
+        cls.private_collection = FlashcardCollection.objects.create(title="Private", user=cls.owner, public=False)
+        cls.other_collection = FlashcardCollection.objects.create(title="Other", user=cls.other_user, public=False)
+        for collection in [cls.public_collection, cls.private_collection, cls.other_collection]:
+            flashcard_set = FlashcardSet.objects.create(title=collection.title, flashcard_collection=collection)
+            FlashCard.objects.create(question=collection.title, answer="Answer", difficulty="easy", flashcard_set=flashcard_set)
+            # The other user left a comment and review everywhere, e.g. before the owner made the collection private
+            Comment.objects.create(comment=collection.title, flashcard_set=flashcard_set, user=cls.other_user)
+            Review.objects.create(rating=3, flashcard_set=flashcard_set, user=cls.other_user)
+
+    def titles(self, model, user):
+        field = {FlashCard: "question", Comment: "comment"}.get(model)
+        rows = visible_to(model.objects.all(), user)
+        if model is Review:
+            return sorted(rows.values_list("flashcard_set__title", flat=True))
+        return sorted(rows.values_list(field or "title", flat=True))
+
+    def test_anonymous_sees_public(self):
+        for model in [FlashcardCollection, FlashcardSet, FlashCard, Comment, Review]:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.titles(model, AnonymousUser()), ["Public"])
+
+    def test_owner_sees_own_collections(self):
+        for model in [FlashcardCollection, FlashcardSet, FlashCard]:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.titles(model, self.owner), ["Private", "Public"])
+
+    def test_comments_and_reviews_are_visible_to_their_author(self):
+        for model in [Comment, Review]:
+            with self.subTest(model=model.__name__):
+                # Not to the owner of a private collection someone else wrote them in
+                self.assertEqual(self.titles(model, self.owner), ["Public"])
+                self.assertEqual(self.titles(model, self.other_user), ["Other", "Private", "Public"])
+
+    def test_superuser_sees_everything(self):
+        for model in [FlashcardCollection, FlashcardSet, FlashCard, Comment, Review]:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(len(self.titles(model, self.superuser)), 3)
+
+    def test_same_rows_as_or_filter(self):
+        for model in [FlashcardCollection, FlashcardSet, FlashCard, Comment, Review]:
+            for user in [AnonymousUser(), self.owner, self.other_user]:
+                with self.subTest(model=model.__name__, user=str(user)):
+                    self.assertQuerySetEqual(
+                        visible_to(model.objects.order_by("pk"), user),
+                        or_filter(model.objects.order_by("pk"), user))
+
+    def test_benchmark_command(self):
+        stdout = io.StringIO()
+        call_command("benchmark_visibility", cards=200, repeat=1, stdout=stdout)
+        self.assertIn("FlashCard     anonymous  count", stdout.getvalue())
+        # The generated rows are rolled back
+        self.assertEqual(FlashCard.objects.count(), 3)
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review
+
+# Rendered collection and set tiles for the list pages ({% tile %} in templatetags/tiles.py).
+# A tile is cached under its object's id together with the version it was rendered from: everything on it that
+# can change moves the version (updated_at, and a set's version counter for comments and reviews), and a tile whose
+# version doesn't match the row on the page is rendered again. So a tile can't be shown stale, even after changes
+# that don't send signals (queryset updates, bulk creates) or were made by another process with its own cache.
+# The signals below still delete a tile as soon as something on it changes, so stale tiles don't sit in the cache.
+
+def tile_key(model, pk):
+    return f"tile:{model._meta.model_name}:{pk}"
+
+# What the tile shows, as far as it can change. The owner's name is shown on collections, and is joined in with them.
+def tile_version(obj):
+    if isinstance(obj, FlashcardSet):
+        return (obj.updated_at.isoformat(), obj.version)
+    return (obj.updated_at.isoformat(), obj.user.username)
+
+# The cached tiles for one page of objects, read with one cache lookup
+class Tiles:
+    def __init__(self, objects):
+        self.keys = {obj.pk: tile_key(type(obj), obj.pk) for obj in objects}
+        self.cached = cache.get_many(self.keys.values()) if self.keys else {}
+
+    # The tile's HTML, or None if it needs rendering
+    def get(self, obj):
+        version, html = self.cached.get(self.keys.get(obj.pk), (None, None))
+        return html if version == tile_version(obj) else None
+
+    def set(self, obj, html):
+        cache.set(tile_key(type(obj), obj.pk), (tile_version(obj), html), settings.TILE_CACHE_TIMEOUT)
+
+def delete_tiles(model, *pks):
+    cache.delete_many([tile_key(model, pk) for pk in pks if pk is not None])
+
+@receiver([post_save, post_delete], sender=FlashcardCollection)
+def delete_collection_tile(sender, instance, **kwargs):
+    delete_tiles(FlashcardCollection, instance.pk)
+
+# A set's tile, and its collection's (which counts its sets and flashcards), including the one it moved out of
+@receiver([post_save, post_delete], sender=FlashcardSet)
+def delete_set_tile(sender, instance, **kwargs):
+    delete_tiles(FlashcardSet, instance.pk)
+    delete_tiles(FlashcardCollection, instance.flashcard_collection_id, getattr(instance, "_loaded_collection_id", None))
+
+# Comments and reviews are counted (and rated) on their set's tile
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=Review)
+def delete_counted_set_tile(sender, instance, **kwargs):
+    delete_tiles(FlashcardSet, instance.flashcard_set_id)
+
+# Flashcards are counted on their set's and collection's tiles (the collection's is only deleted here if the set is
+# already loaded, rather than querying for it). Only saves are caught: a delete receiver would stop Django from
+# deleting a set's flashcards in one query, and deleting a flashcard moves both versions anyway.
+@receiver(post_save, sender=FlashCard)
+def delete_flashcard_tiles(sender, instance, **kwargs):
+    delete_tiles(FlashcardSet, instance.flashcard_set_id, getattr(instance, "_loaded_set_id", None))
+    if FlashCard.flashcard_set.is_cached(instance):
+        delete_tiles(FlashcardCollection, instance.flashcard_set.flashcard_collection_id)
@@ -2,10 +2,12 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 from django.http.response import HttpResponseRedirect
 from django.core.exceptions import PermissionDenied
 from django.http import Http404
-from django.db.models import Q, Avg
+from django.db import IntegrityError, transaction
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
 from .models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review
+from .quotas import CREATE_SET, QuotaExceeded, consume
+from .visibility import visible_to
+from .mixins import URLChainMixin, KeysetPaginationMixin, TileCacheMixin
 from django.urls import reverse
 import datetime
 
@@ -26,7 +28,7 @@ class FlashcardCollectionCreateView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse("collection-list")
     
-class FlashcardSetCreateView(LoginRequiredMixin, CreateView):
+class FlashcardSetCreateView(LoginRequiredMixin, URLChainMixin, CreateView):
     model = FlashcardSet
     fields = ['title', 'description']
     template_name="flashcard/flashcard_set_create.html"
@@ -39,16 +41,18 @@ class FlashcardSetCreateView(LoginRequiredMixin, CreateView):
         return context
     
     def form_valid(self, form):
-        collection = FlashcardCollection.objects.get(pk=self.kwargs["collection_id"])
-        if FlashcardSet.objects.filter(created_at__date = datetime.datetime.now()).count() > 19:
-            raise Http404("The daily limit for flashcards created has been reached. Please remove an existing set created today or try again tomorrow.")
-        elif collection.user != self.request.user:
+        collection = self.flashcard_collection
+        if not self.resolver.can_write(collection):
             raise Http404("You do not have permission to edit this set.")
-        else:
-            self.object = form.save(commit=False)
-            self.object.flashcard_collection = collection
-            self.object.save()
-            return HttpResponseRedirect(self.get_success_url())
+        try:
+            with transaction.atomic():
+                consume(self.request.user, CREATE_SET)
+                self.object = form.save(commit=False)
+                self.object.flashcard_collection = collection
+                self.object.save()
+        except QuotaExceeded:
+            raise Http404("The daily limit for flashcards created has been reached. Please remove an existing set created today or try again tomorrow.")
+        return HttpResponseRedirect(self.get_success_url())
     
     def get_success_url(self):
         return reverse("set-list", kwargs={
@@ -56,7 +60,7 @@ class FlashcardSetCreateView(LoginRequiredMixin, CreateView):
         })
     
     
-class FlashcardCreateView(LoginRequiredMixin, CreateView):
+class FlashcardCreateView(LoginRequiredMixin, URLChainMixin, CreateView):
     model = FlashCard
     fields = ['question', 'answer', 'difficulty']
     template_name="flashcard/flashcard_create.html"
@@ -70,12 +74,11 @@ class FlashcardCreateView(LoginRequiredMixin, CreateView):
     
     # Add user to collection info
     def form_valid(self, form):
-        collection = get_object_or_404(FlashcardCollection, id=self.kwargs.get('collection_id'))
-        if collection.user != self.request.user:
+        if not self.resolver.can_write(self.flashcard_collection):
             raise Http404("You do not have permission to edit this set.")
         self.object = form.save(commit=False)
         self.object.user = self.request.user
-        self.object.flashcard_set = get_object_or_404(FlashcardSet, id=self.kwargs.get('set_id'))
+        self.object.flashcard_set = self.flashcard_set
         self.object.save()
         return HttpResponseRedirect(self.get_success_url())
     
@@ -85,7 +88,7 @@ class FlashcardCreateView(LoginRequiredMixin, CreateView):
             "set_id": self.kwargs.get("set_id"),
         })
         
-class CommentCreateView(LoginRequiredMixin, CreateView):
+class CommentCreateView(LoginRequiredMixin, URLChainMixin, CreateView):
     model = Comment
     fields = ["comment"]
     template_name="flashcard/comment_create.html"
@@ -95,15 +98,14 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
         context = super().get_context_data(**kwargs)
         context['collection_id'] = self.kwargs['collection_id']
         context['set_id'] = self.kwargs['set_id']
-        collection = get_object_or_404(FlashcardCollection, id=context['collection_id'])
         
-        if not collection.public and collection.user != self.request.user:
+        if not self.resolver.can_read(self.flashcard_collection):
             raise Http404("You do not have permission to edit this set.")
         return context
     
     def form_valid(self, form):
         self.object = form.save(commit=False)
-        self.object.flashcard_set = FlashcardSet.objects.get(pk=self.kwargs["set_id"])
+        self.object.flashcard_set = self.flashcard_set
         self.object.user = self.request.user
         self.object.save()
         return HttpResponseRedirect(self.get_success_url())
@@ -116,47 +118,45 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
 # endregion
 
 # region ListViews and FlashcardDetailView (Read)
-class FlashcardCollectionListView(ListView):
+class FlashcardCollectionListView(TileCacheMixin, KeysetPaginationMixin, ListView):
     model = FlashcardCollection
     context_object_name = "collections"
     template_name="flashcard/flashcard_collection_list.html"
+    ordering = ["id"]
     
     # Only get public flashcards and user's private flashcards
     def get_queryset(self):
-        if self.request.user.is_superuser:
-            return FlashcardCollection.objects.all()
-        elif self.request.user.is_authenticated:
-            return FlashcardCollection.objects.filter(Q(public=True) | Q(user=self.request.user))
-        else:
-            return FlashcardCollection.objects.filter(public=True)
+        # The owner's username is shown on every collection
+        return visible_to(FlashcardCollection.objects.select_related("user"), self.request.user)
         
-class FlashcardSetListView(ListView):
+class FlashcardSetListView(URLChainMixin, TileCacheMixin, KeysetPaginationMixin, ListView):
     model = FlashcardSet
     context_object_name = "sets"
     template_name="flashcard/flashcard_set_list.html"
+    # rating_average is stored on the set (and indexed with the collection), so this doesn't read any reviews
+    ordering = ["-rating_average", "id"]
     
     def get_queryset(self):
-        return FlashcardSet.objects.filter(flashcard_collection_id=self.kwargs.get('collection_id')).annotate(avg_rating=Avg("review__rating")).order_by("-avg_rating")
+        return FlashcardSet.objects.filter(flashcard_collection_id=self.kwargs.get('collection_id'))
 
     # Get flashcard collection info
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        collection_id = self.kwargs.get('collection_id')
         
-        context['flashcard_collection'] = get_object_or_404(FlashcardCollection, id=collection_id)
-        if context['flashcard_collection'].user != self.request.user and context['flashcard_collection'].public != True and not self.request.user.is_superuser:
+        if not self.resolver.can_read(self.flashcard_collection):
             raise Http404("You do not have permission to view this collection.")
         
         return context
     
-class FlashcardListView(ListView):
+class FlashcardListView(URLChainMixin, KeysetPaginationMixin, ListView):
     model = FlashCard
     context_object_name = "flashcards"
     template_name="flashcard/flashcard_list.html"
+    ordering = ["id"]
     
+    # The URL chain has already checked that the set is in the collection
     def get_queryset(self):
-        return FlashCard.objects.filter(
-            flashcard_set__flashcard_collection_id=self.kwargs.get('collection_id'), flashcard_set_id=self.kwargs.get('set_id'))
+        return FlashCard.objects.filter(flashcard_set=self.flashcard_set)
 
     # Get flashcard collection info
     def get_context_data(self, **kwargs):
@@ -166,16 +166,12 @@ class FlashcardListView(ListView):
         
         context['collection_id'] = collection_id
         context['set_id'] = set_id
-        context["flashcard_collection"] = get_object_or_404(FlashcardCollection, id=collection_id)
-
         
-        if context["flashcard_collection"].user != self.request.user and not context["flashcard_collection"].public and not self.request.user.is_superuser:
+        if not self.resolver.can_read(self.flashcard_collection):
             raise Http404("You do not have permission to view this collection.")
-        
-        context['flashcard_set'] = get_object_or_404(FlashcardSet, id=set_id)
         return context
     
-class FlashcardDetailView(DetailView):
+class FlashcardDetailView(URLChainMixin, DetailView):
     model = FlashCard
     context_object_name = "flashcard"
     template_name = "flashcard/flashcard_info.html"
@@ -185,17 +181,17 @@ class FlashcardDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         context['collection_id'] = self.kwargs.get('collection_id')
         context['set_id'] = self.kwargs.get('set_id')
-        collection = get_object_or_404(FlashcardCollection, id=context['collection_id'])
 
-        if not collection.public and collection.user != self.request.user and not self.request.user.is_superuser:
+        if not self.resolver.can_read(self.flashcard_collection):
             raise Http404("You do not have permission to view this collection.")
-        context["collection"]=collection
+        context["collection"]=self.flashcard_collection
         return context
     
-class CommentListView(ListView):
+class CommentListView(URLChainMixin, KeysetPaginationMixin, ListView):
     model = Comment
     context_object_name = "comments"
     template_name = "flashcard/comment_list.html"
+    ordering = ["id"]
     
     def get_queryset(self):
         return Comment.objects.filter(flashcard_set_id=self.kwargs.get('set_id'))
@@ -204,18 +200,15 @@ class CommentListView(ListView):
         context = super().get_context_data(**kwargs)
         context['collection_id'] = self.kwargs.get('collection_id')
         context['set_id'] = self.kwargs.get('set_id')
-        collection = get_object_or_404(FlashcardCollection, id=context['collection_id'])
 
-        if not collection.public and collection.user != self.request.user:
+        if not self.resolver.can_read(self.flashcard_collection):
             raise Http404("You do not have permission to view this collection.")
         
-        context["flashcard_set"] = get_object_or_404(FlashcardSet, id=context['set_id'])
-        
         return context
 # endregion
 
 # region UpdateViews (Update)
-class FlashcardCollectionUpdateView(LoginRequiredMixin, UpdateView):
+class FlashcardCollectionUpdateView(LoginRequiredMixin, URLChainMixin, UpdateView):
     model = FlashcardCollection
     template_name = "flashcard/flashcard_collection_update.html"
     pk_url_kwarg = "collection_id"
@@ -224,10 +217,8 @@ class FlashcardCollectionUpdateView(LoginRequiredMixin, UpdateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        collection_id = self.kwargs.get('collection_id')
         
-        context['flashcard_collection'] = get_object_or_404(FlashcardCollection, id=collection_id)
-        if context['flashcard_collection'].user != self.request.user:
+        if not self.resolver.can_write(self.flashcard_collection):
             raise Http404("You do not have permission to modify this collection.")
         return context
     
@@ -236,7 +227,7 @@ class FlashcardCollectionUpdateView(LoginRequiredMixin, UpdateView):
             "collection_id": self.kwargs.get('collection_id'),
         })
     
-class FlashcardSetUpdateView(LoginRequiredMixin, UpdateView):
+class FlashcardSetUpdateView(LoginRequiredMixin, URLChainMixin, UpdateView):
     model = FlashcardSet
     template_name = "flashcard/flashcard_set_update.html"
     pk_url_kwarg = "set_id"
@@ -250,13 +241,9 @@ class FlashcardSetUpdateView(LoginRequiredMixin, UpdateView):
         
         context['collection_id'] = collection_id
         context['set_id'] = set_id
-        collection = get_object_or_404(FlashcardCollection, id=collection_id)
         
-        if collection.user != self.request.user:
+        if not self.resolver.can_write(self.flashcard_collection):
             raise Http404("You do not have permission to modify this set.")
-        
-        context['flashcard_set'] = get_object_or_404(FlashcardSet, id=set_id)
-        context['flashcard_collection'] = get_object_or_404(FlashcardCollection, id=collection_id)
         return context    
     
     # Add updated date to set info
@@ -272,7 +259,7 @@ class FlashcardSetUpdateView(LoginRequiredMixin, UpdateView):
             "set_id": self.kwargs.get("set_id"),
         })
 
-class FlashCardUpdateView(LoginRequiredMixin, UpdateView):
+class FlashCardUpdateView(LoginRequiredMixin, URLChainMixin, UpdateView):
     model = FlashCard
     template_name = "flashcard/flashcard_update.html"
     pk_url_kwarg = "flashcard_id"
@@ -284,12 +271,9 @@ class FlashCardUpdateView(LoginRequiredMixin, UpdateView):
         context['flashcard_id'] = self.kwargs.get('flashcard_id')
         context['set_id'] = self.kwargs.get('set_id')
         context['collection_id'] = self.kwargs.get('collection_id')
-        context['flashcard_collection'] = get_object_or_404(FlashcardCollection, id=context['collection_id'])
         
-        if context["flashcard_collection"].user != self.request.user:
+        if not self.resolver.can_write(self.flashcard_collection):
             raise Http404("The flashcard could not be found.")
-        
-        context['flashcard'] = get_object_or_404(FlashCard, id=context['flashcard_id'])
         return context    
     
     def get_success_url(self):
@@ -301,49 +285,36 @@ class FlashCardUpdateView(LoginRequiredMixin, UpdateView):
 # endregion
 
 # region DeleteViews (Delete)
-class FlashcardCollectionDeleteView(LoginRequiredMixin, DeleteView):
+class FlashcardCollectionDeleteView(LoginRequiredMixin, URLChainMixin, DeleteView):
     model = FlashcardCollection
     template_name = "flashcard/flashcard_collection_delete.html"
     pk_url_kwarg = "collection_id"
     login_url = "/login"
     
-    def get_queryset(self):
-        collection_id = self.kwargs.get('collection_id')
-        collection = get_object_or_404(FlashcardCollection, id=collection_id)
-        if collection.user != self.request.user and not self.request.user.is_superuser:
+    def get_object(self, queryset=None):
+        if not self.resolver.can_delete(self.flashcard_collection):
             raise Http404("You do not have permission to modify this collection.")
-        return super().get_queryset()
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        collection_id = self.kwargs.get('collection_id')
-        context['flashcard_collection'] = get_object_or_404(FlashcardCollection, id=collection_id)
-        return context
+        return super().get_object(queryset)
     
     def get_success_url(self):
         return reverse("collection-list")
 
-class FlashcardSetDeleteView(LoginRequiredMixin, DeleteView):
+class FlashcardSetDeleteView(LoginRequiredMixin, URLChainMixin, DeleteView):
     model = FlashcardSet
     template_name = "flashcard/flashcard_set_delete.html"
     pk_url_kwarg = "set_id"
     login_url = "/login"
     
-    def get_queryset(self):
-        collection = get_object_or_404(FlashcardCollection, id=self.kwargs.get('collection_id'))
-        if collection.user != self.request.user and not self.request.user.is_superuser:
+    def get_object(self, queryset=None):
+        if not self.resolver.can_delete(self.flashcard_collection):
             raise Http404()
-        return super().get_queryset()
+        return super().get_object(queryset)
     
     # Get flashcard collection info
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        collection_id = self.kwargs.get('collection_id')
-        set_id = self.kwargs.get('set_id')
-        context['collection_id'] = collection_id
-        context['set_id'] = set_id
-        context['flashcard_collection'] = get_object_or_404(FlashcardCollection, id=collection_id)
-        context['flashcard_set'] = get_object_or_404(FlashcardSet, id=set_id)
+        context['collection_id'] = self.kwargs.get('collection_id')
+        context['set_id'] = self.kwargs.get('set_id')
         return context
     
     def get_success_url(self):
@@ -351,7 +322,7 @@ class FlashcardSetDeleteView(LoginRequiredMixin, DeleteView):
             "collection_id": self.kwargs.get('collection_id'),
         })
 
-class FlashCardDeleteView(LoginRequiredMixin, DeleteView):
+class FlashCardDeleteView(LoginRequiredMixin, URLChainMixin, DeleteView):
     model = FlashCard
     template_name = "flashcard/flashcard_delete.html"
     pk_url_kwarg="flashcard_id"
@@ -361,14 +332,12 @@ class FlashCardDeleteView(LoginRequiredMixin, DeleteView):
         context = super().get_context_data(**kwargs)
         context['collection_id'] = self.kwargs.get('collection_id')
         context['set_id'] = self.kwargs.get('set_id')
-        context["flashcard_collection"] = get_object_or_404(FlashcardCollection, id=context['collection_id'])
         return context
     
-    def get_queryset(self):
-        collection = get_object_or_404(FlashcardCollection, id=self.kwargs.get('collection_id'))
-        if collection.user != self.request.user and not self.request.user.is_superuser:
+    def get_object(self, queryset=None):
+        if not self.resolver.can_delete(self.flashcard_collection):
             raise Http404("Not found")
-        return super().get_queryset()
+        return super().get_object(queryset)
     
     def get_success_url(self):
         return reverse("flashcard-list", kwargs={
@@ -378,7 +347,7 @@ class FlashCardDeleteView(LoginRequiredMixin, DeleteView):
 # endregion
 
 # region Review
-class ReviewCreateView(LoginRequiredMixin, CreateView):
+class ReviewCreateView(LoginRequiredMixin, URLChainMixin, CreateView):
     model=Review
     fields=["rating", "comment"]
     template_name="flashcard/review_create.html"
@@ -389,37 +358,30 @@ class ReviewCreateView(LoginRequiredMixin, CreateView):
         context['collection_id'] = self.kwargs['collection_id']
         context['set_id'] = self.kwargs['set_id']
         
-        context["set"] = get_object_or_404(FlashcardSet, id=context["set_id"])
+        context["set"] = self.flashcard_set
         return context        
 
     def dispatch(self, request, *args, **kwargs):
-        collection_id=self.kwargs.get("collection_id")
-        set_id=self.kwargs.get("set_id")
-        collection = get_object_or_404(FlashcardCollection, id=collection_id)
-        
-        if not collection.public and collection.user != self.request.user:
+        if not self.resolver.can_read(self.flashcard_collection):
             raise Http404("Could not find set.")
 
-        if self.request.user.is_anonymous:
-            return super().dispatch(request, *args, **kwargs)
-        
-        x = Review.objects.filter(
-            user=self.request.user, 
-            flashcard_set__id=set_id).first()
-        if x is not None:
-            return HttpResponseRedirect(reverse("review-update", kwargs={
-                "collection_id": collection_id,
-                "set_id": set_id,
-                "review_id": x.id
-            }))
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
         self.object = form.save(commit=False)
         # Add check for number rating
         self.object.user = self.request.user
-        self.object.flashcard_set = FlashcardSet.objects.get(pk=self.kwargs["set_id"])
-        self.object.save()
+        self.object.flashcard_set = self.flashcard_set
+        try:
+            self.object.save()
+        except IntegrityError:
+            # The user has already reviewed this set (the unique constraint), so send them to edit that review
+            review = Review.objects.get(user=self.request.user, flashcard_set_id=self.kwargs["set_id"])
+            return HttpResponseRedirect(reverse("review-update", kwargs={
+                "collection_id": self.kwargs["collection_id"],
+                "set_id": self.kwargs["set_id"],
+                "review_id": review.id
+            }))
         return super().form_valid(form)
     
     def get_success_url(self):
@@ -428,10 +390,11 @@ class ReviewCreateView(LoginRequiredMixin, CreateView):
             "set_id": self.kwargs.get('set_id')
         })
 
-class ReviewListView(ListView):
+class ReviewListView(URLChainMixin, KeysetPaginationMixin, ListView):
     model=Review
     context_object_name="review"
     template_name="flashcard/review_list.html"
+    ordering=["id"]
     
     def get_queryset(self):
         if self.request.user.is_authenticated:
@@ -440,11 +403,7 @@ class ReviewListView(ListView):
             return Review.objects.filter(flashcard_set__id=self.kwargs.get("set_id"), flashcard_set__flashcard_collection__public=True)
     
     def dispatch(self, request, *args, **kwargs):
-        collection_id=self.kwargs.get("collection_id")
-        set_id=self.kwargs.get("set_id")
-        collection = get_object_or_404(FlashcardCollection, id=collection_id)
-        
-        if not collection.public and collection.user != self.request.user:
+        if not self.resolver.can_read(self.flashcard_collection):
             raise Http404("Could not find set.")
                     
         return super().dispatch(request, *args, **kwargs)
@@ -453,8 +412,7 @@ class ReviewListView(ListView):
         context = super().get_context_data(**kwargs)
         context['collection_id'] = self.kwargs.get('collection_id')
         context['set_id'] = self.kwargs.get('set_id')
-        context["flashcard_set"] = get_object_or_404(FlashcardSet, id=context['set_id'])
-        context['avg_rating'] = Review.objects.filter(flashcard_set=context["flashcard_set"]).aggregate(Avg("rating"))["rating__avg"]
+        context['avg_rating'] = self.flashcard_set.rating_average
         
         if self.request.user.is_anonymous:
             context["reviewed"] = False
@@ -470,7 +428,7 @@ class ReviewListView(ListView):
             context["reviewed"] = False
         return context
 
-class ReviewUpdateView(LoginRequiredMixin, UpdateView):
+class ReviewUpdateView(LoginRequiredMixin, URLChainMixin, UpdateView):
     model=Review
     fields=["rating", "comment"]
     template_name="flashcard/review_update.html"
@@ -481,14 +439,17 @@ class ReviewUpdateView(LoginRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
         context['collection_id'] = self.kwargs['collection_id']
         context['set_id'] = self.kwargs['set_id']
-        context["set"] = get_object_or_404(FlashcardSet, id=context['set_id'])
+        context["set"] = self.flashcard_set
         return context
     
+    # Only reviews of the set in the URL
+    def get_queryset(self):
+        return Review.objects.filter(flashcard_set=self.flashcard_set)
+    
     def get_object(self, queryset = None):
         review = super().get_object(queryset)
-        collection = get_object_or_404(FlashcardCollection, id=self.kwargs['collection_id'])
         
-        if collection.user != self.request.user:
+        if not self.resolver.can_write(self.flashcard_collection):
             raise PermissionDenied("You don't have permission to modify this.")
         return review
     
@@ -504,17 +465,20 @@ class ReviewUpdateView(LoginRequiredMixin, UpdateView):
             "set_id": self.kwargs.get('set_id')
         })
 
-class ReviewDeleteView(LoginRequiredMixin, DeleteView):
+class ReviewDeleteView(LoginRequiredMixin, URLChainMixin, DeleteView):
     model=Review
     template_name="flashcard/review_delete.html"
     pk_url_kwarg="review_id"
     login_url="/login"
     
+    # Only reviews of the set in the URL
+    def get_queryset(self):
+        return Review.objects.filter(flashcard_set=self.flashcard_set)
+    
     def get_object(self, queryset = None):
         review = super().get_object(queryset)
-        collection = get_object_or_404(FlashcardCollection, id=self.kwargs['collection_id'])
         
-        if collection.user != self.request.user and not self.request.user.is_superuser:
+        if not self.resolver.can_delete(self.flashcard_collection):
             raise PermissionDenied("You don't have permission to delete this.")
         return review
     
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import AnonymousUser
+from .models import FlashCard, FlashcardSet, FlashcardCollection, Comment, Review
+
+# What a user can see: public collections and everything in them, their own collections and everything in them,
+# and the comments and reviews they wrote wherever they are. Superusers see everything.
+#
+# The obvious filter, e.g. Q(flashcard_set__flashcard_collection__user=user) | Q(flashcard_set__flashcard_collection__public=True),
+# ORs two conditions on a joined table, so the database can't use an index for either side and reads every row of the
+# child table. These find the visible collections first instead, as a UNION of two index lookups, then the sets and
+# rows in them through the foreign key indexes.
+
+# The ids of the collections user can see
+def visible_collection_ids(user):
+    public = FlashcardCollection.objects.filter(public=True).values("pk")
+    if not user.is_authenticated:
+        return public
+    return public.union(FlashcardCollection.objects.filter(user=user).values("pk"))
+
+# The ids of the sets user can see
+def visible_set_ids(user):
+    return FlashcardSet.objects.filter(flashcard_collection__in=visible_collection_ids(user)).values("pk")
+
+def visible_collections(queryset, user):
+    return queryset.filter(pk__in=visible_collection_ids(user))
+
+def visible_sets(queryset, user):
+    return queryset.filter(flashcard_collection__in=visible_collection_ids(user))
+
+def visible_flashcards(queryset, user):
+    return queryset.filter(flashcard_set__in=visible_set_ids(user))
+
+# Comments and reviews are only visible in public collections, except to the user who wrote them
+def visible_authored(queryset, user):
+    public_sets = visible_set_ids(AnonymousUser())
+    if not user.is_authenticated:
+        return queryset.filter(flashcard_set__in=public_sets)
+    rows = queryset.model.objects
+    return queryset.filter(pk__in=rows.filter(flashcard_set__in=public_sets).values("pk").union(rows.filter(user=user).values("pk")))
+
+VISIBILITY = {
+    FlashcardCollection: visible_collections,
+    FlashcardSet: visible_sets,
+    FlashCard: visible_flashcards,
+    Comment: visible_authored,
+    Review: visible_authored,
+}
+
+# The rows of queryset that user can see
+def visible_to(queryset, user):
+    if user.is_superuser:
+        return queryset
+    return VISIBILITY[queryset.model](queryset, user)
@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import sys
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,9 +26,19 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config('SECRET_KEY')
 
 
+# Settings profile: dev (the default), test (the default for `manage.py test`) or prod.
+# Each profile only changes defaults, anything below can still be set on its own in .env.
+PROFILE = config('DJANGO_PROFILE', default='test' if sys.argv[1:2] == ['test'] else 'dev')
+if PROFILE not in ('dev', 'test', 'prod'):
+    raise ImproperlyConfigured(f"DJANGO_PROFILE must be dev, test or prod, not {PROFILE!r}.")
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config('DEBUG', default=PROFILE == 'dev', cast=bool)
+
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='', cast=Csv())
 
+# The browsable API's HTML pages, on top of JSON
+API_BROWSABLE = config('API_BROWSABLE', default=PROFILE == 'dev', cast=bool)
 
 
 # Application definition
@@ -57,6 +69,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.throttling.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'flashcards.urls'
@@ -69,6 +82,7 @@ TEMPLATES = [
         ],
         'APP_DIRS': True,
         'OPTIONS': {
+            'debug': config('TEMPLATE_DEBUG', default=DEBUG, cast=bool),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -79,6 +93,16 @@ TEMPLATES = [
     },
 ]
 
+# In prod, templates are compiled once per process and kept, instead of read and parsed on every render
+if PROFILE == 'prod':
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'flashcards.wsgi.application'
 
 
@@ -89,6 +113,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Seconds a connection is kept open for the next request (0 opens one per request), checked before reuse
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60 if PROFILE == 'prod' else 0, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=PROFILE == 'prod', cast=bool),
     }
 }
 
@@ -123,6 +150,10 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Tests don't need slow password hashing
+if PROFILE == 'test':
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
@@ -131,6 +162,20 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+# Where `manage.py collectstatic` puts the files to serve
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+
+# In prod, static files are served under names with a hash of their content (so they can be cached forever),
+# from the manifest collectstatic writes
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage' if PROFILE == 'prod'
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -140,11 +185,73 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = "/flashcard/collections"
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if API_BROWSABLE else []),
+    ],
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.URLPathVersioning',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    # Token buckets per user (or anonymous IP) and scope, see api/throttling.py. Leave a rate out to turn its scope off.
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.TokenBucketThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': config('API_THROTTLE_READ', default='600/min'),
+        'write': config('API_THROTTLE_WRITE', default='120/min'),
+        'bulk': config('API_THROTTLE_BULK', default='30/hour'),
+        'anon_read': config('API_THROTTLE_ANON_READ', default='120/min'),
+    },
 }
 
-# REST_FRAMEWORK = {
-#     'DEFAULT_RENDERER_CLASSES': (
-#         'rest_framework.renderers.JSONRenderer',
-#     ),
-# }
\ No newline at end of file
+# API pagination - clients can ask for ?page_size= up to the cap
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=50, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Results GET /api/search/fuzzy returns, and the most it returns with ?limit=
+API_FUZZY_SEARCH_LIMIT = config('API_FUZZY_SEARCH_LIMIT', default=10, cast=int)
+API_FUZZY_SEARCH_MAX_LIMIT = config('API_FUZZY_SEARCH_MAX_LIMIT', default=50, cast=int)
+
+# GET /api/suggest: most suggestions it returns (and the default), most titles each process keeps for it, and how
+# often (in seconds) each process's background thread checks for changed sets, see flashcard/suggest.py. 0 turns
+# the thread off (as in tests, which call suggest.refresh() instead).
+SUGGEST_LIMIT = config('SUGGEST_LIMIT', default=10, cast=int)
+SUGGEST_MAX_TITLES = config('SUGGEST_MAX_TITLES', default=100000, cast=int)
+SUGGEST_REFRESH_INTERVAL = config('SUGGEST_REFRESH_INTERVAL', default=0 if PROFILE == 'test' else 5, cast=float)
+# Changed sets kept in the SetChange log. A process further behind than this rebuilds its suggestions from scratch.
+SUGGEST_CHANGE_LOG_SIZE = config('SUGGEST_CHANGE_LOG_SIZE', default=10000, cast=int)
+
+# Flashcards GET /api/sets/<id>/due/ (and collections) returns, and the most it returns with ?limit=
+STUDY_DUE_LIMIT = config('STUDY_DUE_LIMIT', default=20, cast=int)
+STUDY_MAX_DUE_LIMIT = config('STUDY_MAX_DUE_LIMIT', default=100, cast=int)
+
+# Web list pages show this many rows, with a "load more" link for the rest (see flashcard/mixins.py)
+WEB_PAGE_SIZE = config('WEB_PAGE_SIZE', default=30, cast=int)
+WEB_MAX_PAGE_SIZE = config('WEB_MAX_PAGE_SIZE', default=100, cast=int)
+
+# How long (in seconds) a rendered collection or set tile is kept in the cache, see flashcard/tiles.py
+TILE_CACHE_TIMEOUT = config('TILE_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int)
+
+# Most flashcards POST /api/flashcards/bulk/ accepts in one request
+API_BULK_MAX_SIZE = config('API_BULK_MAX_SIZE', default=10000, cast=int)
+
+# Most bytes the collection database in an uploaded Anki package may unpack to (see flashcard/anki.py)
+ANKI_MAX_COLLECTION_SIZE = config('ANKI_MAX_COLLECTION_SIZE', default=100 * 1024 * 1024, cast=int)
+
+# Most of each action a user can do in a day (see flashcard/quotas.py)
+QUOTAS = {
+    "create_set": config('QUOTA_CREATE_SET', default=20, cast=int),
+}
+# Remember used up quotas in each process, saving a query on every attempt past the limit
+QUOTA_CACHE = config('QUOTA_CACHE', default=False, cast=bool)
+
+# Refuse to start prod with anything only meant for development turned on
+if PROFILE == 'prod':
+    problems = []
+    if DEBUG:
+        problems.append("DEBUG is on")
+    if any(template['OPTIONS'].get('debug') for template in TEMPLATES):
+        problems.append("template debugging is on")
+    if 'rest_framework.renderers.BrowsableAPIRenderer' in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']:
+        problems.append("the browsable API is on (API_BROWSABLE)")
+    if not ALLOWED_HOSTS or '*' in ALLOWED_HOSTS:
+        problems.append("ALLOWED_HOSTS must list the site's host names")
+    if problems:
+        raise ImproperlyConfigured(f"The prod profile can't start: {'; '.join(problems)}.")
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.test import SimpleTestCase
+
+# Loads the settings in a new process with the given environment, and returns them (or the error they raised)
+def load_settings(**env):
+    script = (
+        "import json; from django.conf import settings; "
+        "print(json.dumps({'DEBUG': settings.DEBUG, 'TEMPLATES': settings.TEMPLATES, 'DATABASES': settings.DATABASES, "
+        "'STORAGES': settings.STORAGES, 'REST_FRAMEWORK': settings.REST_FRAMEWORK}, default=str))"
+    )
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": "flashcards.settings", "SECRET_KEY": "secret", **env}
+    result = subprocess.run([sys.executable, "-c", script], env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    if result.returncode:
+        return None, result.stderr
+    return json.loads(result.stdout), None
+
+PROD = {"DJANGO_PROFILE": "prod", "ALLOWED_HOSTS": "testvar.example.com", "DEBUG": "False"}
+
+class SettingsProfileTests(SimpleTestCase):
+    #region Profiles
+    def test_dev(self):
+        loaded, error = load_settings(DJANGO_PROFILE="dev")
+        self.assertIsNone(error)
+        self.assertTrue(loaded["DEBUG"])
+        self.assertIn("rest_framework.renderers.BrowsableAPIRenderer", loaded["REST_FRAMEWORK"]["DEFAULT_RENDERER_CLASSES"])
+
+    def test_prod(self):
+        loaded, error = load_settings(**PROD)
+        self.assertIsNone(error)
+        self.assertFalse(loaded["DEBUG"])
+        template = loaded["TEMPLATES"][0]
+        self.assertFalse(template["APP_DIRS"])
+        self.assertEqual(template["OPTIONS"]["loaders"][0][0], "django.template.loaders.cached.Loader")
+        self.assertGreater(loaded["DATABASES"]["default"]["CONN_MAX_AGE"], 0)
+        self.assertTrue(loaded["DATABASES"]["default"]["CONN_HEALTH_CHECKS"])
+        self.assertEqual(loaded["STORAGES"]["staticfiles"]["BACKEND"], "django.contrib.staticfiles.storage.ManifestStaticFilesStorage")
+        self.assertEqual(loaded["REST_FRAMEWORK"]["DEFAULT_RENDERER_CLASSES"], ["rest_framework.renderers.JSONRenderer"])
+
+    def test_unknown_profile(self):
+        loaded, error = load_settings(DJANGO_PROFILE="staging")
+        self.assertIn("DJANGO_PROFILE must be dev, test or prod", error)
+    #endregion
+
+    #region Prod self-check
+    def test_prod_refuses_debug_options(self):
+        for name, value in [("DEBUG", "True"), ("TEMPLATE_DEBUG", "True"), ("API_BROWSABLE", "True"), ("ALLOWED_HOSTS", ""), ("ALLOWED_HOSTS", "*")]:
+            with self.subTest(name=name, value=value):
+                loaded, error = load_settings(**{**PROD, name: value})
+                self.assertIsNone(loaded)
+                self.assertIn("The prod profile can't start", error)
+    #endregion